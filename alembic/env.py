@@ -1,9 +1,10 @@
-import os
 import asyncio
 from logging.config import fileConfig
 from sqlalchemy.ext.asyncio import create_async_engine
 from alembic import context
-from app.database import Base  # Import your Base model
+from app.config import DATABASE_URL
+from app.database import Base
+import app.models  # noqa: F401  (registers the tables on Base.metadata)
 
 # Alembic Config object, provides access to the .ini file values
 config = context.config
@@ -12,9 +13,6 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-# Database URL from environment or default to SQLite
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///raffle.db")
-
 # Metadata for Alembic autogenerate
 target_metadata = Base.metadata
 
@@ -23,9 +21,8 @@ target_metadata = Base.metadata
 # ----------------------------------------------------------------------
 def run_migrations_offline():
     """Run migrations in 'offline' mode."""
-    url = DATABASE_URL
     context.configure(
-        url=url,
+        url=DATABASE_URL,
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
@@ -40,14 +37,22 @@ def run_migrations_offline():
 def run_migrations_online():
     """Run migrations in 'online' mode with async engine."""
 
-    connectable = create_async_engine(DATABASE_URL, echo=True, future=True)
+    connectable = create_async_engine(DATABASE_URL, echo=False)
 
     async def do_run_migrations():
-        async with connectable.begin() as connection:
+        # connect(), not begin(): alembic owns the transactions, so a
+        # revision can leave them (autocommit_block) for CONCURRENTLY
+        # index builds and batched backfills
+        async with connectable.connect() as connection:
             await connection.run_sync(run_migrations)
+        await connectable.dispose()
 
-    async def run_migrations(connection):
-        context.configure(connection=connection, target_metadata=target_metadata)
+    def run_migrations(connection):
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=True,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,185 @@
+"""Adopt the schema create_all built
+
+Revision ID: 4b7e2c9d1a06
+Revises: 3fadea121585
+Create Date: 2026-10-18 22:40:00.000000
+
+The revisions before this one are empty; the schema was built by
+create_all at startup, which only ever added whole tables. This brings any
+such database, or an empty one, up to the models: missing tables are
+created and columns added to existing tables since are added nullable.
+The tables are spelled out below as they stood at this revision, not
+taken from app.models, so later model changes can't change what this
+revision does.
+Indexes on those columns and NOT NULL are left to the next revision,
+which can do them without locking the big tables.
+
+From here on every schema change is its own revision.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
+
+from app.online_migrations import add_column_if_missing
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e2c9d1a06'
+down_revision: Union[str, Sequence[str], None] = '3fadea121585'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _now():
+    return sa.func.now()
+
+
+def _tables() -> list:
+    """The models at this revision, in dependency order."""
+    meta = sa.MetaData()
+    return [
+        sa.Table(
+            "users", meta,
+            Column("id", Integer, primary_key=True),
+            Column("telegram_id", String, unique=True, index=True, nullable=False),
+            Column("username", String),
+            Column("email", String),
+            Column("balance", Integer),
+            Column("created_at", DateTime(timezone=True), server_default=_now()),
+        ),
+        sa.Table(
+            "raffles", meta,
+            Column("id", Integer, primary_key=True),
+            Column("slug", String, index=True, nullable=False),
+            Column("name", String, nullable=False),
+            Column("ticket_price", Integer, nullable=False),
+            Column("ticket_cap", Integer),
+            Column("close_at", DateTime(timezone=True)),
+            Column("tickets_reserved", Integer, server_default="0", nullable=False),
+            Column("tickets_sold", Integer, server_default="0", nullable=False),
+            Column("status", String, index=True, nullable=False),
+            Column("closed_by", String),
+            Column("created_at", DateTime(timezone=True), server_default=_now()),
+            Column("closed_at", DateTime(timezone=True)),
+        ),
+        sa.Table(
+            "tickets", meta,
+            Column("id", Integer, primary_key=True),
+            Column("code", String, unique=True, index=True, nullable=False),
+            Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+            Column("raffle_id", Integer, ForeignKey("raffles.id"), index=True),
+            Column("created_at", DateTime(timezone=True), server_default=_now()),
+            Index("ix_tickets_raffle_user", "raffle_id", "user_id"),
+        ),
+        sa.Table(
+            "tickets_archive", meta,
+            Column("id", Integer, primary_key=True),
+            Column("code", String, index=True, nullable=False),
+            Column("user_id", Integer, nullable=False),
+            Column("raffle_id", Integer, index=True),
+            Column("created_at", DateTime(timezone=True)),
+            Column("archived_at", DateTime(timezone=True), server_default=_now()),
+        ),
+        sa.Table(
+            "raffle_entries", meta,
+            Column("id", Integer, primary_key=True),
+            Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+            Column("raffle_id", Integer, ForeignKey("raffles.id"), index=True),
+            Column("reference", String, unique=True, index=True, nullable=False),
+            Column("amount", Integer, nullable=False),
+            Column("quantity", Integer, nullable=False),
+            Column("confirmed", Boolean),
+            Column("created_at", DateTime(timezone=True), server_default=_now()),
+            Index("ix_raffle_entries_confirmed_created", "confirmed", "created_at"),
+            Index("ix_raffle_entries_raffle_confirmed", "raffle_id", "confirmed"),
+        ),
+        sa.Table(
+            "raffle_entries_archive", meta,
+            Column("id", Integer, primary_key=True),
+            Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+            Column("raffle_id", Integer, index=True),
+            Column("reference", String, unique=True, index=True, nullable=False),
+            Column("amount", Integer, nullable=False),
+            Column("quantity", Integer, nullable=False),
+            Column("confirmed", Boolean),
+            Column("created_at", DateTime(timezone=True)),
+            Column("archived_at", DateTime(timezone=True), server_default=_now()),
+        ),
+        sa.Table(
+            "transactions", meta,
+            Column("id", Integer, primary_key=True),
+            Column("reference", String, index=True),
+            Column("amount", Integer),
+            Column("status", String),
+            Column("user_id", Integer, ForeignKey("users.id")),
+            Column("raffle_id", Integer, ForeignKey("raffles.id"), index=True),
+            Column("created_at", DateTime(timezone=True), server_default=_now()),
+        ),
+        sa.Table(
+            "pending_verifications", meta,
+            Column("id", Integer, primary_key=True),
+            Column("reference", String, unique=True, nullable=False),
+            Column("attempts", Integer, nullable=False),
+            Column("next_attempt_at", DateTime(timezone=True), server_default=_now(), index=True),
+            Column("last_error", String),
+            Column("created_at", DateTime(timezone=True), server_default=_now()),
+        ),
+        sa.Table(
+            "wallet_ledger", meta,
+            Column("id", Integer, primary_key=True),
+            Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+            Column("amount", Integer, nullable=False),
+            Column("kind", String, nullable=False),
+            Column("reference", String, unique=True, nullable=False),
+            Column("note", String),
+            Column("created_at", DateTime(timezone=True), server_default=_now()),
+            Index("ix_wallet_ledger_user_id", "user_id", "id"),
+        ),
+        sa.Table(
+            "winners", meta,
+            Column("id", Integer, primary_key=True),
+            Column("ticket_code", String, index=True),
+            Column("user_id", Integer),
+            Column("raffle_id", Integer, ForeignKey("raffles.id"), index=True),
+            Column("announced_by", String),
+            Column("created_at", DateTime(timezone=True), server_default=_now()),
+        ),
+        sa.Table(
+            "revenue_rollups", meta,
+            Column("id", Integer, primary_key=True),
+            Column("bucket", DateTime(timezone=True), nullable=False),
+            Column("raffle_id", Integer, nullable=False),
+            Column("entries_created", Integer, nullable=False),
+            Column("entries_confirmed", Integer, nullable=False),
+            Column("tickets", Integer, nullable=False),
+            Column("revenue", Integer, nullable=False),
+            sa.UniqueConstraint("bucket", "raffle_id", name="uq_revenue_rollups_bucket_raffle"),
+        ),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    existing = set(sa.inspect(bind).get_table_names())
+
+    for table in _tables():
+        if table.name not in existing:
+            table.create(bind)
+            continue
+        for column in table.columns:
+            default = column.server_default.arg if column.server_default is not None else None
+            if bind.dialect.name == "sqlite" and not isinstance(default, (str, type(None))):
+                default = None  # SQLite can only ADD COLUMN with a constant default
+            add_column_if_missing(
+                table.name,
+                sa.Column(column.name, column.type, server_default=default, nullable=True),
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # nothing to undo safely: the tables and columns predate alembic
+    pass
@@ -0,0 +1,119 @@
+"""Online indexes on tickets and entries, backfilled raffle counters
+
+Revision ID: 9d3a6f0e8c17
+Revises: 4b7e2c9d1a06
+Create Date: 2026-10-18 22:45:00.000000
+
+Rows from before raffle rounds (raffle_id NULL) are assigned to the
+default raffle, which is created if there is no open raffle to give
+them to.
+
+Safe on a live database with millions of tickets: indexes are built
+CONCURRENTLY, backfills run in throttled batches, and NOT NULL is added
+through a validated check constraint. Every step is a no-op if already
+done, so an interrupted run can simply be rerun.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import DEFAULT_RAFFLE_SLUG
+from app.utils import TICKET_PRICE
+from app.online_migrations import (
+    backfill,
+    create_index_concurrently,
+    drop_index_concurrently,
+    set_not_null,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3a6f0e8c17'
+down_revision: Union[str, Sequence[str], None] = '4b7e2c9d1a06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_raffles_slug", "raffles", ["slug"]),
+    ("ix_raffles_status", "raffles", ["status"]),
+    ("ix_tickets_raffle_id", "tickets", ["raffle_id"]),
+    ("ix_tickets_raffle_user", "tickets", ["raffle_id", "user_id"]),
+    ("ix_raffle_entries_raffle_id", "raffle_entries", ["raffle_id"]),
+    ("ix_raffle_entries_confirmed_created", "raffle_entries", ["confirmed", "created_at"]),
+    ("ix_raffle_entries_raffle_confirmed", "raffle_entries", ["raffle_id", "confirmed"]),
+    ("ix_transactions_raffle_id", "transactions", ["raffle_id"]),
+    ("ix_winners_raffle_id", "winners", ["raffle_id"]),
+]
+
+# tables whose rows predate rounds and may have no raffle_id
+LEGACY_TABLES = ("tickets", "raffle_entries", "transactions", "winners")
+
+
+def _default_raffle_id():
+    """
+    The raffle legacy rows belong to: the oldest open one of the default
+    series, else the oldest open one, else a new default raffle. None if
+    there are no legacy rows to assign.
+    """
+    bind = op.get_bind()
+    if not any(
+        bind.execute(sa.text(f"SELECT 1 FROM {t} WHERE raffle_id IS NULL LIMIT 1")).first()
+        for t in LEGACY_TABLES
+    ):
+        return None
+
+    find = ("SELECT id FROM raffles WHERE status = 'open' {} ORDER BY id LIMIT 1")
+    raffle_id = (
+        bind.execute(sa.text(find.format("AND slug = :slug")), {"slug": DEFAULT_RAFFLE_SLUG}).scalar()
+        or bind.execute(sa.text(find.format(""))).scalar()
+    )
+    if raffle_id is None:
+        raffle_id = bind.execute(
+            sa.text(
+                "INSERT INTO raffles (slug, name, ticket_price, status, "
+                "tickets_reserved, tickets_sold) "
+                "VALUES (:slug, 'MegaWin Raffle', :price, 'open', 0, 0) RETURNING id"
+            ),
+            {"slug": DEFAULT_RAFFLE_SLUG, "price": int(TICKET_PRICE)},
+        ).scalar()
+    return raffle_id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # the counter backfill below looks tickets up by raffle_id
+    for name, table, columns in INDEXES:
+        create_index_concurrently(name, table, columns)
+
+    # raffles that predate the catalog
+    backfill("raffles", "slug = 'main'", where="slug IS NULL")
+    backfill("raffles", "name = 'Raffle #' || id", where="name IS NULL")
+    backfill("raffles", f"ticket_price = {int(TICKET_PRICE)}", where="ticket_price IS NULL")
+    backfill("raffles", "status = 'open'", where="status IS NULL")
+
+    # legacy rows join the default raffle, so its counters and draws see them
+    raffle_id = _default_raffle_id()
+    if raffle_id is not None:
+        for table in LEGACY_TABLES:
+            backfill(table, f"raffle_id = {int(raffle_id)}", where="raffle_id IS NULL")
+
+    # inventory counters start from the tickets already issued
+    backfill(
+        "raffles",
+        "tickets_reserved = coalesce(tickets_reserved, 0), "
+        "tickets_sold = (SELECT count(*) FROM tickets t WHERE t.raffle_id = raffles.id)",
+        where="tickets_sold IS NULL OR tickets_sold = 0",
+        batch_size=100,
+    )
+
+    for column in ("slug", "name", "ticket_price", "status",
+                   "tickets_reserved", "tickets_sold"):
+        set_not_null("raffles", column)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # the columns and their NOT NULL stay; they're what the models expect
+    for name, table, _ in reversed(INDEXES):
+        drop_index_concurrently(name, table)
@@ -0,0 +1,44 @@
+"""Add the webhook_events log
+
+Revision ID: b5d1e8f3a274
+Revises: e7a94b2c6d58
+Create Date: 2026-10-19 00:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.online_migrations import has_table
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d1e8f3a274'
+down_revision: Union[str, Sequence[str], None] = 'e7a94b2c6d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if has_table("webhook_events"):  # created by create_all on a dev database
+        return
+    op.create_table(
+        "webhook_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("received_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("event", sa.String()),
+        sa.Column("reference", sa.String()),
+        sa.Column("signature", sa.String()),
+        sa.Column("body", sa.LargeBinary(), nullable=False),
+    )
+    op.create_index("ix_webhook_events_received_at", "webhook_events", ["received_at"])
+    op.create_index("ix_webhook_events_reference", "webhook_events", ["reference"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_webhook_events_reference", table_name="webhook_events")
+    op.drop_index("ix_webhook_events_received_at", table_name="webhook_events")
+    op.drop_table("webhook_events")
@@ -0,0 +1,49 @@
+"""Add the jobs table for the scheduler
+
+Revision ID: c2f81d5a3e49
+Revises: 9d3a6f0e8c17
+Create Date: 2026-10-18 23:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.online_migrations import has_table
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f81d5a3e49'
+down_revision: Union[str, Sequence[str], None] = '9d3a6f0e8c17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if has_table("jobs"):  # created by create_all on a dev database
+        return
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("key", sa.String(), nullable=False, unique=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("raffle_id", sa.Integer(), sa.ForeignKey("raffles.id")),
+        sa.Column("run_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("status", sa.String(), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("progress", sa.Integer()),
+        sa.Column("locked_by", sa.String()),
+        sa.Column("locked_until", sa.DateTime(timezone=True)),
+        sa.Column("last_error", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("finished_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_jobs_status_run_at", "jobs", ["status", "run_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_jobs_status_run_at", table_name="jobs")
+    op.drop_table("jobs")
@@ -0,0 +1,35 @@
+"""Indexes for audience segments
+
+Revision ID: e7a94b2c6d58
+Revises: c2f81d5a3e49
+Create Date: 2026-10-18 23:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from app.online_migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a94b2c6d58'
+down_revision: Union[str, Sequence[str], None] = 'c2f81d5a3e49'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_users_created_at", "users", ["created_at"]),
+    ("ix_transactions_raffle_status_user", "transactions", ["raffle_id", "status", "user_id"]),
+    ("ix_transactions_status_user_amount", "transactions", ["status", "user_id", "amount"]),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        create_index_concurrently(name, table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        drop_index_concurrently(name, table)
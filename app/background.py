@@ -0,0 +1,40 @@
+# app/background.py
+import asyncio
+
+from app.config import (
+    TICKET_INDEX_ENABLED,
+    SNAPSHOT_PATH,
+    PAYSTACK_SECRET,
+    RECONCILE_INTERVAL_SECONDS,
+    SCHEDULER_ENABLED,
+)
+from app.reaper import run_reaper
+from app.verify_queue import run_verify_queue
+
+# The loops every long-running process needs, whichever way it gets
+# Telegram updates: the web service starts them on startup, the polling
+# worker (render.yaml's only long-running service) in app/polling.py.
+# Where both run, the scheduler's lease picks one leader and the others'
+# updates are conditional, so running twice does no work twice.
+
+
+def start_background() -> list:
+    """Starts the background loops this deployment has configured; returns their tasks."""
+    tasks = [
+        asyncio.create_task(run_reaper()),  # releases the holds of unpaid entries
+        asyncio.create_task(run_verify_queue()),  # verifies payments queued in an outage
+    ]
+    if SCHEDULER_ENABLED:
+        from app.scheduler import run_scheduler
+        tasks.append(asyncio.create_task(run_scheduler()))
+    if PAYSTACK_SECRET and RECONCILE_INTERVAL_SECONDS:
+        # also the only way payments are confirmed where no webhook reaches us
+        from app.reconcile import run_reconciler
+        tasks.append(asyncio.create_task(run_reconciler()))
+    if TICKET_INDEX_ENABLED:
+        from app.ticket_index import load_index
+        tasks.append(asyncio.create_task(load_index()))
+        if SNAPSHOT_PATH:
+            from app.ticket_snapshot import run_snapshots
+            tasks.append(asyncio.create_task(run_snapshots()))
+    return tasks
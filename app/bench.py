@@ -0,0 +1,489 @@
+# app/bench.py
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Before/after benchmarks on app.seed data:
+#   python -m app.bench archive [--rounds 6 --tickets 1200000]
+#   python -m app.bench webhook [--requests 2000 --concurrency 32]
+#   python -m app.bench polling [--requests 2000 --concurrency 16 --api-ms 50]
+# Each scenario seeds a fresh SQLite file in a temp directory, or the
+# database at --url, which is emptied first.
+
+
+def _ms(samples: list, p: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return round(samples[min(int(len(samples) * p), len(samples) - 1)] * 1000, 2)
+
+
+async def _timed(fn, n: int) -> dict:
+    """Awaits fn(i) for i in range(n), one at a time; p50/p95 latency."""
+    lat = []
+    for i in range(n):
+        t = time.perf_counter()
+        await fn(i)
+        lat.append(time.perf_counter() - t)
+    return {"p50_ms": _ms(lat, 0.50), "p95_ms": _ms(lat, 0.95)}
+
+
+async def _load(send, n: int, concurrency: int) -> dict:
+    """
+    Awaits send(i) for i in range(n), `concurrency` at a time. send
+    returns a status label; gives throughput, latency and the labels.
+    """
+    from collections import Counter
+
+    statuses, lat = Counter(), []
+    todo = iter(range(n))
+
+    async def worker():
+        for i in todo:  # shared iterator: each request goes to one worker
+            t = time.perf_counter()
+            try:
+                statuses[await send(i)] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            lat.append(time.perf_counter() - t)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "per_s": round(n / elapsed, 1),
+        "p50_ms": _ms(lat, 0.50),
+        "p95_ms": _ms(lat, 0.95),
+        "statuses": dict(statuses),
+    }
+
+
+def _table(results: dict):
+    """Prints {probe: {column: {metric: value}}} as one row per probe and metric."""
+    columns = list(next(iter(results.values())))
+    print(f"{'':<28}" + "".join(f"{c:>12}" for c in columns))
+    for probe, by_column in results.items():
+        for metric in by_column[columns[0]]:
+            print(f"{probe + ' ' + metric:<28}"
+                  + "".join(f"{by_column[c][metric]:>12}" for c in columns))
+
+
+# ============================================================
+#                          ARCHIVE
+# ============================================================
+async def _archive_probes(samples: int, rng: random.Random) -> dict:
+    """Latency of the hot-path queries that grow with the tickets and entries tables."""
+    from datetime import datetime, timedelta, timezone
+
+    from sqlalchemy import select, func
+
+    from app.config import ENTRY_TTL_MINUTES
+    from app.database import async_session, read_session
+    from app.issuance import confirm_payment
+    from app.models import RaffleEntry, Ticket
+    from app.raffles import active_raffle_id, invalidate_catalog
+
+    invalidate_catalog()
+    async with read_session() as db:
+        open_id = await active_raffle_id(db)
+        codes = (await db.execute(
+            select(Ticket.code).where(Ticket.raffle_id == open_id).limit(samples * 20)
+        )).scalars().all()
+        holders = (await db.execute(
+            select(Ticket.user_id).where(Ticket.raffle_id == open_id).distinct().limit(samples * 20)
+        )).scalars().all()
+        # each pass confirms its own slice of the open round's unpaid entries
+        pending = (await db.execute(
+            select(RaffleEntry.reference, RaffleEntry.amount)
+            .where(RaffleEntry.raffle_id == open_id, RaffleEntry.confirmed.is_(False))
+            .order_by(func.random())
+            .limit(samples)
+        )).all()
+    codes = rng.sample(codes, min(samples, len(codes)))
+    holders = rng.sample(holders, min(samples, len(holders)))
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=ENTRY_TTL_MINUTES)
+
+    async def lookup(i):  # ticket_owner
+        async with read_session() as db:
+            (await db.execute(select(Ticket.raffle_id, Ticket.user_id).where(
+                Ticket.code == codes[i % len(codes)], Ticket.raffle_id.in_([open_id])
+            ))).one_or_none()
+
+    async def my_tickets(i):  # tickets_view
+        async with read_session() as db:
+            (await db.execute(select(Ticket.code).where(
+                Ticket.user_id == holders[i % len(holders)], Ticket.raffle_id == open_id
+            ))).all()
+
+    async def reaper_scan(i):  # reap_once's select
+        async with read_session() as db:
+            (await db.execute(
+                select(RaffleEntry.id)
+                .where(RaffleEntry.confirmed.is_(False), RaffleEntry.created_at < cutoff)
+                .order_by(RaffleEntry.id).limit(500)
+            )).all()
+
+    async def draw_count(i):  # draw_ticket without the index
+        async with read_session() as db:
+            (await db.execute(
+                select(func.count(Ticket.id)).where(Ticket.raffle_id == open_id)
+            )).one()
+
+    async def confirm(i):  # the webhook's confirmation
+        try:
+            await confirm_payment(*pending[i])
+        except Exception as e:  # e.g. a random ticket code that's taken
+            print(f"  confirmation failed: {e!r:.120}", file=sys.stderr)
+
+    async with async_session() as db:
+        sizes = {
+            "tickets": (await db.execute(select(func.count(Ticket.id)))).scalar(),
+            "entries": (await db.execute(select(func.count(RaffleEntry.id)))).scalar(),
+        }
+    return {
+        "rows": sizes,
+        "ticket lookup": await _timed(lookup, samples),
+        "my tickets": await _timed(my_tickets, samples),
+        "reaper scan": await _timed(reaper_scan, max(samples // 10, 1)),
+        "draw count": await _timed(draw_count, max(samples // 10, 1)),
+        "confirm payment": await _timed(confirm, len(pending)),
+    }
+
+
+async def archive(args) -> dict:
+    """
+    Seeds `rounds` rounds with the closed ones still in the hot tables,
+    measures, archives every closed round with archive_round, measures again.
+    """
+    from sqlalchemy import select
+
+    from app.database import async_session
+    from app.models import Raffle
+    from app.raffles import archive_round
+    from app.seed import seed
+
+    print(f"Seeding {args.users:,} users, {args.tickets:,} tickets in {args.rounds} rounds…",
+          file=sys.stderr)
+    await seed(args.url, args.users, args.tickets, args.rounds, reset=True, archived=False)
+
+    rng = random.Random(args.seed)
+    before = await _archive_probes(args.samples, rng)
+
+    async with async_session() as db:
+        closed = (await db.execute(
+            select(Raffle.id).where(Raffle.status == "closed").order_by(Raffle.id)
+        )).scalars().all()
+    print(f"Archiving {len(closed)} closed rounds…", file=sys.stderr)
+    started = time.perf_counter()
+    moved = 0
+    for raffle_id in closed:
+        moved += await archive_round(raffle_id)
+    took = time.perf_counter() - started
+
+    after = await _archive_probes(args.samples, rng)
+    return {
+        "archived": {"rounds": len(closed), "rows_moved": moved, "seconds": round(took, 1)},
+        "before": before,
+        "after": after,
+    }
+
+
+def _print_archive(report: dict):
+    a = report["archived"]
+    print(f"archive_round: {a['rounds']} rounds, {a['rows_moved']:,} rows in {a['seconds']}s\n")
+    print(f"{'hot rows':<28}{'before':>12}{'after':>12}")
+    for table, n in report["before"]["rows"].items():
+        print(f"{table:<28}{n:>12,}{report['after']['rows'][table]:>12,}")
+    print()
+    _table({
+        probe: {"before": report["before"][probe], "after": report["after"][probe]}
+        for probe in report["before"] if probe != "rows"
+    })
+
+
+# ============================================================
+#                          WEBHOOK
+# ============================================================
+_WEBHOOK_SECRET = "bench-webhook-secret"
+
+
+async def webhook(args) -> dict:
+    """
+    Posts Paystack webhooks through the real handler, in process: bad
+    signatures, signed events the handler ignores, and signed
+    charge.success for seeded unpaid entries (verified against the
+    in-process stand-in, then confirmed).
+    """
+    import hashlib
+    import hmac
+
+    import httpx
+    from sqlalchemy import select
+
+    os.environ["PAYSTACK_WEBHOOK_SECRET"] = _WEBHOOK_SECRET  # before the router reads it
+
+    from app import paystack, paystack_standin, webhook_store
+    from app.database import async_session
+    from app.main import app
+    from app.models import RaffleEntry
+    from app.seed import seed
+
+    n = args.requests
+    print(f"Seeding {args.users:,} users, {args.tickets:,} tickets…", file=sys.stderr)
+    # enough unpaid entries to confirm one per charge.success request
+    await seed(args.url, args.users, args.tickets, reset=True,
+               pending=min(0.9, max(0.15, n * 4 / max(args.tickets, 1))))
+
+    async with async_session() as db:
+        pending = (await db.execute(
+            select(RaffleEntry.reference, RaffleEntry.amount)
+            .where(RaffleEntry.confirmed.is_(False))
+            .order_by(RaffleEntry.id)
+            .limit(n)
+        )).all()
+    charges = []
+    for reference, amount in pending:
+        tx = {"reference": reference, "amount": amount * 100, "status": "success",
+              "customer": {"email": ""}, "metadata": {}}
+        paystack_standin._transactions[reference] = tx
+        charges.append(json.dumps({"event": "charge.success", "data": tx}).encode())
+    others = [
+        json.dumps({"event": "transfer.success", "data": {"reference": f"TRF-{i}"}}).encode()
+        for i in range(n)
+    ]
+
+    paystack._client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=paystack_standin.app), base_url="http://standin"
+    )
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    def sign(body: bytes) -> str:
+        return hmac.new(_WEBHOOK_SECRET.encode(), body, hashlib.sha512).hexdigest()
+
+    def poster(bodies, signed: bool):
+        async def send(i):
+            body = bodies[i % len(bodies)]
+            resp = await client.post("/webhook/paystack", content=body, headers={
+                "content-type": "application/json",
+                "x-paystack-signature": sign(body) if signed else "0" * 128,
+            })
+            if resp.status_code != 200:
+                return f"http_{resp.status_code}"
+            return resp.json().get("status")
+        return send
+
+    report = {}
+    async with client:
+        for case, send, count in (
+            ("invalid signature", poster(charges, False), n),
+            ("signed, ignored event", poster(others, True), n),
+            ("signed charge.success", poster(charges, True), len(charges)),
+        ):
+            print(f"Posting {count:,} x {case}…", file=sys.stderr)
+            report[case] = await _load(send, count, args.concurrency)
+        await webhook_store.flush()
+    await paystack.close_client()
+    return report
+
+
+def _print_load(report: dict):
+    print(f"{'':<24}{'per_s':>10}{'p50_ms':>10}{'p95_ms':>10}  statuses")
+    for case, r in report.items():
+        print(f"{case:<24}{r['per_s']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}  {r['statuses']}")
+
+
+# ============================================================
+#                      POLLING VS WEBHOOK
+# ============================================================
+def _bot_api(updates: list, api_seconds: float):
+    """
+    In-memory Bot API for a Bot(session=...): getUpdates hands out
+    `updates` by offset, every other call takes `api_seconds` (the round
+    trip to Telegram). Replies are timed against their update's delivery,
+    keyed by chat.
+    """
+    from collections import defaultdict, deque
+    from datetime import datetime
+
+    from aiogram.client.session.base import BaseSession
+    from aiogram.methods import DeleteWebhook, GetUpdates, SendMessage
+    from aiogram.types import Chat, Message
+
+    class BotAPI(BaseSession):
+        def __init__(self):
+            super().__init__()
+            self.pending = list(updates)
+            self.handed_out = set()  # update ids getUpdates has returned
+            self.delivered = defaultdict(deque)  # chat id -> delivery times
+            self.latencies = []
+            self.all_replied = asyncio.Event()
+
+        def deliver(self, chat_id: int):
+            self.delivered[chat_id].append(time.perf_counter())
+
+        async def make_request(self, bot, method, timeout=None):
+            await asyncio.sleep(api_seconds)
+            if isinstance(method, GetUpdates):
+                if method.offset is not None:
+                    self.pending = [u for u in self.pending if u.update_id >= method.offset]
+                batch = self.pending[:method.limit or 100]
+                if not batch:
+                    await asyncio.sleep(method.timeout or 0)  # long poll, nothing new
+                for u in batch:
+                    if u.update_id not in self.handed_out:  # redelivery isn't delivery
+                        self.handed_out.add(u.update_id)
+                        self.deliver(u.message.chat.id)
+                return batch
+            if isinstance(method, DeleteWebhook):
+                return True
+            if isinstance(method, SendMessage):
+                sent = self.delivered[method.chat_id]
+                if sent:
+                    self.latencies.append(time.perf_counter() - sent.popleft())
+                if len(self.latencies) == len(updates):
+                    self.all_replied.set()
+                return Message(message_id=len(self.latencies), date=datetime.now(),
+                               chat=Chat(id=method.chat_id, type="private"), text=method.text)
+            return True
+
+        async def close(self):
+            pass
+
+        async def stream_content(self, *args, **kwargs):
+            raise NotImplementedError
+
+    return BotAPI()
+
+
+async def polling(args) -> dict:
+    """
+    Feeds the same burst of /tickets and /balance messages from seeded
+    users through the real dispatcher twice: as webhooks posted to
+    /webhook/telegram `concurrency` at a time (Telegram's max_connections),
+    and through run_polling with POLLING_CONCURRENCY = `concurrency`.
+    Latency is from delivery (the POST, or the getUpdates response) to
+    the reply.
+    """
+    import signal
+
+    import httpx
+    from aiogram import Bot
+    from aiogram.types import Update
+
+    os.environ["BOT_MODE"] = "webhook"  # before app.main decides on the route
+
+    from app.main import _dispatcher, app
+    from app.polling import run_polling
+    from app.seed import seed
+    from app.telegram import set_bot
+
+    n = args.requests
+    print(f"Seeding {args.users:,} users, {args.tickets:,} tickets…", file=sys.stderr)
+    await seed(args.url, args.users, args.tickets, reset=True)
+
+    rng = random.Random(args.seed)
+    bodies = []
+    for i in range(n):
+        tg_id = 7_000_000_000 + rng.randint(1, args.users)  # app.seed's telegram ids
+        bodies.append({
+            "update_id": i + 1,
+            "message": {
+                "message_id": i + 1, "date": int(time.time()),
+                "chat": {"id": tg_id, "type": "private"},
+                "from": {"id": tg_id, "is_bot": False, "first_name": "Bench"},
+                "text": "/tickets" if i % 2 else "/balance",
+            },
+        })
+    api_seconds = args.api_ms / 1000
+    report = {}
+
+    # webhook: each POST is answered once its handler has replied
+    api = _bot_api([], api_seconds)
+    set_bot(Bot("1:bench", session=api))
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    async def post(i):
+        resp = await client.post("/webhook/telegram", json=bodies[i])
+        return "ok" if resp.status_code == 200 else f"http_{resp.status_code}"
+
+    print(f"Posting {n:,} updates to /webhook/telegram…", file=sys.stderr)
+    async with client:
+        report["webhook"] = await _load(post, n, args.concurrency)
+
+    # polling: the same updates, waiting in getUpdates
+    api = _bot_api([Update.model_validate(b) for b in bodies], api_seconds)
+    bot = Bot("1:bench", session=api)
+    set_bot(bot)
+
+    async def stop_when_replied():
+        await api.all_replied.wait()
+        os.kill(os.getpid(), signal.SIGTERM)  # run_polling's own shutdown path
+
+    print(f"Polling {n:,} updates…", file=sys.stderr)
+    started = time.perf_counter()
+    watcher = asyncio.create_task(stop_when_replied())
+    await run_polling(bot, _dispatcher(), concurrency=args.concurrency)
+    elapsed = time.perf_counter() - started
+    watcher.cancel()
+    report["polling"] = {
+        "per_s": round(len(api.latencies) / elapsed, 1),
+        "p50_ms": _ms(api.latencies, 0.50),
+        "p95_ms": _ms(api.latencies, 0.95),
+        "statuses": {"replied": len(api.latencies)},
+    }
+    return report
+
+
+SCENARIOS = {
+    "archive": (archive, _print_archive),
+    "webhook": (webhook, _print_load),
+    "polling": (polling, _print_load),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m app.bench", description="Before/after benchmarks on seeded data.",
+    )
+    parser.add_argument("scenario", choices=SCENARIOS)
+    parser.add_argument("--url", help="database to seed and measure (emptied first); "
+                                      "default a temporary SQLite file")
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--tickets", type=int, default=600_000)
+    parser.add_argument("--rounds", type=int, default=6,
+                        help="archive: the last is open, the rest are archived during the run")
+    parser.add_argument("--samples", type=int, default=500,
+                        help="archive: timed calls per probe")
+    parser.add_argument("--requests", type=int, default=2_000,
+                        help="webhook, polling: requests (updates) per case")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight")
+    parser.add_argument("--api-ms", type=float, default=50,
+                        help="polling: simulated Bot API round trip per call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="print the raw report")
+    args = parser.parse_args()
+
+    workdir = None
+    if not args.url:
+        workdir = tempfile.mkdtemp(prefix="bench_")
+        args.url = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+    # before anything reads app.config
+    os.environ["DATABASE_URL"] = args.url
+    os.environ["TICKET_INDEX_ENABLED"] = "0"  # measure the database, not the in-memory index
+
+    run, show = SCENARIOS[args.scenario]
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        show(report)
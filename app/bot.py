@@ -1,5 +1,11 @@
 # app/bot.py
+import asyncio
+import logging
 import os
+import random
+import tempfile
+from functools import partial
+from datetime import datetime, timedelta, timezone
 
 # Try to import real libraries, but provide minimal local stubs when running static analysis
 try:
@@ -10,8 +16,9 @@ try:
         CallbackQuery,
         InlineKeyboardMarkup,
         InlineKeyboardButton,
+        FSInputFile,
     )
-except Exception:
+except ImportError:
     # Minimal stubs to satisfy import resolution / type checking
     class Bot:
         pass
@@ -66,9 +73,9 @@ except Exception:
 
 # SQLAlchemy fallbacks for static analysis
 try:
-    from sqlalchemy import select, insert
+    from sqlalchemy import select, insert, func
     from sqlalchemy.exc import SQLAlchemyError
-except Exception:
+except ImportError:
     def select(*args, **kwargs):
         return ("_select", args, kwargs)
 
@@ -78,100 +85,70 @@ except Exception:
     class SQLAlchemyError(Exception):
         pass
 
-# Minimal async_session and model stubs if application modules are not resolved
-try:
-    from app.database import async_session
-    from app.models import User, Ticket, RaffleEntry, Transaction, Winner
-    from app.utils import referral_link, TICKET_PRICE
-except Exception:
-    # Async session stub that supports "async with async_session() as db:"
-    class _AsyncSessionFactory:
-        def __call__(self):
-            return self
-
-        async def __aenter__(self):
-            return self
-
-        async def __aexit__(self, exc_type, exc, tb):
-            return False
-
-        async def execute(self, *args, **kwargs):
-            class _R:
-                def scalar_one_or_none(self):
-                    return None
-
-                def scalar_one(self):
-                    return None
-
-                def scalars(self):
-                    class _S:
-                        def all(self):
-                            return []
-
-                        def first(self):
-                            return None
-                    return _S()
-            return _R()
-
-        async def commit(self):
-            return None
-
-    async_session = _AsyncSessionFactory()
-
-    # Minimal model stubs with attributes referenced by the bot code
-    class User:
-        def __init__(self, telegram_id="0", username="", email="", balance=0):
-            self.telegram_id = telegram_id
-            self.username = username
-            self.email = email
-            self.balance = balance
-            self.id = 0
-
-    class Ticket:
-        def __init__(self, code="", user_id=0):
-            self.code = code
-            self.user_id = user_id
-
-    class RaffleEntry:
-        def __init__(self, user_id=0, reference="", amount=0, quantity=0, confirmed=False):
-            self.user_id = user_id
-            self.reference = reference
-            self.amount = amount
-            self.quantity = quantity
-            self.confirmed = confirmed
-
-    class Transaction:
-        pass
-
-    class Winner:
-        pass
-
-    # utils fallback
-    def referral_link(bot_username, user_id):
-        return f"https://t.me/{bot_username}?start={user_id}"
-
-    TICKET_PRICE = 500
+# Application modules: imported unconditionally, so a bug in one fails
+# the start instead of leaving the bot running on stubs
+from app.database import async_session, read_session, pin_primary
+from app.models import User, Raffle, Ticket, RaffleEntry, Winner, Job
+from app.utils import referral_link
+from app.raffles import (
+    active_raffle_id,
+    open_raffles,
+    get_raffle,
+    is_selling,
+    create_raffle,
+    close_round,
+    archive_round,
+)
+from app.navigation import show
+from app.inventory import remaining, reserve
+from app.issuance import pay_from_wallet
+from app.wallet import KINDS, balance_of, credit
+from app.breaker import OPEN, CircuitOpen
+from app.paystack import breaker as paystack_breaker, create_paystack_payment
+from app.config import (
+    TICKET_INDEX_ENABLED,
+    SNAPSHOT_PATH,
+    BUY_TIERS,
+    ENTRY_TTL_MINUTES,
+    CHANNEL_USERNAME,
+)
+from app.membership import MembershipGate, is_member
+from app.ticket_index import sync_index, checked_index, drop_index, index_issued
+from app.ticket_snapshot import write_snapshot, remove_snapshot
+from app.rollups import bump
+from app.scheduler import schedule, schedule_raffle
+from app.send_rate import send_many
+from app.segments import (
+    PRESETS as SEGMENT_PRESETS,
+    SegmentError,
+    iter_pages,
+    parse,
+    segment_size,
+)
 
 # Router instance (real or stub)
 router = Router()
 
-# Placeholder bot variable (set by application bootstrap if available)
-bot = None
+log = logging.getLogger(__name__)
+fallback_log = logging.getLogger("app.bot.fallback")
+
+# Strong refs to fire-and-forget tasks so they aren't garbage collected
+_background = set()
 
-# Simple async stub for initiate_paystack_payment used by purchase flow so name is defined
 async def initiate_paystack_payment(amount: int, email: str, tg_id: int):
-    """
-    Placeholder payment initializer used during static analysis and tests;
-    replace with real implementation that calls Paystack in production.
-    """
-    # Return a dummy checkout URL and reference
-    return "https://paystack.com/checkout/example", "ref_stub_123"
+    """(checkout_url, reference); raises CircuitOpen while Paystack is down."""
+    return await create_paystack_payment(email, amount, tg_id)
+
+
+PAYSTACK_DOWN_TEXT = (
+    "⚠️ Card payments are having trouble right now. "
+    "Please try again in a few minutes."
+)
 
 # -------------------------
 # Config
 # -------------------------
 BOT_USERNAME = os.getenv("BOT_USERNAME", "MegaWinRaffleBot")
-CHANNEL_USERNAME = os.getenv("CHANNEL_USERNAME", "@MegaWinRaffle")
 
 ADMINS = []
 _raw_admins = os.getenv("ADMIN_ID", "") or os.getenv("ADMINS", "")
@@ -200,65 +177,198 @@ def main_menu() -> InlineKeyboardMarkup:
     ])
 
 
-def buy_menu() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="Buy 1 (₦500)", callback_data="buy_1"),
-            InlineKeyboardButton(text="Buy 5 (₦2500)", callback_data="buy_5"),
-        ],
-        [
-            InlineKeyboardButton(text="Buy 10 (₦5000)", callback_data="buy_10"),
-        ],
-        [InlineKeyboardButton(text="⬅ Back", callback_data="back")],
-    ])
+def buy_menu(raffle: dict) -> InlineKeyboardMarkup:
+    price = raffle["ticket_price"]
+    buttons = [
+        InlineKeyboardButton(
+            text=f"Buy {q} (₦{q * price:,})",
+            callback_data=f"buy_{raffle['id']}_{q}",
+        )
+        for q in BUY_TIERS
+    ]
+    rows = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+    rows.append([InlineKeyboardButton(text="⬅ Back", callback_data="back")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def raffle_menu(raffles: list) -> InlineKeyboardMarkup:
+    rows = [
+        [InlineKeyboardButton(
+            text=f"{r['name']} – ₦{r['ticket_price']:,}/ticket",
+            callback_data=f"raffle_{r['id']}",
+        )]
+        for r in raffles
+    ]
+    rows.append([InlineKeyboardButton(text="⬅ Back", callback_data="back")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def raffle_view(raffle: dict) -> dict:
+    return {
+        "text": f"🎟 {raffle['name']}\nChoose ticket quantity:",
+        "reply_markup": buy_menu(raffle),
+    }
+
+
+async def buy_view() -> dict:
+    """Quantity menu when one raffle is on sale, a raffle picker otherwise."""
+    async with read_session() as db:
+        raffles = [r for r in await open_raffles(db) if is_selling(r)]
+
+    if not raffles:
+        return {
+            "text": "No raffle is on sale right now. Check back soon!",
+            "reply_markup": main_menu(),
+        }
+    if len(raffles) == 1:
+        return raffle_view(raffles[0])
+    return {"text": "Choose a raffle:", "reply_markup": raffle_menu(raffles)}
 
 
 # =========================
 # SHARED LOGIC (IMPORTANT)
 # =========================
-async def show_tickets(msg: Message):
-    async with async_session() as db:
-        q = await db.execute(select(User).where(User.telegram_id == str(msg.from_user.id)))
+# Screens are built as Message.answer()/navigation.show() keyword
+# arguments, so commands send them and menu buttons edit them in place.
+async def tickets_view(tg_id: int) -> dict:
+    async with read_session(tg_id) as db:
+        q = await db.execute(select(User).where(User.telegram_id == str(tg_id)))
         user = q.scalar_one_or_none()
 
-        if not user:
-            return await msg.answer("You have no tickets yet.", reply_markup=main_menu())
-
-        q = await db.execute(select(Ticket).where(Ticket.user_id == user.id))
-        tickets = q.scalars().all()
+        tickets = []
+        if user:
+            raffles = {r["id"]: r for r in await open_raffles(db)}
+            q = await db.execute(
+                select(Ticket.raffle_id, Ticket.code)
+                .where(Ticket.raffle_id.in_(list(raffles)), Ticket.user_id == user.id)
+                .order_by(Ticket.raffle_id, Ticket.id)
+            )
+            tickets = q.all()
 
     if not tickets:
-        return await msg.answer("You have no tickets yet.", reply_markup=main_menu())
+        return {"text": "You have no tickets yet.", "reply_markup": main_menu()}
+
+    lines = []
+    for raffle_id, code in tickets:
+        if not lines or lines[-1][0] != raffle_id:
+            lines.append((raffle_id, f"\n<b>{raffles[raffle_id]['name']}</b>"))
+        lines.append((raffle_id, code))
+    codes = "\n".join(text for _, text in lines)
+    return {
+        "text": f"🎟 Your Tickets:\n{codes}",
+        "parse_mode": "HTML",
+        "reply_markup": main_menu(),
+    }
+
+
+async def balance_view(tg_id: int) -> dict:
+    async with read_session(tg_id) as db:
+        _, balance = await balance_of(db, tg_id)
+
+    return {
+        "text": f"💰 Balance: ₦{balance:,}\n\nSpend it on tickets from the Buy menu.",
+        "reply_markup": main_menu(),
+    }
+
+
+def referral_view(tg_id: int) -> dict:
+    link = referral_link(BOT_USERNAME, tg_id)
+    return {"text": f"Invite friends with this link:\n{link}", "reply_markup": main_menu()}
+
+
+def join_view() -> dict:
+    channel = CHANNEL_USERNAME.lstrip("@")
+    return {
+        "text": f"📢 Join {CHANNEL_USERNAME} to buy tickets and be eligible to win.",
+        "reply_markup": InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="Join the channel", url=f"https://t.me/{channel}")],
+            [InlineKeyboardButton(text="✅ I've joined", callback_data="joined")],
+            [InlineKeyboardButton(text="⬅ Back", callback_data="back")],
+        ]),
+    }
+
+
+async def ask_to_join(event):
+    """What the membership gate shows instead of a purchase screen."""
+    if isinstance(event, CallbackQuery):
+        await show(event, **join_view())
+    else:
+        await event.answer(**join_view())
+
+
+def help_view() -> dict:
+    return {
+        "text": (
+            "ℹ️ <b>Help</b>\n\n"
+            "/buy – Buy tickets\n"
+            "/tickets – My tickets\n"
+            "/balance – Wallet balance\n"
+            "/referral – Referral link\n"
+            "/userstat – My stats\n"
+        ),
+        "parse_mode": "HTML",
+        "reply_markup": main_menu(),
+    }
 
-    codes = "\n".join(t.code for t in tickets)
-    await msg.answer(f"🎟 Your Tickets:\n{codes}", reply_markup=main_menu())
 
+# -------------------------
+# Ticket lookups (in-process index when enabled, DB otherwise)
+# -------------------------
+# draws must not be predictable from earlier outputs
+_draw_rng = random.SystemRandom()
 
-async def show_balance(msg: Message):
-    async with async_session() as db:
-        q = await db.execute(select(User).where(User.telegram_id == str(msg.from_user.id)))
-        user = q.scalar_one_or_none()
 
-    balance = user.balance if user else 0
-    await msg.answer(f"💰 Balance: ₦{balance:.2f}", reply_markup=main_menu())
+async def ticket_owner(db, code: str):
+    """(raffle_id, user_id) of a ticket in an open raffle, or None."""
+    raffle_ids = [r["id"] for r in await open_raffles(db)]
 
+    if TICKET_INDEX_ENABLED:
+        for raffle_id in raffle_ids:
+            owner = (await sync_index(db, raffle_id)).owner(code)
+            if owner is not None:
+                return raffle_id, owner
+        return None
 
-async def show_referral(msg: Message):
-    link = referral_link(BOT_USERNAME, msg.from_user.id)
-    await msg.answer(f"Invite friends with this link:\n{link}", reply_markup=main_menu())
+    row = (
+        await db.execute(
+            select(Ticket.raffle_id, Ticket.user_id).where(
+                Ticket.code == code,
+                Ticket.raffle_id.in_(raffle_ids),
+            )
+        )
+    ).one_or_none()
+    return (row.raffle_id, row.user_id) if row else None
 
 
-async def show_help(msg: Message):
-    await msg.answer(
-        "ℹ️ <b>Help</b>\n\n"
-        "/buy – Buy tickets\n"
-        "/tickets – My tickets\n"
-        "/balance – Wallet balance\n"
-        "/referral – Referral link\n"
-        "/userstat – My stats\n",
-        parse_mode="HTML",
-        reply_markup=main_menu()
-    )
+async def draw_ticket(db, raffle_id: int, exclude=()):
+    """
+    Uniformly random (code, user_id) from the raffle, or None. Tickets
+    of users in `exclude` (user ids, e.g. non_member_holders) can't win.
+    """
+    if TICKET_INDEX_ENABLED and not exclude:
+        idx = await checked_index(db, raffle_id)
+        if idx is not None:
+            return idx.draw(_draw_rng)
+
+    eligible = [Ticket.raffle_id == raffle_id]
+    if exclude:
+        eligible.append(Ticket.user_id.notin_(exclude))
+    count = (
+        await db.execute(select(func.count(Ticket.id)).where(*eligible))
+    ).scalar_one()
+    if not count:
+        return None
+
+    row = (
+        await db.execute(
+            select(Ticket.code, Ticket.user_id)
+            .where(*eligible)
+            .order_by(Ticket.id)
+            .offset(_draw_rng.randrange(count))
+            .limit(1)
+        )
+    ).one()
+    return row.code, row.user_id
 
 
 # -------------------------
@@ -266,9 +376,12 @@ async def show_help(msg: Message):
 # -------------------------
 @router.message(Command("start"))
 async def start_cmd(msg: Message):
+    async with async_session() as db:
+        prices = [r["ticket_price"] for r in await open_raffles(db)]
+
     await msg.answer(
         "🎉 <b>Welcome to MegaWin Raffle</b>\n\n"
-        "Each ticket costs ₦500.\n"
+        f"Tickets from ₦{min(prices):,}.\n"
         "Use the menu below 👇",
         parse_mode="HTML",
         reply_markup=main_menu()
@@ -277,71 +390,172 @@ async def start_cmd(msg: Message):
 
 @router.message(Command("help"))
 async def help_cmd(msg: Message):
-    await show_help(msg)
+    await msg.answer(**help_view())
 
 
 @router.message(Command("tickets"))
 async def tickets_cmd(msg: Message):
-    await show_tickets(msg)
+    await msg.answer(**await tickets_view(msg.from_user.id))
 
 
 @router.message(Command("balance"))
 async def balance_cmd(msg: Message):
-    await show_balance(msg)
+    await msg.answer(**await balance_view(msg.from_user.id))
 
 
 @router.message(Command("referral"))
 async def referral_cmd(msg: Message):
-    await show_referral(msg)
+    await msg.answer(**referral_view(msg.from_user.id))
 
 
 @router.message(Command("userstat"))
 async def userstat_cmd(msg: Message):
-    await show_tickets(msg)
+    await msg.answer(**await tickets_view(msg.from_user.id))
 
 
-@router.message(Command("buy"))
+@router.message(Command("buy"), flags={"membership": True})
 async def buy_cmd(msg: Message):
-    await msg.answer("Choose ticket quantity:", reply_markup=buy_menu())
+    await msg.answer(**await buy_view())
 
 
 # -------------------------
 # Admin Commands
 # -------------------------
-@router.message(Command("stats"))
-async def admin_stats(msg: Message):
+async def raffle_from_arg(db, arg):
+    """Open raffle named by an admin argument (its id), else the default one."""
+    if arg and arg.isdigit():
+        return await get_raffle(db, int(arg))
+    return await get_raffle(db, await active_raffle_id(db))
+
+
+@router.message(Command("raffles"))
+async def admin_raffles(msg: Message):
     if not is_admin(msg.from_user.id):
         return await msg.answer("⛔ Admin only")
 
-    async with async_session() as db:
-        users = (await db.execute(select(User))).scalars().all()
-        tickets = (await db.execute(select(Ticket))).scalars().all()
-        entries = (await db.execute(select(RaffleEntry))).scalars().all()
+    async with read_session() as db:
+        raffles = await open_raffles(db)
+
+    lines = [
+        f"#{r['id']} {r['name']} ({r['slug']}) – ₦{r['ticket_price']:,}"
+        + (f", cap {r['ticket_cap']:,}" if r["ticket_cap"] else "")
+        + (f", closes {r['close_at']:%Y-%m-%d %H:%M}" if r["close_at"] else "")
+        for r in raffles
+    ]
+    await msg.answer("🎰 Open raffles\n\n" + "\n".join(lines))
+
 
-    revenue = sum(e.amount for e in entries)
+@router.message(Command("new_raffle"))
+async def admin_new_raffle(msg: Message):
+    if not is_admin(msg.from_user.id):
+        return await msg.answer("⛔ Admin only")
+
+    usage = (
+        "Usage: /new_raffle SLUG PRICE [cap=N] [close=YYYY-MM-DDTHH:MM] NAME\n"
+        "e.g. /new_raffle daily 200 cap=5000 Daily Draw"
+    )
+    args = msg.text.split()[1:]
+    if len(args) < 3 or not args[1].isdigit():
+        return await msg.answer(usage)
+
+    slug, price, cap, close_at, name = args[0], int(args[1]), None, None, []
+    try:
+        for a in args[2:]:
+            if a.startswith("cap="):
+                cap = int(a[4:])
+            elif a.startswith("close="):
+                close_at = datetime.fromisoformat(a[6:]).replace(tzinfo=timezone.utc)
+            else:
+                name.append(a)
+    except ValueError:
+        return await msg.answer(usage)
+
+    if not name:
+        return await msg.answer(usage)
+
+    raffle_id = await create_raffle(slug, " ".join(name), price, cap, close_at)
+    if close_at:
+        async with async_session() as db:
+            await schedule_raffle(db, raffle_id, close_at)
+            await db.commit()
     await msg.answer(
-        f"📊 Admin Stats\n\n"
-        f"Users: {len(users)}\n"
-        f"Tickets: {len(tickets)}\n"
-        f"Revenue: ₦{revenue:,}"
+        f"✅ Raffle #{raffle_id} is open"
+        + (", closing and drawing automatically at its close time" if close_at else "")
     )
 
+
+@router.message(Command("jobs"))
+async def admin_jobs(msg: Message):
+    if not is_admin(msg.from_user.id):
+        return await msg.answer("⛔ Admin only")
+
+    async with read_session() as db:
+        jobs = (
+            await db.execute(
+                select(Job)
+                .where(Job.status.in_(("pending", "running", "failed")))
+                .order_by(Job.run_at)
+                .limit(20)
+            )
+        ).scalars().all()
+
+    if not jobs:
+        return await msg.answer("No scheduled jobs.")
+    lines = [
+        f"{j.run_at:%Y-%m-%d %H:%M} {j.kind} raffle #{j.raffle_id} – {j.status}"
+        + (f" ({j.attempts} attempts)" if j.attempts > 1 or j.status == "failed" else "")
+        for j in jobs
+    ]
+    await msg.answer("🗓 Scheduled jobs (UTC)\n\n" + "\n".join(lines))
+
+
 @router.message(Command("stats"))
 async def admin_stats(msg: Message):
     if not is_admin(msg.from_user.id):
         return await msg.answer("⛔ Admin only")
 
-    async with async_session() as db:
-        users = (await db.execute(select(User))).scalars().all()
-        tickets = (await db.execute(select(Ticket))).scalars().all()
-        entries = (await db.execute(select(RaffleEntry))).scalars().all()
+    args = msg.text.split()
+    async with read_session() as db:
+        raffle = await raffle_from_arg(db, args[1] if len(args) > 1 else None)
+        if not raffle:
+            return await msg.answer("❌ No such open raffle")
+
+        raffle_id = raffle["id"]
+        users = (await db.execute(select(func.count(User.id)))).scalar_one()
+        tickets = (
+            await db.execute(
+                select(func.count(Ticket.id)).where(Ticket.raffle_id == raffle_id)
+            )
+        ).scalar_one()
+        revenue = (
+            await db.execute(
+                select(func.coalesce(func.sum(RaffleEntry.amount), 0)).where(
+                    RaffleEntry.raffle_id == raffle_id,
+                    RaffleEntry.confirmed.is_(True),
+                )
+            )
+        ).scalar_one()
+
+        inventory = ""
+        if raffle["ticket_cap"]:
+            left = await remaining(db, raffle_id)
+            inventory = f"Cap: {raffle['ticket_cap']:,} ({left:,} left)\n"
+
+        holders = ""
+        if TICKET_INDEX_ENABLED:
+            dist = (await sync_index(db, raffle_id)).user_stats(top=3)
+            holders = f"Holders: {dist['holders']}\n" + "".join(
+                f"  user #{uid}: {n} tickets ({share:.1%})\n"
+                for uid, n, share in dist["top"]
+            )
 
-    revenue = sum(e.amount for e in entries)
     await msg.answer(
-        f"📊 Admin Stats\n\n"
-        f"Users: {len(users)}\n"
-        f"Tickets: {len(tickets)}\n"
-        f"Revenue: ₦{revenue:,}"
+        f"📊 Admin Stats – {raffle['name']} (#{raffle_id})\n\n"
+        f"Users: {users}\n"
+        f"Tickets: {tickets}\n"
+        f"Revenue: ₦{revenue:,}\n"
+        f"{inventory}"
+        f"{holders}"
     )
 
 @router.message(Command("broadcast"))
@@ -353,18 +567,98 @@ async def admin_broadcast(msg: Message):
     if not text:
         return await msg.answer("Usage: /broadcast your message")
 
-    async with async_session() as db:
-        users = (await db.execute(select(User))).scalars().all()
+    async with read_session() as db:
+        chat_ids = (await db.execute(select(User.telegram_id))).scalars().all()
 
-    sent = 0
-    for u in users:
-        try:
-            await bot.send_message(int(u.telegram_id), text)
-            sent += 1
-        except Exception:
-            pass
+    # shares the send rate with scheduled reminders
+    sent, failed = await send_many(chat_ids, text)
 
-    await msg.answer(f"✅ Broadcast sent to {sent} users")
+    log.info("Broadcast finished", extra={"sent": sent, "failed": failed})
+    await msg.answer(f"✅ Broadcast sent to {sent} users ({failed} failed)")
+
+
+@router.message(Command("segment"))
+async def admin_segment(msg: Message):
+    if not is_admin(msg.from_user.id):
+        return await msg.answer("⛔ Admin only")
+
+    text = msg.text.replace("/segment", "", 1).strip()
+    if not text:
+        return await msg.answer(
+            "Usage: /segment FILTER\n"
+            "e.g. /segment bought(last) and not bought(current)\n"
+            "Presets: " + ", ".join(SEGMENT_PRESETS)
+        )
+    try:
+        async with read_session() as db:
+            size = await segment_size(db, text)
+    except SegmentError as e:
+        return await msg.answer(f"❌ {e}")
+    await msg.answer(f"👥 {size:,} users match")
+
+
+@router.message(Command("target"))
+async def admin_target(msg: Message):
+    if not is_admin(msg.from_user.id):
+        return await msg.answer("⛔ Admin only")
+
+    segment, _, text = msg.text.replace("/target", "", 1).partition("|")
+    if not segment.strip() or not text.strip():
+        return await msg.answer("Usage: /target FILTER | your message\n"
+                                "e.g. /target lapsed | The new round is open!")
+    try:
+        parse(segment)
+    except SegmentError as e:
+        return await msg.answer(f"❌ {e}")
+
+    sent = failed = 0
+    async for chat_ids in iter_pages(segment):
+        s, f = await send_many(chat_ids, text.strip())
+        sent, failed = sent + s, failed + f
+
+    log.info("Targeted send finished",
+             extra={"segment": segment.strip(), "sent": sent, "failed": failed})
+    await msg.answer(f"✅ Sent to {sent} users ({failed} failed)")
+
+
+@router.message(Command("credit"))
+async def admin_credit(msg: Message):
+    if not is_admin(msg.from_user.id):
+        return await msg.answer("⛔ Admin only")
+
+    usage = (
+        "Usage: /credit TELEGRAM_ID AMOUNT [referral|refund|adjustment] [note]\n"
+        "AMOUNT is a whole number of naira above 0.\n"
+        "e.g. /credit 123456789 500 referral invited 5 friends"
+    )
+    args = msg.text.split(maxsplit=4)[1:]
+    # credits only: a negative amount would skip debit()'s balance check
+    if len(args) < 2 or not args[0].isdigit() or not args[1].isdigit() or int(args[1]) <= 0:
+        return await msg.answer(usage)
+
+    kind = args[2] if len(args) > 2 else "adjustment"
+    if kind not in KINDS or kind == "purchase":
+        return await msg.answer(usage)
+    amount = int(args[1])
+
+    async with async_session() as db:
+        user_id, _ = await balance_of(db, args[0])
+        if user_id is None:
+            return await msg.answer("❌ Unknown user")
+
+        # keyed on the command message, so a redelivered update posts once
+        posted = await credit(
+            db, user_id, amount, kind,
+            f"admin:{msg.chat.id}:{msg.message_id}",
+            args[3] if len(args) > 3 else f"by admin {msg.from_user.id}",
+        )
+        await db.commit()
+        _, balance = await balance_of(db, args[0])
+    pin_primary(args[0])
+
+    if not posted:
+        return await msg.answer("Already posted.")
+    await msg.answer(f"✅ Posted ₦{amount:,} ({kind}). New balance: ₦{balance:,}")
 
 
 @router.message(Command("announce_winner"))
@@ -379,17 +673,18 @@ async def admin_announce_winner(msg: Message):
     ticket_code = args[1].upper()
 
     async with async_session() as db:
-        ticket = (
-            await db.execute(select(Ticket).where(Ticket.code == ticket_code))
-        ).scalar_one_or_none()
+        found = await ticket_owner(db, ticket_code)
 
-        if not ticket:
-            return await msg.answer("❌ Ticket not found")
+        if found is None:
+            return await msg.answer("❌ Ticket not found in any open raffle")
+
+        raffle_id, owner_id = found
 
         await db.execute(
             insert(Winner).values(
-                ticket_code=ticket.code,
-                user_id=ticket.user_id,
+                ticket_code=ticket_code,
+                user_id=owner_id,
+                raffle_id=raffle_id,
                 announced_by=str(msg.from_user.id),
             )
         )
@@ -398,88 +693,320 @@ async def admin_announce_winner(msg: Message):
     await msg.answer(f"🏆 Winner announced: {ticket_code}")
 
 
-@router.message(Command("announce_winner"))
-async def admin_announce_winner(msg: Message):
+@router.message(Command("draw"))
+async def admin_draw(msg: Message):
     if not is_admin(msg.from_user.id):
         return await msg.answer("⛔ Admin only")
 
     args = msg.text.split()
-    if len(args) < 2:
-        return await msg.answer("Usage: /announce_winner TICKET_CODE")
+    async with read_session() as db:
+        raffle = await raffle_from_arg(db, args[1] if len(args) > 1 else None)
+    if not raffle:
+        return await msg.answer("❌ No such open raffle")
+    raffle_id = raffle["id"]
+
+    # Revalidating every holder's membership runs at the Telegram rate, far
+    # longer than Telegram waits for this update; answered inline, a slow
+    # draw would be redelivered and drawn twice. The scheduler runs it and
+    # the job key allows one /draw per raffle.
+    async with async_session() as db:
+        queued = await schedule(db, f"admin_draw:{raffle_id}", "admin_draw",
+                                datetime.now(timezone.utc), raffle_id)
+        await db.commit()
+    if not queued:
+        return await msg.answer(f"ℹ️ {raffle['name']} has been drawn already (or is being drawn)")
+    await msg.answer(f"🎲 Drawing {raffle['name']}… the result follows shortly")
 
-    ticket_code = args[1].upper()
 
+@router.message(Command("close_round"))
+async def admin_close_round(msg: Message):
+    if not is_admin(msg.from_user.id):
+        return await msg.answer("⛔ Admin only")
+
+    args = msg.text.split()
+    raffle_id = int(args[1]) if len(args) > 1 and args[1].isdigit() else None
+    closed = await close_round(str(msg.from_user.id), raffle_id)
+    if closed is None:
+        return await msg.answer("❌ No such open raffle")
+    closed_id, new_id = closed
+
+    if TICKET_INDEX_ENABLED:
+        drop_index(closed_id)
+        if SNAPSHOT_PATH:
+            # the closed round's snapshot is stale now; start the new round's
+            remove_snapshot(closed_id)
+            async with async_session() as db:
+                await write_snapshot(await sync_index(db, new_id))
+    await msg.answer(
+        f"🔒 Round #{closed_id} closed. Round #{new_id} is now open.\n"
+        "Archiving old tickets in the background…"
+    )
+    _archive_in_background(msg, closed_id)
+
+
+@router.message(Command("archive"))
+async def admin_archive(msg: Message):
+    if not is_admin(msg.from_user.id):
+        return await msg.answer("⛔ Admin only")
+
+    args = msg.text.split()
+    if len(args) < 2 or not args[1].isdigit():
+        return await msg.answer("Usage: /archive <round id>")
+    raffle_id = int(args[1])
     async with async_session() as db:
-        ticket = (
-            await db.execute(select(Ticket).where(Ticket.code == ticket_code))
+        status = (
+            await db.execute(select(Raffle.status).where(Raffle.id == raffle_id))
         ).scalar_one_or_none()
+    if status != "closed":
+        # open rounds are still selling; archived ones are done
+        return await msg.answer(f"❌ Round #{raffle_id} is {status or 'unknown'}, not closed")
 
-        if not ticket:
-            return await msg.answer("❌ Ticket not found")
+    await msg.answer(f"📦 Archiving round #{raffle_id} in the background…")
+    _archive_in_background(msg, raffle_id)
 
-        await db.execute(
-            insert(Winner).values(
-                ticket_code=ticket.code,
-                user_id=ticket.user_id,
-                announced_by=str(msg.from_user.id),
-            )
+
+def _archive_in_background(msg: Message, raffle_id: int):
+    """Runs archive_round off the handler and reports the outcome to the admin."""
+    async def _archive():
+        try:
+            moved = await archive_round(raffle_id)
+        except Exception:
+            log.exception("Archiving failed", extra={"raffle_id": raffle_id})
+            # archive_round is safe to re-run; rows already moved stay moved
+            await msg.answer(f"⚠️ Archiving round #{raffle_id} failed. "
+                             f"Retry with /archive {raffle_id}")
+            return
+        await msg.answer(f"📦 Round #{raffle_id} archived ({moved:,} rows moved)")
+
+    task = asyncio.create_task(_archive())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+@router.message(Command("revenue"))
+async def admin_revenue(msg: Message):
+    if not is_admin(msg.from_user.id):
+        return await msg.answer("⛔ Admin only")
+
+    from app.rollups import load_buckets, summarize, text_chart
+
+    args = msg.text.split()
+    days = int(args[1]) if len(args) > 1 and args[1].isdigit() else 7
+    granularity = "hour" if days <= 1 else "day"
+
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    buckets = summarize(await load_buckets(since), granularity)
+    if not buckets:
+        return await msg.answer("No sales in that period yet.")
+
+    revenue = sum(b["revenue"] for b in buckets)
+    created = sum(b["entries_created"] for b in buckets)
+    paid = sum(b["entries_confirmed"] for b in buckets)
+    await msg.answer(
+        f"💹 Revenue, last {days} day(s)\n\n"
+        f"<pre>{text_chart(buckets)}</pre>\n\n"
+        f"Total: ₦{revenue:,}\n"
+        f"Conversion: {paid}/{created}"
+        + (f" ({paid / created:.0%})" if created else "") + "\n"
+        f"Avg basket: ₦{(revenue // paid) if paid else 0:,}",
+        parse_mode="HTML",
+    )
+
+
+# Bot API upload limit for documents
+_MAX_DOCUMENT_BYTES = 50 * 1024 * 1024
+
+
+@router.message(Command("export"))
+async def admin_export(msg: Message):
+    if not is_admin(msg.from_user.id):
+        return await msg.answer("⛔ Admin only")
+
+    # imported here so cold starts don't pay for the export code
+    from app.export import parse_export_args, export_stream, export_filename
+
+    try:
+        opts = parse_export_args(msg.text.split()[1:])
+    except ValueError as e:
+        return await msg.answer(
+            f"❌ {e}\n\n"
+            "Usage: /export tickets|entries|transactions|winners "
+            "[csv|ndjson] [gz] [round=N] [since=YYYY-MM-DD] [until=YYYY-MM-DD]"
         )
-        await db.commit()
 
-    await msg.answer(f"🏆 Winner announced: {ticket_code}")
+    # spool to disk chunk by chunk so memory stays flat for any table size;
+    # the file goes whether the export finishes or fails halfway
+    size = 0
+    fd, path = tempfile.mkstemp(prefix="export_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in export_stream(**opts):
+                f.write(chunk)
+                size += len(chunk)
+
+        if size > _MAX_DOCUMENT_BYTES:
+            return await msg.answer(
+                "📦 Export is too large for Telegram. "
+                "Use gz or the /admin/export HTTP endpoint."
+            )
+        name = export_filename(opts["kind"], opts["fmt"], opts["gzip"])
+        await msg.answer_document(FSInputFile(path, filename=name))
+    finally:
+        os.remove(path)
 
 
 # -------------------------
 # Inline Callbacks
 # -------------------------
-@router.callback_query(F.data == "open_buy")
+# Menu buttons edit the message they belong to (see app/navigation.py)
+@router.callback_query(F.data == "open_buy", flags={"membership": True})
 async def cb_open_buy(cb: CallbackQuery):
-    await cb.message.answer("Choose ticket quantity:", reply_markup=buy_menu())
-    await cb.answer()
+    await show(cb, **await buy_view())
+
+
+@router.callback_query(F.data.startswith("raffle_"), flags={"membership": True})
+async def cb_raffle(cb: CallbackQuery):
+    async with read_session() as db:
+        raffle = await get_raffle(db, int(cb.data.split("_")[1]))
+
+    if not raffle or not is_selling(raffle):
+        await show(cb, "This raffle is closed.", reply_markup=main_menu())
+    else:
+        await show(cb, **raffle_view(raffle))
 
 
 @router.callback_query(F.data == "tickets")
 async def cb_tickets(cb: CallbackQuery):
-    await show_tickets(cb.message)
-    await cb.answer()
+    await show(cb, **await tickets_view(cb.from_user.id))
 
 
 @router.callback_query(F.data == "referral")
 async def cb_referral(cb: CallbackQuery):
-    await show_referral(cb.message)
-    await cb.answer()
+    await show(cb, **referral_view(cb.from_user.id))
 
 
 @router.callback_query(F.data == "help")
 async def cb_help(cb: CallbackQuery):
-    await show_help(cb.message)
-    await cb.answer()
+    await show(cb, **help_view())
+
+
+@router.callback_query(F.data == "joined")
+async def cb_joined(cb: CallbackQuery):
+    # skips the cached "not a member" so joining counts at once
+    if await is_member(cb.from_user.id, refresh=True):
+        await show(cb, **await buy_view())
+    else:
+        await cb.answer(f"You're not in {CHANNEL_USERNAME} yet.", show_alert=True)
 
 
 @router.callback_query(F.data == "back")
 async def cb_back(cb: CallbackQuery):
-    await cb.message.answer("Main menu:", reply_markup=main_menu())
-    await cb.answer()
+    await show(cb, "Main menu:", reply_markup=main_menu())
 
 
-@router.callback_query(F.data.startswith("buy_"))
+def purchase_args(data: str):
+    """(raffle_id, qty) from buy_/card_/wallet_ callback data, or None."""
+    parts = data.split("_")
+    # <action>_<raffle>_<qty>; menus sent before multi-raffle used buy_<qty>
+    raffle_id = int(parts[1]) if len(parts) == 3 else None
+    qty = int(parts[-1])
+
+    # callback data comes from the client, so only offer what the menu offers
+    if qty not in BUY_TIERS:
+        return None
+    return raffle_id, qty
+
+
+def pay_menu(raffle_id: int, qty: int, balance: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(
+            text=f"💰 Wallet (₦{balance:,})", callback_data=f"wallet_{raffle_id}_{qty}"
+        )],
+        [InlineKeyboardButton(
+            text="💳 Card / Transfer", callback_data=f"card_{raffle_id}_{qty}"
+        )],
+        [InlineKeyboardButton(text="⬅ Back", callback_data="back")],
+    ])
+
+
+@router.callback_query(F.data.startswith("buy_"), flags={"membership": True})
 async def cb_buy(cb: CallbackQuery):
-    qty = int(cb.data.split("_")[1])
-    await initiate_purchase(cb.message, cb.from_user.id, qty)
-    await cb.answer()
+    args = purchase_args(cb.data)
+    if args is None:
+        return await cb.answer("Invalid quantity", show_alert=True)
+    raffle_id, qty = args
+
+    async with read_session(cb.from_user.id) as db:
+        raffle = await get_raffle(db, raffle_id or await active_raffle_id(db))
+        _, balance = await balance_of(db, cb.from_user.id)
+
+    # offer the wallet only when it covers the whole purchase
+    if raffle and balance >= qty * raffle["ticket_price"]:
+        await show(
+            cb,
+            f"Pay ₦{qty * raffle['ticket_price']:,} for {qty} ticket(s) with:",
+            reply_markup=pay_menu(raffle["id"], qty, balance),
+        )
+    else:
+        await initiate_purchase(partial(show, cb), cb.from_user, qty, raffle_id)
+
+
+@router.callback_query(F.data.startswith("card_"), flags={"membership": True})
+async def cb_card(cb: CallbackQuery):
+    args = purchase_args(cb.data)
+    if args is None:
+        return await cb.answer("Invalid quantity", show_alert=True)
+
+    await initiate_purchase(partial(show, cb), cb.from_user, args[1], args[0])
+
+
+@router.callback_query(F.data.startswith("wallet_"), flags={"membership": True})
+async def cb_wallet(cb: CallbackQuery):
+    args = purchase_args(cb.data)
+    if args is None:
+        return await cb.answer("Invalid quantity", show_alert=True)
+
+    await wallet_purchase(partial(show, cb), cb.from_user.id, args[1], args[0])
 
 
 # -------------------------
 # Purchase
 # -------------------------
-async def initiate_purchase(message: Message, tg_id: int, qty: int):
-    amount = qty * TICKET_PRICE
+def sold_out_text(left: int) -> str:
+    if left:
+        return f"Only {left} ticket(s) left in this raffle. Pick a smaller bundle."
+    return "😔 This raffle is sold out."
+
+
+async def initiate_purchase(reply, tg_user, qty: int, raffle_id: int = None):
+    """`reply` shows the outcome (message.answer or navigation.show)."""
+    tg_id = tg_user.id
+    # degraded mode: don't touch the DB or wait on Paystack while it's down
+    if paystack_breaker.state == OPEN:
+        return await reply(PAYSTACK_DOWN_TEXT, reply_markup=main_menu())
+
+    async with async_session() as db:
+        raffle = await get_raffle(db, raffle_id or await active_raffle_id(db))
+        left = await remaining(db, raffle["id"]) if raffle else None
+
+    if not raffle or not is_selling(raffle):
+        return await reply("This raffle is closed.", reply_markup=main_menu())
+
+    # cheap early answer; the hold below is what actually enforces the cap
+    if left is not None and left < qty:
+        return await reply(sold_out_text(left), reply_markup=main_menu())
+
+    raffle_id = raffle["id"]
+    amount = qty * raffle["ticket_price"]
     email = f"{tg_id}@megawin.ng"
 
     try:
         checkout_url, ref = await initiate_paystack_payment(amount, email, tg_id)
+    except CircuitOpen:
+        return await reply(PAYSTACK_DOWN_TEXT, reply_markup=main_menu())
     except Exception:
-        return await message.answer("Payment init failed. Try again later.")
+        log.exception("Payment init failed", extra={"telegram_id": tg_id, "amount": amount})
+        return await reply("Payment init failed. Try again later.")
 
     async with async_session() as db:
         q = await db.execute(select(User).where(User.telegram_id == str(tg_id)))
@@ -488,7 +1015,7 @@ async def initiate_purchase(message: Message, tg_id: int, qty: int):
         if not user:
             await db.execute(insert(User).values(
                 telegram_id=str(tg_id),
-                username=message.from_user.username or "",
+                username=tg_user.username or "",
                 email=email,
                 balance=0
             ))
@@ -496,30 +1023,83 @@ async def initiate_purchase(message: Message, tg_id: int, qty: int):
             q = await db.execute(select(User).where(User.telegram_id == str(tg_id)))
             user = q.scalar_one()
 
+        # hold and entry commit together; an unused checkout link is harmless
+        if not await reserve(db, raffle_id, qty):
+            await db.rollback()
+            left = await remaining(db, raffle_id)
+            return await reply(sold_out_text(left or 0), reply_markup=main_menu())
+
         await db.execute(insert(RaffleEntry).values(
             user_id=user.id,
+            raffle_id=raffle_id,
             reference=ref,
             amount=amount,
             quantity=qty,
             confirmed=False
         ))
+        await bump(db, raffle_id, entries_created=1)
         await db.commit()
+    # confirmed by the Paystack webhook, maybe in another process; read
+    # this user's tickets from the primary for as long as the entry lives
+    pin_primary(tg_id, ENTRY_TTL_MINUTES * 60)
 
-    await message.answer(
+    await reply(
         f"🛒 <b>Payment Started</b>\n\n"
+        f"Raffle: {raffle['name']}\n"
         f"Tickets: {qty}\n"
-        f"Amount: ₦{amount}\n\n"
+        f"Amount: ₦{amount:,}\n\n"
         f"<a href='{checkout_url}'>Click here to pay</a>",
         parse_mode="HTML",
         reply_markup=main_menu()
     )
 
 
+async def wallet_purchase(reply, tg_id: int, qty: int, raffle_id: int):
+    async with async_session() as db:
+        raffle = await get_raffle(db, raffle_id)
+        user_id, _ = await balance_of(db, tg_id)
+
+    if not raffle or not is_selling(raffle):
+        return await reply("This raffle is closed.", reply_markup=main_menu())
+
+    result = {"status": "insufficient_funds"}
+    if user_id is not None:
+        result = await pay_from_wallet(user_id, raffle, qty)
+
+    if result["status"] == "insufficient_funds":
+        return await reply(
+            "💰 Your wallet balance doesn't cover this purchase.", reply_markup=main_menu()
+        )
+    if result["status"] == "sold_out":
+        async with async_session() as db:
+            left = await remaining(db, raffle["id"])
+        return await reply(sold_out_text(left or 0), reply_markup=main_menu())
+
+    if TICKET_INDEX_ENABLED:
+        index_issued(result["raffle_id"], result["user_id"], result["codes"])
+
+    codes = "\n".join(result["codes"])
+    await reply(
+        f"✅ <b>Tickets Issued!</b>\n\n"
+        f"Raffle: {raffle['name']}\n"
+        f"Paid ₦{qty * raffle['ticket_price']:,} from your wallet\n\n"
+        f"{codes}\n\n"
+        "Good luck 🍀",
+        parse_mode="HTML",
+        reply_markup=main_menu()
+    )
+
+
 # -------------------------
 # Fallback (SAFE)
 # -------------------------
 @router.message()
 async def fallback(message: Message):
+    # every unmatched message lands here, so this logger is sampled (LOG_SAMPLE_RATES)
+    fallback_log.info("Unhandled message", extra={
+        "user_id": message.from_user.id if message.from_user else None,
+        "command": bool(message.text and message.text.startswith("/")),
+    })
     if message.text and message.text.startswith("/"):
         await message.answer(
             "❌ Unknown command.\n\nUse /help or the menu below.",
@@ -537,4 +1117,14 @@ async def fallback(message: Message):
 # Register
 # -------------------------
 def register_handlers(dp: Dispatcher):
+    # purchase handlers are flagged membership=True
+    gate = MembershipGate(ask_to_join)
+    router.message.middleware(gate)
+    router.callback_query.middleware(gate)
     dp.include_router(router)
+
+
+if __name__ == "__main__":
+    # `python -m app.bot` (render.yaml worker); see app/polling.py
+    from app.polling import main
+    main()
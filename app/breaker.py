@@ -0,0 +1,111 @@
+# app/breaker.py
+import asyncio
+import logging
+import time
+from collections import deque
+
+from app.metrics import Counter, Gauge
+
+log = logging.getLogger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency the breaker considers down."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit is open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of the last `window` calls. Once at least
+    `min_calls` are recorded and the failure rate reaches `failure_rate`,
+    the circuit opens and calls fail at once with CircuitOpen. After
+    `open_seconds` it goes half-open: up to `probes` calls go through, and
+    the first result decides between closing and another open period.
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5,
+                 failure_rate: float = 0.5, open_seconds: float = 30,
+                 probes: int = 1):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.probes = probes
+
+        self._outcomes = deque(maxlen=window)  # True = failure
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = 0
+
+        self._gauge = Gauge(f"{name}_breaker_state", "0 closed, 1 half-open, 2 open")
+        self._rejected = Counter(f"{name}_breaker_rejected_total", "Calls failed fast")
+
+    # ------------------------------------------------------------
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._set(HALF_OPEN)
+        return self._state
+
+    def retry_after(self) -> float:
+        return max(self.open_seconds - (time.monotonic() - self._opened_at), 0)
+
+    def _set(self, state: str):
+        if state != self._state:
+            log.warning("Circuit breaker state change",
+                        extra={"breaker": self.name, "from": self._state, "to": state})
+        self._state = state
+        self._gauge.set(_STATE_VALUE[state])
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state != HALF_OPEN:
+            self._probing = 0
+
+    # ------------------------------------------------------------
+    def before_call(self):
+        """Raises CircuitOpen if the call shouldn't be attempted."""
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probing >= self.probes):
+            self._rejected.inc()
+            raise CircuitOpen(self.name, self.retry_after())
+        if state == HALF_OPEN:
+            self._probing += 1
+
+    def record(self, failed: bool):
+        if self._state == HALF_OPEN:
+            self._outcomes.clear()
+            self._set(OPEN if failed else CLOSED)
+            return
+
+        self._outcomes.append(failed)
+        if (
+            self._state == CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate
+        ):
+            self._outcomes.clear()
+            self._set(OPEN)
+
+    async def call(self, fn, *args, is_failure=None, **kwargs):
+        """
+        Awaits fn(*args, **kwargs) under the breaker. Exceptions count as
+        failures; `is_failure(result)` can flag bad results (e.g. 5xx).
+        """
+        self.before_call()
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            if self._state == HALF_OPEN:
+                self._probing -= 1  # no verdict, let another call probe
+            raise
+        except Exception:
+            self.record(True)
+            raise
+        self.record(bool(is_failure and is_failure(result)))
+        return result
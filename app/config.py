@@ -9,9 +9,34 @@ DATABASE_URL = os.getenv(
     "sqlite+aiosqlite:///./raffle.db"
 )
 
+# Optional read replica for read-only handlers (views, reports, user scans).
+# A user's reads go to the primary for READ_PIN_SECONDS after their own
+# writes, so they see them before the replica catches up.
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "")
+READ_PIN_SECONDS = float(os.getenv("READ_PIN_SECONDS", "30"))
+
+# SQLite: "tuned" (WAL, one write connection, read pool) or "off" (driver defaults)
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "tuned")
+SQLITE_READ_POOL = int(os.getenv("SQLITE_READ_POOL", "4"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_WRITE_WAIT_SECONDS = float(os.getenv("SQLITE_WRITE_WAIT_SECONDS", "30"))
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "65536"))
+
 # Paystack
 PAYSTACK_SECRET = os.getenv("PAYSTACK_SECRET")
 PAYSTACK_PUBLIC = os.getenv("PAYSTACK_PUBLIC")
+# point at a local stand-in (python -m app.paystack_standin) for testing
+PAYSTACK_BASE_URL = os.getenv("PAYSTACK_BASE_URL", "https://api.paystack.co")
+PAYSTACK_TIMEOUT = float(os.getenv("PAYSTACK_TIMEOUT", "8"))
+
+# Paystack circuit breaker: opens when BREAKER_FAILURE_RATE of the last
+# BREAKER_WINDOW calls failed (at least BREAKER_MIN_CALLS), probes again
+# after BREAKER_OPEN_SECONDS
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
 
 # Admin
 ADMIN_IDS = []
@@ -23,3 +48,101 @@ for x in os.getenv("ADMIN_IDS", "").split(","):
         ADMIN_IDS.append(int(x))
     except ValueError:
         continue
+
+# Abandoned entry reaper
+ENTRY_TTL_MINUTES = int(os.getenv("ENTRY_TTL_MINUTES", "120"))
+REAPER_BATCH_SIZE = int(os.getenv("REAPER_BATCH_SIZE", "200"))
+REAPER_BATCH_PAUSE = float(os.getenv("REAPER_BATCH_PAUSE", "0.5"))
+REAPER_INTERVAL_SECONDS = int(os.getenv("REAPER_INTERVAL_SECONDS", "300"))
+
+# Round archiving
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+
+# Admin HTTP API (sent as the X-Admin-Token header)
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+# Exports
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "2000"))
+
+# Paystack webhook intake
+# Test mode skips signature checks; without it an unset secret rejects everything
+PAYSTACK_WEBHOOK_TEST_MODE = os.getenv("PAYSTACK_WEBHOOK_TEST_MODE", "") == "1"
+WEBHOOK_MAX_BODY_BYTES = int(os.getenv("WEBHOOK_MAX_BODY_BYTES", "65536"))
+# Every signed body goes to the webhook_events log (replay: python -m app.webhook_replay)
+WEBHOOK_STORE_ENABLED = os.getenv("WEBHOOK_STORE_ENABLED", "1") == "1"
+
+# Group commit for webhook confirmations
+GROUP_COMMIT_ENABLED = os.getenv("GROUP_COMMIT_ENABLED", "") == "1"
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "5"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "100"))
+
+# Channel membership required to buy and to win. The bot must be an admin of
+# the channel to look members up; when a lookup fails the user is let through.
+CHANNEL_USERNAME = os.getenv("CHANNEL_USERNAME", "@MegaWinRaffle")
+MEMBERSHIP_GATE_ENABLED = os.getenv("MEMBERSHIP_GATE_ENABLED", "1") == "1"
+MEMBERSHIP_TTL_SECONDS = int(os.getenv("MEMBERSHIP_TTL_SECONDS", "900"))
+# short, so joining takes effect soon even without the "I've joined" button
+MEMBERSHIP_NEGATIVE_TTL_SECONDS = int(os.getenv("MEMBERSHIP_NEGATIVE_TTL_SECONDS", "60"))
+MEMBERSHIP_REVALIDATE_CONCURRENCY = int(os.getenv("MEMBERSHIP_REVALIDATE_CONCURRENCY", "8"))
+
+# Bot update delivery: "webhook" (FastAPI route) or "polling" (python -m app.bot)
+BOT_MODE = os.getenv("BOT_MODE", "webhook")
+POLLING_CONCURRENCY = int(os.getenv("POLLING_CONCURRENCY", "16"))
+POLLING_TIMEOUT = int(os.getenv("POLLING_TIMEOUT", "30"))
+POLLING_DRAIN_SECONDS = int(os.getenv("POLLING_DRAIN_SECONDS", "25"))
+
+# Schema check at web startup: "background" (create_all after boot, for
+# dev databases) or "off". Deploys migrate with `alembic upgrade head`.
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "background")
+
+# In-process ticket index (O(1) owner lookups and draws)
+TICKET_INDEX_ENABLED = os.getenv("TICKET_INDEX_ENABLED", "") == "1"
+# ids below the newest indexed ticket that each sync reads again, for
+# tickets whose transaction committed after a later id's did
+TICKET_INDEX_RESCAN_IDS = int(os.getenv("TICKET_INDEX_RESCAN_IDS", "1000"))
+
+# Ticket index snapshot (empty path disables it)
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "./ticket_index.snap")
+SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "600"))
+
+# Raffle catalog
+DEFAULT_RAFFLE_SLUG = os.getenv("DEFAULT_RAFFLE_SLUG", "main")
+BUY_TIERS = [int(x) for x in os.getenv("BUY_TIERS", "1,5,10").split(",") if x.strip()]
+
+# Paystack reconciliation (catches payments whose webhook never arrived)
+RECONCILE_INTERVAL_SECONDS = int(os.getenv("RECONCILE_INTERVAL_SECONDS", "900"))  # 0 = off
+RECONCILE_WINDOW_HOURS = int(os.getenv("RECONCILE_WINDOW_HOURS", "48"))
+RECONCILE_PAGE_SIZE = int(os.getenv("RECONCILE_PAGE_SIZE", "100"))
+
+# Logging: JSON lines on stdout ("json") or plain text ("text")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# fraction of INFO/DEBUG records kept per logger, e.g. "app.bot.fallback=0.05"
+LOG_SAMPLE_RATES = {}
+for x in os.getenv("LOG_SAMPLE_RATES", "app.bot.fallback=0.05").split(","):
+    name, _, rate = x.partition("=")
+    if name.strip() and rate.strip():
+        LOG_SAMPLE_RATES[name.strip()] = float(rate)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+
+# Webhooks that couldn't be verified (Paystack down) wait here for a retry
+VERIFY_QUEUE_INTERVAL_SECONDS = int(os.getenv("VERIFY_QUEUE_INTERVAL_SECONDS", "30"))
+VERIFY_QUEUE_BATCH = int(os.getenv("VERIFY_QUEUE_BATCH", "50"))
+
+# Scheduled jobs: round closes, draws, last-hour reminders (app/scheduler.py)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_INTERVAL_SECONDS = float(os.getenv("SCHEDULER_INTERVAL_SECONDS", "15"))
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", "2"))
+SCHEDULER_LOCK_KEY = int(os.getenv("SCHEDULER_LOCK_KEY", "730044"))  # pg advisory lock id
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+REMINDER_LEAD_MINUTES = int(os.getenv("REMINDER_LEAD_MINUTES", "60"))
+
+# Bulk sends (broadcasts, reminders); Telegram allows about 30 msg/s per bot
+TELEGRAM_SEND_RATE = float(os.getenv("TELEGRAM_SEND_RATE", "20"))
+TELEGRAM_SEND_CONCURRENCY = int(os.getenv("TELEGRAM_SEND_CONCURRENCY", "8"))
+
+# Audience segments (app/segments.py)
+SEGMENT_CACHE_SECONDS = int(os.getenv("SEGMENT_CACHE_SECONDS", "60"))
+SEGMENT_FULL_REFRESH_SECONDS = int(os.getenv("SEGMENT_FULL_REFRESH_SECONDS", "3600"))
+SEGMENT_PAGE_SIZE = int(os.getenv("SEGMENT_PAGE_SIZE", "1000"))
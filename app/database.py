@@ -1,7 +1,118 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
 
-engine = create_engine("sqlite:///raffle.db", echo=False)
-SessionLocal = sessionmaker(bind=engine)
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import declarative_base
+
+from app.config import (
+    DATABASE_URL,
+    DATABASE_READ_URL,
+    READ_PIN_SECONDS,
+    SQLITE_PROFILE,
+    SQLITE_READ_POOL,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_WRITE_WAIT_SECONDS,
+    SQLITE_MMAP_BYTES,
+    SQLITE_CACHE_KB,
+)
+
+
+def _pragmas(*pragmas):
+    def on_connect(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        for pragma in pragmas:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+    return on_connect
+
+
+def _replica_engine(url: str):
+    # read-only at the session level too, so a write routed here by
+    # mistake fails loudly even when the URL points at a primary
+    if make_url(url).get_backend_name() == "postgresql":
+        return create_async_engine(url, pool_pre_ping=True, connect_args={
+            "server_settings": {"default_transaction_read_only": "on"},
+        })
+    engine = create_async_engine(url)
+    event.listen(engine.sync_engine, "connect", _pragmas("query_only=ON"))
+    return engine
+
+
+if make_url(DATABASE_URL).get_backend_name() == "sqlite" and SQLITE_PROFILE == "tuned":
+    # Every write goes through one connection, so concurrent writers queue
+    # in the pool instead of failing with "database is locked"; WAL lets a
+    # small pool of read-only connections run alongside it.
+    _tuning = (
+        "synchronous=NORMAL",  # durable at checkpoints, no fsync per commit
+        f"busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"mmap_size={SQLITE_MMAP_BYTES}",
+        f"cache_size=-{SQLITE_CACHE_KB}",
+    )
+    engine = create_async_engine(
+        DATABASE_URL, pool_size=1, max_overflow=0, pool_timeout=SQLITE_WRITE_WAIT_SECONDS
+    )
+    event.listen(engine.sync_engine, "connect", _pragmas("journal_mode=WAL", *_tuning))
+    if not DATABASE_READ_URL:
+        read_engine = create_async_engine(
+            DATABASE_URL, pool_size=SQLITE_READ_POOL, max_overflow=0
+        )
+        event.listen(read_engine.sync_engine, "connect", _pragmas(*_tuning, "query_only=ON"))
+else:
+    engine = create_async_engine(DATABASE_URL, echo=False)
+    if not DATABASE_READ_URL:
+        read_engine = engine
+
+if DATABASE_READ_URL:
+    read_engine = _replica_engine(DATABASE_READ_URL)
+
+async_session = async_sessionmaker(engine, expire_on_commit=False)
+_read_sessions = async_sessionmaker(read_engine, expire_on_commit=False)
 
 Base = declarative_base()
+
+
+# ============================================================
+#                       READ ROUTING
+# ============================================================
+# Telegram ids whose own writes the replica may not have yet, with when
+# that stops mattering. Pins are per process, so the bot pins a user for
+# the life of a checkout it starts: the payment is confirmed by the
+# Paystack webhook, which may run in another process (polling mode).
+_pinned = {}
+
+
+def pin_primary(telegram_id, seconds: float = READ_PIN_SECONDS):
+    """Sends this user's reads to the primary for the next `seconds`."""
+    if not DATABASE_READ_URL:
+        return  # reads already see every commit
+    now = time.monotonic()
+    if len(_pinned) > 10_000:
+        for key in [k for k, until in _pinned.items() if until <= now]:
+            del _pinned[key]
+    key = str(telegram_id)
+    _pinned[key] = max(_pinned.get(key, 0), now + seconds)
+
+
+def read_session(telegram_id=None):
+    """
+    A session for queries that never write: the replica when
+    DATABASE_READ_URL is set. Pass the user's telegram id for screens
+    that must show their own recent writes (tickets right after paying).
+    """
+    if telegram_id is not None:
+        until = _pinned.get(str(telegram_id))
+        if until is not None:
+            if until > time.monotonic():
+                return async_session()
+            _pinned.pop(str(telegram_id), None)
+    return _read_sessions()
+
+
+def dialect_insert(db):
+    """The session dialect's insert(), which has ON CONFLICT support."""
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
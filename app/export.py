@@ -0,0 +1,148 @@
+# app/export.py
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.config import EXPORT_CHUNK_ROWS
+from app.database import read_session
+from app.models import (
+    Ticket,
+    ArchivedTicket,
+    RaffleEntry,
+    ArchivedEntry,
+    Transaction,
+    Winner,
+)
+
+# kind -> (columns, tables to read in order). Archived rows are included
+# so exporting a closed round still works after it has been archived.
+EXPORTS = {
+    "tickets": (
+        ["code", "user_id", "raffle_id", "created_at"],
+        [Ticket, ArchivedTicket],
+    ),
+    "entries": (
+        ["reference", "user_id", "raffle_id", "amount", "quantity",
+         "confirmed", "created_at"],
+        [RaffleEntry, ArchivedEntry],
+    ),
+    "transactions": (
+        ["reference", "user_id", "raffle_id", "amount", "status", "created_at"],
+        [Transaction],
+    ),
+    "winners": (
+        ["ticket_code", "user_id", "raffle_id", "announced_by", "created_at"],
+        [Winner],
+    ),
+}
+
+FORMATS = ("csv", "ndjson")
+
+
+# ============================================================
+#                        ARGUMENTS
+# ============================================================
+def parse_export_args(args: list) -> dict:
+    """
+    Parses `/export` arguments:
+    tickets ndjson gz round=3 since=2025-01-01 until=2025-02-01
+    Raises ValueError on anything it doesn't understand.
+    """
+    if not args or args[0] not in EXPORTS:
+        raise ValueError(f"kind must be one of: {', '.join(EXPORTS)}")
+
+    opts = {"kind": args[0], "fmt": "csv", "gzip": False,
+            "since": None, "until": None, "raffle_id": None}
+
+    for a in args[1:]:
+        if a in FORMATS:
+            opts["fmt"] = a
+        elif a in ("gz", "gzip"):
+            opts["gzip"] = True
+        elif a.startswith("round="):
+            opts["raffle_id"] = int(a.split("=", 1)[1])
+        elif a.startswith("since="):
+            opts["since"] = datetime.fromisoformat(a.split("=", 1)[1])
+        elif a.startswith("until="):
+            opts["until"] = datetime.fromisoformat(a.split("=", 1)[1])
+        else:
+            raise ValueError(f"unknown option: {a}")
+
+    return opts
+
+
+def export_filename(kind: str, fmt: str, gzip: bool) -> str:
+    return f"{kind}.{fmt}" + (".gz" if gzip else "")
+
+
+# ============================================================
+#                      ROW STREAMING
+# ============================================================
+async def _stream_rows(kind, since=None, until=None, raffle_id=None):
+    """
+    Yields lists of rows using a server-side cursor, so at most
+    EXPORT_CHUNK_ROWS rows are held in memory at once.
+    """
+    cols, models = EXPORTS[kind]
+
+    async with read_session() as db:
+        for model in models:
+            q = select(*[getattr(model, c) for c in cols]).order_by(model.id)
+            if since:
+                q = q.where(model.created_at >= since)
+            if until:
+                q = q.where(model.created_at < until)
+            if raffle_id is not None:
+                q = q.where(model.raffle_id == raffle_id)
+
+            result = await db.stream(
+                q.execution_options(yield_per=EXPORT_CHUNK_ROWS)
+            )
+            async for rows in result.partitions():
+                yield rows
+
+
+def _encode_csv(rows, header=None) -> bytes:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    if header:
+        w.writerow(header)
+    w.writerows(rows)
+    return buf.getvalue().encode()
+
+
+def _encode_ndjson(rows, cols) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(cols, r)), default=str) + "\n" for r in rows
+    ).encode()
+
+
+async def export_stream(kind, fmt="csv", gzip=False,
+                        since=None, until=None, raffle_id=None):
+    """
+    Async iterator of encoded (and optionally gzipped) byte chunks,
+    one per cursor partition.
+    """
+    cols, _ = EXPORTS[kind]
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+
+    def _out(data: bytes) -> bytes:
+        return gz.compress(data) if gz else data
+
+    if fmt == "csv":
+        yield _out(_encode_csv([], header=cols))
+
+    async for rows in _stream_rows(kind, since, until, raffle_id):
+        if fmt == "csv":
+            chunk = _out(_encode_csv(rows))
+        else:
+            chunk = _out(_encode_ndjson(rows, cols))
+        if chunk:
+            yield chunk
+
+    if gz:
+        yield gz.flush()
@@ -0,0 +1,102 @@
+# app/group_commit.py
+import asyncio
+import logging
+import time
+
+from app.config import GROUP_COMMIT_WINDOW_MS, GROUP_COMMIT_MAX_BATCH
+from app.database import async_session
+from app.issuance import confirm_payments, confirm_payment
+from app.metrics import Counter, Summary
+
+batch_size = Summary("group_commit_batch_size", "Confirmations per commit")
+wait_seconds = Summary("group_commit_wait_seconds", "Submit to result latency")
+flush_seconds = Summary("group_commit_flush_seconds", "Time spent in one batch commit")
+fallbacks = Counter("group_commit_fallbacks_total", "Batches retried one by one")
+
+log = logging.getLogger(__name__)
+
+
+class GroupCommitWriter:
+    """
+    Collects webhook confirmations for up to `window_ms` (or until
+    `max_batch` are queued) and writes them in a single transaction.
+    Every caller still gets its own result or exception.
+    """
+
+    def __init__(self, window_ms: float = GROUP_COMMIT_WINDOW_MS,
+                 max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        # running flushes; the loop only keeps weak references to tasks
+        self._flushing = set()
+
+    async def submit(self, reference: str, amount: int) -> dict:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        started = time.perf_counter()
+        self._pending.append((reference, amount, fut))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush_now)
+
+        try:
+            return await fut
+        finally:
+            wait_seconds.observe(time.perf_counter() - started)
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._flush(batch))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self, batch):
+        started = time.perf_counter()
+        batch_size.observe(len(batch))
+
+        try:
+            async with async_session() as db:
+                results = await confirm_payments(
+                    db, [(ref, amount) for ref, amount, _ in batch]
+                )
+                await db.commit()
+        except Exception:
+            # one bad row shouldn't fail its neighbours
+            log.warning("Batch commit failed, retrying one by one",
+                        exc_info=True, extra={"batch": len(batch)})
+            fallbacks.inc()
+            await self._flush_one_by_one(batch)
+            return
+        finally:
+            flush_seconds.observe(time.perf_counter() - started)
+
+        # the first submit of a duplicated reference gets the tickets
+        seen = set()
+        for ref, _, fut in batch:
+            if fut.done():
+                continue
+            if ref in seen:
+                fut.set_result({"status": "already_processed"})
+            else:
+                seen.add(ref)
+                fut.set_result(results[ref])
+
+    async def _flush_one_by_one(self, batch):
+        for ref, amount, fut in batch:
+            if fut.done():
+                continue
+            try:
+                fut.set_result(await confirm_payment(ref, amount))
+            except Exception as e:
+                fut.set_exception(e)
+
+
+writer = GroupCommitWriter()
@@ -0,0 +1,27 @@
+# app/init_db.py
+import asyncio
+import logging
+
+from app.database import engine, Base
+import app.models  # noqa: F401  (registers the tables on Base.metadata)
+from app.logging_setup import configure_logging
+
+log = logging.getLogger(__name__)
+
+
+async def init_db():
+    """
+    Creates any missing tables, and the default raffle if none is open.
+    Existing tables are left untouched.
+    """
+    from app.raffles import ensure_default_raffle
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await ensure_default_raffle()
+    log.info("DB ready")
+
+
+if __name__ == "__main__":
+    configure_logging()
+    asyncio.run(init_db())
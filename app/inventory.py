@@ -0,0 +1,163 @@
+# app/inventory.py
+import asyncio
+import sys
+
+from sqlalchemy import select, update, delete, case, or_
+
+from app.database import async_session
+from app.models import Raffle
+
+# Each raffle row carries two counters:
+#   tickets_reserved - held by unpaid entries (released when the reaper
+#                      archives them, i.e. after ENTRY_TTL_MINUTES)
+#   tickets_sold     - issued tickets
+# Every change is a single conditional UPDATE on the raffle's row, so the
+# database serialises concurrent buyers and webhooks without a COUNT(*)
+# over tickets and without a read-then-write race.
+
+
+def _fits(qty: int):
+    return or_(
+        Raffle.ticket_cap.is_(None),
+        Raffle.tickets_sold + Raffle.tickets_reserved + qty <= Raffle.ticket_cap,
+    )
+
+
+def _minus(col, qty: int):
+    # entries created before the counters existed were never reserved
+    return case((col >= qty, col - qty), else_=0)
+
+
+# ============================================================
+#                        RESERVE
+# ============================================================
+async def remaining(db, raffle_id: int):
+    """Tickets still available, or None for an uncapped raffle."""
+    row = (
+        await db.execute(
+            select(Raffle.ticket_cap, Raffle.tickets_sold, Raffle.tickets_reserved)
+            .where(Raffle.id == raffle_id)
+        )
+    ).one_or_none()
+    if row is None or row.ticket_cap is None:
+        return None
+    return max(row.ticket_cap - row.tickets_sold - row.tickets_reserved, 0)
+
+
+async def reserve(db, raffle_id: int, qty: int) -> bool:
+    """
+    Holds `qty` tickets for an unpaid entry. False if that would pass the
+    cap or the raffle isn't open. Caller owns the transaction; commit it
+    together with the entry so a hold never exists without one.
+    """
+    held = (
+        await db.execute(
+            update(Raffle)
+            .where(Raffle.id == raffle_id, Raffle.status == "open", _fits(qty))
+            .values(tickets_reserved=Raffle.tickets_reserved + qty)
+            .returning(Raffle.id)
+        )
+    ).scalar_one_or_none()
+    return held is not None
+
+
+async def release(db, counts: dict):
+    """Returns held tickets, `counts` being {raffle_id: qty}. Caller commits."""
+    for raffle_id, qty in counts.items():
+        if raffle_id is None or not qty:
+            continue
+        await db.execute(
+            update(Raffle)
+            .where(Raffle.id == raffle_id)
+            .values(tickets_reserved=_minus(Raffle.tickets_reserved, qty))
+        )
+
+
+# ============================================================
+#                         SELL
+# ============================================================
+async def commit_sale(db, raffle_id: int, qty: int, reserved: bool = True) -> bool:
+    """
+    Turns held tickets into sold ones. With reserved=False (an entry whose
+    hold already expired) the tickets must fit under the cap again;
+    returns False if they don't, or if the raffle has closed meanwhile.
+    Caller owns the transaction.
+    """
+    q = update(Raffle).where(Raffle.id == raffle_id)
+    if reserved:
+        q = q.values(
+            tickets_reserved=_minus(Raffle.tickets_reserved, qty),
+            tickets_sold=Raffle.tickets_sold + qty,
+        )
+    else:
+        q = q.where(Raffle.status == "open", _fits(qty)).values(
+            tickets_sold=Raffle.tickets_sold + qty
+        )
+
+    return (await db.execute(q.returning(Raffle.id))).scalar_one_or_none() is not None
+
+
+# ============================================================
+#                       STRESS CHECK
+# ============================================================
+async def stress(cap: int = 1000, buyers: int = 500, qty: int = 5) -> dict:
+    """
+    Races `buyers` concurrent reserve + sell flows (each in its own session)
+    against a throwaway raffle and checks nothing was oversold.
+    """
+    from app.raffles import create_raffle, invalidate_catalog
+
+    raffle_id = await create_raffle("stress-test", "Inventory stress test", 1, cap)
+
+    async def buyer(i):
+        async with async_session() as db:
+            ok = await reserve(db, raffle_id, qty)
+            await db.commit()
+        if not ok:
+            return 0
+        async with async_session() as db:
+            if i % 4 == 0:
+                await release(db, {raffle_id: qty})  # abandoned checkout
+                await db.commit()
+                return 0
+            await commit_sale(db, raffle_id, qty)
+            await db.commit()
+        return qty
+
+    try:
+        sold = sum(await asyncio.gather(*(buyer(i) for i in range(buyers))))
+        async with async_session() as db:
+            row = (
+                await db.execute(
+                    select(Raffle.tickets_sold, Raffle.tickets_reserved)
+                    .where(Raffle.id == raffle_id)
+                )
+            ).one()
+    finally:
+        async with async_session() as db:
+            await db.execute(delete(Raffle).where(Raffle.id == raffle_id))
+            await db.commit()
+        invalidate_catalog()
+
+    return {
+        "cap": cap,
+        "sold": sold,
+        "counter_sold": row.tickets_sold,
+        "counter_reserved": row.tickets_reserved,
+        "ok": sold == row.tickets_sold <= cap and row.tickets_reserved == 0,
+    }
+
+
+if __name__ == "__main__":
+    # python -m app.inventory stress [CAP] [BUYERS]
+    # creates and removes a temporary raffle in DATABASE_URL
+    if len(sys.argv) < 2 or sys.argv[1] != "stress":
+        sys.exit("usage: python -m app.inventory stress [CAP] [BUYERS]")
+
+    cap = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    buyers = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+    report = asyncio.run(stress(cap, buyers))
+    print(report)
+    if not report["ok"]:
+        sys.exit("❌ oversold or counters drifted")
+    print("✅ no oversell")
@@ -0,0 +1,242 @@
+# app/issuance.py
+import logging
+import uuid
+
+from sqlalchemy import select, insert, update
+
+from app.config import BOT_TOKEN, TICKET_INDEX_ENABLED
+from app.database import async_session, pin_primary
+from app.inventory import reserve, commit_sale
+from app.models import User, Ticket, RaffleEntry, Transaction
+from app.raffles import active_raffle_id
+from app.reaper import restore_archived
+from app.rollups import bump
+from app.telegram import get_bot
+from app.ticket_index import index_issued
+from app.utils import generate_ticket_code
+from app.wallet import credit, debit
+
+log = logging.getLogger(__name__)
+
+
+# ============================================================
+#                    BATCH CONFIRMATION
+# ============================================================
+async def confirm_payments(db, payments: list) -> dict:
+    """
+    Confirms paid entries and issues their tickets with one bulk statement
+    per table. `payments` is a list of (reference, amount) pairs.
+
+    Returns {reference: result} where result["status"] is "ok",
+    "already_processed" or "sold_out" (paid after its ticket hold expired
+    and the raffle filled up meanwhile; the money goes to the buyer's
+    wallet). Caller owns the transaction.
+    """
+    amounts = {}
+    for reference, amount in payments:
+        amounts.setdefault(reference, amount)
+
+    entries = {
+        e.reference: e
+        for e in (
+            await db.execute(
+                select(RaffleEntry).where(RaffleEntry.reference.in_(list(amounts)))
+            )
+        ).scalars()
+    }
+
+    restored = set()
+    for reference in amounts:
+        if reference not in entries:
+            # the reaper may have archived it before a late payment landed
+            entry = await restore_archived(db, reference)
+            if entry:
+                entries[reference] = entry
+                restored.add(reference)
+
+    pending = [e for e in entries.values() if not e.confirmed]
+    results = {ref: {"status": "already_processed"} for ref in amounts}
+    if not pending:
+        return results
+
+    # conditional update, so a concurrent confirmation can't issue twice
+    confirmed_ids = set(
+        (
+            await db.execute(
+                update(RaffleEntry)
+                .where(
+                    RaffleEntry.id.in_([e.id for e in pending]),
+                    RaffleEntry.confirmed.is_(False),
+                )
+                .values(confirmed=True)
+                .returning(RaffleEntry.id)
+            )
+        ).scalars()
+    )
+    pending = [e for e in pending if e.id in confirmed_ids]
+    if not pending:
+        return results
+
+    users = {
+        u.id: u
+        for u in (
+            await db.execute(
+                select(User).where(User.id.in_({e.user_id for e in pending}))
+            )
+        ).scalars()
+    }
+
+    default_raffle = None
+    ticket_rows = []
+    tx_rows = []
+    rollup = {}
+    sold = {}
+    for e in pending:
+        # legacy entries predate rounds
+        raffle_id = e.raffle_id
+        if raffle_id is None:
+            default_raffle = default_raffle or await active_raffle_id(db)
+            raffle_id = default_raffle
+
+        # restored and legacy entries hold no tickets, so re-check the cap
+        if e.reference in restored or e.raffle_id is None:
+            if not await commit_sale(db, raffle_id, e.quantity, reserved=False):
+                tx_rows.append({
+                    "user_id": e.user_id,
+                    "raffle_id": raffle_id,
+                    "reference": e.reference,
+                    "amount": amounts[e.reference],
+                    "status": "sold_out",
+                })
+                await credit(db, e.user_id, amounts[e.reference], "refund",
+                             f"refund:{e.reference}", "raffle sold out")
+                results[e.reference] = {
+                    "status": "sold_out",
+                    "user_id": e.user_id,
+                    "telegram_id": users[e.user_id].telegram_id,
+                    "raffle_id": raffle_id,
+                    "quantity": e.quantity,
+                }
+                continue
+        else:
+            sold[raffle_id] = sold.get(raffle_id, 0) + e.quantity
+
+        codes = [generate_ticket_code() for _ in range(e.quantity)]
+        ticket_rows.extend(
+            {"user_id": e.user_id, "raffle_id": raffle_id, "code": c}
+            for c in codes
+        )
+        tx_rows.append({
+            "user_id": e.user_id,
+            "raffle_id": raffle_id,
+            "reference": e.reference,
+            "amount": amounts[e.reference],
+            "status": "success",
+        })
+        r = rollup.setdefault(
+            raffle_id, {"entries_confirmed": 0, "tickets": 0, "revenue": 0}
+        )
+        r["entries_confirmed"] += 1
+        r["tickets"] += e.quantity
+        r["revenue"] += amounts[e.reference]
+
+        results[e.reference] = {
+            "status": "ok",
+            "user_id": e.user_id,
+            "telegram_id": users[e.user_id].telegram_id,
+            "raffle_id": raffle_id,
+            "quantity": e.quantity,
+            "codes": codes,
+        }
+
+    for raffle_id, qty in sold.items():
+        await commit_sale(db, raffle_id, qty)
+
+    if ticket_rows:
+        await db.execute(insert(Ticket), ticket_rows)
+    await db.execute(insert(Transaction), tx_rows)
+    for raffle_id, deltas in rollup.items():
+        await bump(db, raffle_id, **deltas)
+
+    # buyers check their tickets and balance right after paying
+    for r in results.values():
+        if "telegram_id" in r:
+            pin_primary(r["telegram_id"])
+    return results
+
+
+async def announce(result: dict, amount: int):
+    """
+    After-commit side effects of a confirmation: adds the tickets to the
+    in-process index and tells the buyer on Telegram. Best effort.
+    """
+    if result["status"] == "ok":
+        if TICKET_INDEX_ENABLED:
+            index_issued(result["raffle_id"], result["user_id"], result["codes"])
+        text = (
+            "✅ <b>Payment Confirmed!</b>\n\n"
+            f"🎟 Tickets issued: {result['quantity']}\n"
+            f"💳 Amount: ₦{amount:,}\n\n"
+            "Good luck 🍀"
+        )
+    elif result["status"] == "sold_out":
+        text = (
+            "😔 <b>Sold Out</b>\n\n"
+            "Your payment arrived after your ticket hold expired and the "
+            f"raffle has since sold out. ₦{amount:,} has been added to your wallet."
+        )
+    else:
+        return
+
+    try:
+        if BOT_TOKEN:
+            await get_bot().send_message(
+                int(result["telegram_id"]), text, parse_mode="HTML"
+            )
+    except Exception:
+        log.warning("Telegram notify failed", exc_info=True)
+
+
+async def confirm_payment(reference: str, amount: int) -> dict:
+    """Confirms a single payment in its own transaction."""
+    async with async_session() as db:
+        results = await confirm_payments(db, [(reference, amount)])
+        await db.commit()
+    return results[reference]
+
+
+# ============================================================
+#                      WALLET PURCHASE
+# ============================================================
+async def pay_from_wallet(user_id: int, raffle: dict, qty: int) -> dict:
+    """
+    Buys tickets with wallet money, no Paystack round trip: debit, ticket
+    hold, entry and issuance commit in one transaction or not at all.
+    result["status"] is "ok" (same shape as confirm_payments),
+    "insufficient_funds" or "sold_out".
+    """
+    amount = qty * raffle["ticket_price"]
+    reference = f"wallet_{user_id}_{uuid.uuid4().hex}"
+
+    async with async_session() as db:
+        if not await debit(db, user_id, amount, "purchase", reference):
+            return {"status": "insufficient_funds"}
+
+        if not await reserve(db, raffle["id"], qty):
+            await db.rollback()
+            return {"status": "sold_out"}
+
+        await db.execute(insert(RaffleEntry).values(
+            user_id=user_id,
+            raffle_id=raffle["id"],
+            reference=reference,
+            amount=amount,
+            quantity=qty,
+            confirmed=False,
+        ))
+        await bump(db, raffle["id"], entries_created=1)
+
+        result = (await confirm_payments(db, [(reference, amount)]))[reference]
+        await db.commit()
+
+    return result
@@ -0,0 +1,157 @@
+# app/logging_setup.py
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from app.config import LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATES, TRACE_SAMPLE_RATE
+
+# Carries e.g. a Paystack reference or a Telegram update id through
+# everything one request does; asyncio copies it into tasks it spawns.
+correlation_id = contextvars.ContextVar("correlation_id", default=None)
+
+# attributes every LogRecord has; anything else came in through extra=
+_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "correlation_id", "taskName",
+}
+
+_listener = None
+
+
+# ============================================================
+#                        FORMATTERS
+# ============================================================
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, correlation_id, extras."""
+
+    def format(self, record):
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.correlation_id:
+            out["correlation_id"] = record.correlation_id
+        for key, value in vars(record).items():
+            if key not in _STANDARD:
+                out[key] = value
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, default=str, ensure_ascii=False)
+
+
+def _text_formatter():
+    return logging.Formatter(
+        "%(asctime)s %(levelname)s %(name)s [%(correlation_id)s] %(message)s"
+    )
+
+
+# ============================================================
+#                    FILTERS AND HANDLERS
+# ============================================================
+class _ContextFilter(logging.Filter):
+    # runs in the caller before the record is queued, so the contextvar
+    # still holds the caller's value
+    def filter(self, record):
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """
+    Keeps a `rate` fraction of records below WARNING; warnings and errors
+    always pass. Kept records carry sample_rate so counts can be scaled.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        if random.random() < self.rate:
+            record.sample_rate = self.rate
+            return True
+        return False
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # render the message and traceback now (the args may change after
+        # this call returns) but leave the formatting to the listener thread
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging():
+    """
+    Routes all logging through an in-memory queue: the event loop only
+    enqueues, and a background thread formats and writes to stdout.
+    Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    q = queue.SimpleQueue()
+    out = logging.StreamHandler(sys.stdout)
+    out.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else _text_formatter())
+
+    handler = _QueueHandler(q)
+    handler.addFilter(_ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    for name, rate in LOG_SAMPLE_RATES.items():
+        logging.getLogger(name).addFilter(SampleFilter(rate))
+    logging.getLogger("app.trace").addFilter(SampleFilter(TRACE_SAMPLE_RATE))
+
+    _listener = logging.handlers.QueueListener(q, out, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+# ============================================================
+#                          TRACING
+# ============================================================
+_trace = logging.getLogger("app.trace")
+
+
+@contextmanager
+def span(name: str, **fields):
+    """
+    Times a block and logs it under the current correlation id. Sampled
+    (TRACE_SAMPLE_RATE) when it succeeds, always logged when it raises.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        _trace.warning(name, extra={
+            "span": name,
+            "ms": round((time.perf_counter() - started) * 1000, 2),
+            "error": True,
+            **fields,
+        })
+        raise
+    _trace.info(name, extra={
+        "span": name,
+        "ms": round((time.perf_counter() - started) * 1000, 2),
+        **fields,
+    })
@@ -1,37 +1,81 @@
 # app/main.py
+import asyncio
+import logging
+
 from fastapi import FastAPI, Request
-from aiogram import Bot, Dispatcher
-from aiogram.types import Update
+from fastapi.responses import PlainTextResponse
 
-from app.config import BOT_TOKEN
-from app.database import engine, Base
-from app.bot import register_handlers
-from app.paystack import verify_paystack_webhook
+from app.background import start_background
+from app.config import BOT_MODE, SCHEMA_CHECK
+from app.logging_setup import configure_logging, correlation_id
+from app.metrics import render_all
+from app.routers import admin_export, admin_revenue, paystack_webhook
 
 app = FastAPI()
+app.include_router(admin_export.router)
+app.include_router(admin_revenue.router)
+app.include_router(paystack_webhook.router)
+
+# Built on the first Telegram update, not at import (see _dispatcher)
+_dp = None
+
+log = logging.getLogger(__name__)
+
+
+def _dispatcher():
+    global _dp
+    if _dp is None:
+        from aiogram import Dispatcher
+        from app.bot import register_handlers
 
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher()
+        _dp = Dispatcher()
+        register_handlers(_dp)
+    return _dp
 
-# register bot handlers
-register_handlers(dp)
 
+if BOT_MODE == "webhook":
+    # in polling mode a worker owns updates, so this route isn't exposed
 
-@app.post("/webhook/paystack")
-async def paystack_webhook(request: Request):
-    return await verify_paystack_webhook(request)
+    @app.post("/webhook/telegram")
+    async def telegram_webhook(request: Request):
+        from aiogram.types import Update
+        from app.telegram import get_bot
 
+        data = await request.json()
+        update = Update.model_validate(data)
+        correlation_id.set(f"tg:{update.update_id}")
+        await _dispatcher().feed_update(get_bot(), update)
+        return {"ok": True}
 
-@app.post("/webhook/telegram")
-async def telegram_webhook(request: Request):
-    data = await request.json()
-    update = Update.model_validate(data)
-    await dp.feed_update(bot, update)
+
+@app.get("/healthz")
+async def healthz():
     return {"ok": True}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_all()
+
+
 @app.on_event("startup")
 async def startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    print("✅ Bot started & DB ready")
+    configure_logging()
+    # Migrations are a deploy step (alembic upgrade head). Running them
+    # here would make the first webhook after a wake-up wait on them.
+    if SCHEMA_CHECK == "background":
+        from app.init_db import init_db
+        app.state.schema = asyncio.create_task(init_db())
+    else:
+        from app.raffles import ensure_default_raffle
+        app.state.schema = asyncio.create_task(ensure_default_raffle())
+    app.state.background = start_background()
+    log.info("Bot started")
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    from app.paystack import close_client
+    from app.webhook_store import flush
+    await flush()
+    await close_client()
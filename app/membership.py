@@ -0,0 +1,162 @@
+# app/membership.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select
+
+from app.config import (
+    CHANNEL_USERNAME,
+    MEMBERSHIP_GATE_ENABLED,
+    MEMBERSHIP_TTL_SECONDS,
+    MEMBERSHIP_NEGATIVE_TTL_SECONDS,
+    MEMBERSHIP_REVALIDATE_CONCURRENCY,
+)
+from app.database import read_session
+from app.metrics import Counter
+from app.models import Ticket, User
+from app.send_rate import limiter
+from app.telegram import get_bot
+
+log = logging.getLogger(__name__)
+
+hits = Counter("membership_cache_hits_total", "Membership answered from the cache")
+misses = Counter("membership_cache_misses_total", "Membership looked up with getChatMember")
+lookup_errors = Counter("membership_lookup_errors_total", "getChatMember calls that failed")
+denied = Counter("membership_denied_total", "Gated taps refused to non-members")
+
+_MEMBER_STATUSES = {"creator", "administrator", "member"}
+
+# telegram id -> (is_member, expires_at); bounded LRU
+_MAX_ENTRIES = 100_000
+_cache = OrderedDict()
+# telegram id -> lookup in flight, so a double tap makes one API call
+_inflight = {}
+
+
+def _remember(user_id: int, member: bool, ttl: float):
+    _cache[user_id] = (member, time.monotonic() + ttl)
+    _cache.move_to_end(user_id)
+    if len(_cache) > _MAX_ENTRIES:
+        _cache.popitem(last=False)
+
+
+async def _lookup(user_id: int) -> bool:
+    """
+    Asks Telegram and caches the answer: members for MEMBERSHIP_TTL_SECONDS,
+    non-members for MEMBERSHIP_NEGATIVE_TTL_SECONDS. A failed lookup counts
+    as a member (for the negative TTL) so an API problem can't lock
+    everyone out or make every tap retry it.
+    """
+    from aiogram.exceptions import TelegramRetryAfter  # aiogram stays out of cold start
+
+    misses.inc()
+    for _ in range(3):
+        try:
+            cm = await get_bot().get_chat_member(CHANNEL_USERNAME, user_id)
+            member = cm.status in _MEMBER_STATUSES or (
+                cm.status == "restricted" and getattr(cm, "is_member", False)
+            )
+            _remember(user_id, member,
+                      MEMBERSHIP_TTL_SECONDS if member else MEMBERSHIP_NEGATIVE_TTL_SECONDS)
+            return member
+        except TelegramRetryAfter as e:
+            limiter.pause(e.retry_after)
+            await limiter.acquire()
+        except Exception as e:
+            log.info("Membership lookup failed", extra={"telegram_id": user_id, "error": repr(e)})
+            break
+    lookup_errors.inc()
+    _remember(user_id, True, MEMBERSHIP_NEGATIVE_TTL_SECONDS)
+    return True
+
+
+async def is_member(user_id: int, refresh: bool = False) -> bool:
+    """True if the user is in CHANNEL_USERNAME, from the cache when fresh."""
+    if not refresh:
+        cached = _cache.get(user_id)
+        if cached is not None and cached[1] > time.monotonic():
+            hits.inc()
+            return cached[0]
+
+    task = _inflight.get(user_id)
+    if task is None:
+        task = _inflight[user_id] = asyncio.ensure_future(_lookup(user_id))
+        task.add_done_callback(lambda _: _inflight.pop(user_id, None))
+    return await task
+
+
+# ============================================================
+#                         MIDDLEWARE
+# ============================================================
+class MembershipGate:
+    """
+    Runs handlers flagged membership=True only for channel members;
+    everyone else gets `on_denied(event)` instead. Inner middleware
+    (router.message.middleware), so the handler's flags are known.
+    A plain callable rather than a BaseMiddleware, so importing this
+    module (the scheduler does) doesn't load aiogram.
+    """
+
+    def __init__(self, on_denied):
+        self.on_denied = on_denied
+
+    async def __call__(self, handler, event, data):
+        from aiogram.dispatcher.flags import get_flag
+
+        user = data.get("event_from_user")
+        if not MEMBERSHIP_GATE_ENABLED or user is None or not get_flag(data, "membership"):
+            return await handler(event, data)
+        if await is_member(user.id):
+            return await handler(event, data)
+        denied.inc()
+        return await self.on_denied(event)
+
+
+# ============================================================
+#                      DRAW REVALIDATION
+# ============================================================
+async def revalidate(telegram_ids, on_progress=None) -> dict:
+    """
+    Looks every user up again, MEMBERSHIP_REVALIDATE_CONCURRENCY at a
+    time within the shared Telegram rate. `on_progress(done)` is awaited
+    every 500 lookups. Returns {telegram id: is_member}.
+    """
+    todo = iter(set(telegram_ids))
+    results = {}
+
+    async def worker():
+        for user_id in todo:  # shared iterator: each id goes to one worker
+            await limiter.acquire()
+            results[user_id] = await is_member(user_id, refresh=True)
+            if on_progress and len(results) % 500 == 0:
+                await on_progress(len(results))
+
+    await asyncio.gather(*(worker() for _ in range(MEMBERSHIP_REVALIDATE_CONCURRENCY)))
+    return results
+
+
+async def non_member_holders(raffle_id: int, on_progress=None) -> list:
+    """
+    User ids of the raffle's ticket holders who have left the channel,
+    to leave out of its draw. Empty when the gate is off.
+    """
+    if not MEMBERSHIP_GATE_ENABLED:
+        return []
+    async with read_session() as db:
+        holders = (
+            await db.execute(
+                select(User.id, User.telegram_id).where(
+                    User.id.in_(select(Ticket.user_id).where(Ticket.raffle_id == raffle_id))
+                )
+            )
+        ).all()
+    by_tg = {int(h.telegram_id): h.id for h in holders
+             if h.telegram_id and h.telegram_id.lstrip("-").isdigit()}
+    members = await revalidate(by_tg, on_progress)
+    left = [by_tg[tg] for tg, member in members.items() if not member]
+    log.info("Draw holders revalidated", extra={
+        "raffle_id": raffle_id, "holders": len(by_tg), "excluded": len(left),
+    })
+    return left
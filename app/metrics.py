@@ -0,0 +1,72 @@
+# app/metrics.py
+# Tiny in-process metrics registry, rendered in Prometheus text format
+# at GET /metrics.
+
+_registry = {}
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str = ""):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        _registry[name] = self
+
+    def inc(self, n: int = 1):
+        self.value += n
+
+    def render(self) -> str:
+        return (
+            f"# HELP {self.name} {self.help}\n"
+            f"# TYPE {self.name} counter\n"
+            f"{self.name} {self.value}\n"
+        )
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str = ""):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        _registry[name] = self
+
+    def set(self, value):
+        self.value = value
+
+    def render(self) -> str:
+        return (
+            f"# HELP {self.name} {self.help}\n"
+            f"# TYPE {self.name} gauge\n"
+            f"{self.name} {self.value}\n"
+        )
+
+
+class Summary:
+    """Count, sum and max of observed values."""
+
+    def __init__(self, name: str, help_text: str = ""):
+        self.name = name
+        self.help = help_text
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        _registry[name] = self
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def render(self) -> str:
+        return (
+            f"# HELP {self.name} {self.help}\n"
+            f"# TYPE {self.name} summary\n"
+            f"{self.name}_count {self.count}\n"
+            f"{self.name}_sum {self.sum}\n"
+            f"{self.name}_max {self.max}\n"
+        )
+
+
+def render_all() -> str:
+    return "".join(m.render() for m in _registry.values())
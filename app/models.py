@@ -4,12 +4,16 @@ from sqlalchemy import (
     String,
     Boolean,
     DateTime,
+    LargeBinary,
     ForeignKey,
+    Index,
+    UniqueConstraint,
     func,
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
+from app.utils import TICKET_PRICE
 
 
 # ============================================================
@@ -22,14 +26,44 @@ class User(Base):
     telegram_id = Column(String, unique=True, index=True, nullable=False)
     username = Column(String, default="")
     email = Column(String, default="")
-    balance = Column(Integer, default=0)
+    balance = Column(Integer, default=0)  # cache of the wallet ledger sum
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
     tickets = relationship("Ticket", back_populates="user")
     entries = relationship("RaffleEntry", back_populates="user")
 
 
+# ============================================================
+#                       RAFFLE ROUND
+# ============================================================
+class Raffle(Base):
+    """
+    One round of a raffle series. Several series (daily, weekly, mega)
+    can be open at once; `slug` ties a series' rounds together.
+    """
+    __tablename__ = "raffles"
+
+    id = Column(Integer, primary_key=True)
+    slug = Column(String, default="main", index=True, nullable=False)
+    name = Column(String, nullable=False)
+
+    ticket_price = Column(Integer, nullable=False, default=TICKET_PRICE)
+    ticket_cap = Column(Integer)  # None = unlimited
+    close_at = Column(DateTime(timezone=True))
+
+    # inventory counters, see app/inventory.py
+    tickets_reserved = Column(Integer, default=0, server_default="0", nullable=False)
+    tickets_sold = Column(Integer, default=0, server_default="0", nullable=False)
+
+    # open -> closed -> archived
+    status = Column(String, default="open", index=True, nullable=False)
+    closed_by = Column(String)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    closed_at = Column(DateTime(timezone=True))
+
+
 # ============================================================
 #                          TICKET
 # ============================================================
@@ -40,11 +74,33 @@ class Ticket(Base):
     code = Column(String, unique=True, index=True, nullable=False)
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    raffle_id = Column(Integer, ForeignKey("raffles.id"), index=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="tickets")
 
+    __table_args__ = (
+        Index("ix_tickets_raffle_user", "raffle_id", "user_id"),
+    )
+
+
+# ============================================================
+#                      ARCHIVED TICKET
+# ============================================================
+class ArchivedTicket(Base):
+    """Ticket from a closed round, moved out of the hot tickets table."""
+    __tablename__ = "tickets_archive"
+
+    id = Column(Integer, primary_key=True)
+    code = Column(String, index=True, nullable=False)
+
+    user_id = Column(Integer, nullable=False)
+    raffle_id = Column(Integer, index=True)
+
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
 
 # ============================================================
 #                       RAFFLE ENTRY
@@ -55,6 +111,7 @@ class RaffleEntry(Base):
     id = Column(Integer, primary_key=True)
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    raffle_id = Column(Integer, ForeignKey("raffles.id"), index=True)
     reference = Column(String, unique=True, index=True, nullable=False)
 
     amount = Column(Integer, nullable=False)
@@ -66,6 +123,38 @@ class RaffleEntry(Base):
 
     user = relationship("User", back_populates="entries")
 
+    __table_args__ = (
+        # lets the reaper find stale unpaid entries without a full scan
+        Index("ix_raffle_entries_confirmed_created", "confirmed", "created_at"),
+        # per-raffle stats
+        Index("ix_raffle_entries_raffle_confirmed", "raffle_id", "confirmed"),
+    )
+
+
+# ============================================================
+#                   ARCHIVED RAFFLE ENTRY
+# ============================================================
+class ArchivedEntry(Base):
+    """
+    Entry moved out of raffle_entries, either unpaid after its TTL expired
+    or belonging to a closed round.
+    """
+    __tablename__ = "raffle_entries_archive"
+
+    id = Column(Integer, primary_key=True)
+
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    raffle_id = Column(Integer, index=True)
+    reference = Column(String, unique=True, index=True, nullable=False)
+
+    amount = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+    confirmed = Column(Boolean, default=False)
+
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
 
 # ============================================================
 #                       TRANSACTION
@@ -80,10 +169,78 @@ class Transaction(Base):
     status = Column(String, default="pending")
 
     user_id = Column(Integer, ForeignKey("users.id"))
+    raffle_id = Column(Integer, ForeignKey("raffles.id"), index=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # audience segments (app/segments.py), answered from the index alone
+        Index("ix_transactions_raffle_status_user", "raffle_id", "status", "user_id"),
+        Index("ix_transactions_status_user_amount", "status", "user_id", "amount"),
+    )
+
+
+# ============================================================
+#                  PENDING VERIFICATION
+# ============================================================
+class PendingVerification(Base):
+    """Paystack webhooks received while Paystack couldn't be reached to verify them."""
+    __tablename__ = "pending_verifications"
+
+    id = Column(Integer, primary_key=True)
+    reference = Column(String, unique=True, nullable=False)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    last_error = Column(String)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+# ============================================================
+#                      WEBHOOK EVENTS
+# ============================================================
+class WebhookEvent(Base):
+    """
+    Append-only log of every signed Paystack webhook, exactly as received
+    (zlib-compressed), for replay with python -m app.webhook_replay.
+    """
+    __tablename__ = "webhook_events"
+
+    id = Column(Integer, primary_key=True)
+    received_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    event = Column(String)  # e.g. charge.success
+    reference = Column(String, index=True)
+    signature = Column(String)  # x-paystack-signature, for replay as-is
+    body = Column(LargeBinary, nullable=False)
+
+
+# ============================================================
+#                      WALLET LEDGER
+# ============================================================
+class LedgerEntry(Base):
+    """
+    Append-only record of every wallet movement; User.balance is its
+    running sum. Never update or delete rows, post a correcting entry.
+    """
+    __tablename__ = "wallet_ledger"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    amount = Column(Integer, nullable=False)  # ₦, negative for debits
+    kind = Column(String, nullable=False)  # referral, refund, purchase, adjustment
+    reference = Column(String, unique=True, nullable=False)  # idempotency key
+    note = Column(String)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_wallet_ledger_user_id", "user_id", "id"),
+    )
+
+
 # ============================================================
 #                          WINNER
 # ============================================================
@@ -94,6 +251,64 @@ class Winner(Base):
 
     ticket_code = Column(String, index=True)
     user_id = Column(Integer)
+    raffle_id = Column(Integer, ForeignKey("raffles.id"), index=True)
 
     announced_by = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# ============================================================
+#                      REVENUE ROLLUP
+# ============================================================
+class RevenueRollup(Base):
+    """Hourly counters kept up to date as entries are created and paid."""
+    __tablename__ = "revenue_rollups"
+
+    id = Column(Integer, primary_key=True)
+
+    bucket = Column(DateTime(timezone=True), nullable=False)  # start of the hour, UTC
+    raffle_id = Column(Integer, nullable=False, default=0)  # 0 = no round
+
+    entries_created = Column(Integer, nullable=False, default=0)
+    entries_confirmed = Column(Integer, nullable=False, default=0)
+    tickets = Column(Integer, nullable=False, default=0)
+    revenue = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("bucket", "raffle_id", name="uq_revenue_rollups_bucket_raffle"),
+    )
+
+
+# ============================================================
+#                           JOB
+# ============================================================
+class Job(Base):
+    """
+    A task for a given time (close_round, draw, reminder), run at least
+    once by app/scheduler.py. `key` makes scheduling idempotent, and
+    handlers must be safe to run again.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    key = Column(String, unique=True, nullable=False)  # e.g. close_round:12
+    kind = Column(String, nullable=False)
+    raffle_id = Column(Integer, ForeignKey("raffles.id"))
+
+    run_at = Column(DateTime(timezone=True), nullable=False)
+    # pending -> running -> done | failed
+    status = Column(String, default="pending", server_default="pending", nullable=False)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    progress = Column(Integer)  # where a long job resumes, e.g. last user id messaged
+
+    # lease: another worker may take the job over once it expires
+    locked_by = Column(String)
+    locked_until = Column(DateTime(timezone=True))
+    last_error = Column(String)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
@@ -0,0 +1,103 @@
+# app/navigation.py
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+
+from app.metrics import Counter
+
+log = logging.getLogger(__name__)
+
+edits = Counter("nav_edits_total", "Menu screens shown by editing in place")
+skipped = Counter("nav_edits_skipped_total", "Edits skipped, screen already showing")
+fallback_sends = Counter("nav_fallback_sends_total", "Screens sent as a new message")
+
+# (chat_id, message_id) -> digest of the screen it shows; bounded LRU
+_MAX_SCREENS = 10_000
+_screens = OrderedDict()
+
+
+def _digest(text: str, reply_markup, parse_mode) -> bytes:
+    markup = reply_markup.model_dump_json(exclude_none=True) if reply_markup else ""
+    return hashlib.blake2b(
+        f"{parse_mode}\0{text}\0{markup}".encode(), digest_size=16
+    ).digest()
+
+
+def _remember(key, digest: bytes):
+    _screens[key] = digest
+    _screens.move_to_end(key)
+    if len(_screens) > _MAX_SCREENS:
+        _screens.popitem(last=False)
+
+
+def _unchanged(msg, key, digest, text, reply_markup, parse_mode) -> bool:
+    if _screens.get(key) == digest:
+        return True
+    # not in the cache (restart, other worker): the message itself tells us,
+    # as long as no markup parsing makes its text differ from ours
+    return parse_mode is None and msg.text == text and msg.reply_markup == reply_markup
+
+
+async def show(cb, text: str, reply_markup=None, parse_mode=None,
+               answer_text: str = None, show_alert: bool = False):
+    """
+    Shows a screen in the message whose button was tapped: one edit
+    instead of a new message, skipped entirely when that message already
+    shows it (Telegram rejects identical edits), with the callback
+    acknowledged concurrently. Messages that can't be edited (too old,
+    media) get a new message instead.
+    """
+    msg = cb.message
+    digest = _digest(text, reply_markup, parse_mode)
+    if msg is None:  # inline-mode message: nothing to edit or reply in
+        await _ack(cb, answer_text, show_alert)
+        return
+
+    if not isinstance(msg, Message):
+        # InaccessibleMessage: too old for Telegram to include, can't be edited
+        work = _send(cb.bot, msg.chat.id, digest, text, reply_markup, parse_mode)
+    else:
+        key = (msg.chat.id, msg.message_id)
+        if _unchanged(msg, key, digest, text, reply_markup, parse_mode):
+            skipped.inc()
+            _remember(key, digest)
+            await _ack(cb, answer_text, show_alert)
+            return
+        work = _edit(cb.bot, msg, key, digest, text, reply_markup, parse_mode)
+
+    _, result = await asyncio.gather(
+        _ack(cb, answer_text, show_alert), work, return_exceptions=True,
+    )
+    if isinstance(result, Exception):
+        raise result
+
+
+async def _ack(cb, answer_text, show_alert):
+    try:
+        await cb.answer(answer_text, show_alert=show_alert)
+    except Exception as e:
+        # an expired query can't be acknowledged, the screen still counts
+        log.debug("Callback ack failed", extra={"error": repr(e)})
+
+
+async def _edit(bot, msg, key, digest, text, reply_markup, parse_mode):
+    try:
+        await msg.edit_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        edits.inc()
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            await _send(bot, msg.chat.id, digest, text, reply_markup, parse_mode)
+            return
+        skipped.inc()
+    _remember(key, digest)
+
+
+async def _send(bot, chat_id, digest, text, reply_markup, parse_mode):
+    sent = await bot.send_message(chat_id, text, reply_markup=reply_markup,
+                                  parse_mode=parse_mode)
+    fallback_sends.inc()
+    _remember((sent.chat.id, sent.message_id), digest)
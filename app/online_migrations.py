@@ -0,0 +1,239 @@
+# app/online_migrations.py
+import logging
+import time
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from alembic import op
+
+# "alembic.*" so progress shows up with alembic's own console logging
+log = logging.getLogger("alembic.online")
+
+# Helpers for alembic revisions that must run against a live database.
+# Postgres gets the non-blocking forms; SQLite (dev) gets the plain ones,
+# since it locks the whole file for any write anyway.
+
+
+def _bind():
+    return op.get_bind()
+
+
+def _is_postgres() -> bool:
+    return _bind().dialect.name == "postgresql"
+
+
+def has_table(table: str) -> bool:
+    return sa.inspect(_bind()).has_table(table)
+
+
+def has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in sa.inspect(_bind()).get_columns(table)}
+
+
+def has_index(table: str, name: str) -> bool:
+    return name in {i["name"] for i in sa.inspect(_bind()).get_indexes(table)}
+
+
+def lock_timeout(value: str = "5s"):
+    """
+    Makes DDL in the current migration give up after `value` waiting for
+    its lock instead of queueing behind a long transaction, which would
+    block every query that queues up behind the DDL in turn.
+    Rerun the deploy if it times out.
+    """
+    if _is_postgres():
+        op.execute(f"SET LOCAL lock_timeout = '{value}'")
+
+
+# ============================================================
+#                          INDEXES
+# ============================================================
+def create_index_concurrently(name: str, table: str, columns: list,
+                              unique: bool = False, **kw):
+    """
+    Builds an index without blocking writes (CREATE INDEX CONCURRENTLY,
+    outside the migration's transaction). Safe to rerun: an existing valid
+    index is kept, and the INVALID leftover of an interrupted build is
+    dropped and rebuilt.
+    """
+    if not _is_postgres():
+        if not has_index(table, name):
+            op.create_index(name, table, columns, unique=unique, **kw)
+        return
+
+    with op.get_context().autocommit_block():
+        valid = _bind().execute(
+            sa.text(
+                "SELECT i.indisvalid FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+            ),
+            {"name": name},
+        ).scalar()
+        if valid:
+            return
+        if valid is False:
+            log.warning("Rebuilding invalid index %s", name)
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+        started = time.monotonic()
+        op.create_index(name, table, columns, unique=unique,
+                        postgresql_concurrently=True, **kw)
+        log.info("Built index %s in %.1fs", name, time.monotonic() - started)
+
+
+def drop_index_concurrently(name: str, table: str):
+    if not _is_postgres():
+        if has_index(table, name):
+            op.drop_index(name, table_name=table)
+        return
+    with op.get_context().autocommit_block():
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+# ============================================================
+#                         COLUMNS
+# ============================================================
+def add_column_if_missing(table: str, column: sa.Column) -> bool:
+    """
+    ADD COLUMN unless it's already there. Keep new columns nullable or
+    give them a constant server_default: on Postgres 11+ either one is a
+    catalog-only change, with no table rewrite.
+    """
+    if has_column(table, column.name):
+        return False
+    lock_timeout()
+    op.add_column(table, column)
+    return True
+
+
+@contextmanager
+def _committed_steps(timeout: str = None):
+    """
+    Runs the block outside the migration's transaction, every statement
+    committed on its own, so no lock outlives its statement. With
+    `timeout`, DDL gives up after that long waiting for its lock.
+    """
+    with op.get_context().autocommit_block():
+        if timeout:
+            op.execute(f"SET lock_timeout = '{timeout}'")
+        try:
+            yield
+        finally:
+            if timeout:
+                op.execute("RESET lock_timeout")
+
+
+def _not_null_state(table: str, column: str, check: str) -> tuple:
+    """(column is nullable, check constraint: None missing / False NOT VALID / True valid)."""
+    bind = _bind()
+    nullable = bind.execute(
+        sa.text(
+            "SELECT is_nullable FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :table "
+            "AND column_name = :column"
+        ),
+        {"table": table, "column": column},
+    ).scalar()
+    validated = bind.execute(
+        sa.text(
+            "SELECT convalidated FROM pg_constraint "
+            "WHERE conname = :check AND conrelid = to_regclass(:table)"
+        ),
+        {"check": check, "table": f'"{table}"'},
+    ).scalar()
+    return nullable == "YES", validated
+
+
+def set_not_null(table: str, column: str):
+    """
+    SET NOT NULL without a long exclusive lock. On Postgres a NOT VALID
+    check is added, then validated under a lock that lets writes
+    through, and SET NOT NULL trusts it instead of scanning; each step is
+    committed on its own, and the steps already done are skipped, so an
+    interrupted run can be rerun. SQLite can't alter columns; the
+    constraint stays in the models only.
+    """
+    if not _is_postgres():
+        log.info("Skipping NOT NULL on %s.%s (sqlite)", table, column)
+        return
+    check = f"{table}_{column}_not_null"
+    nullable, validated = _not_null_state(table, column, check)
+
+    if nullable:
+        if validated is None:
+            with _committed_steps(timeout="5s"):  # brief ACCESS EXCLUSIVE, no scan
+                op.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{check}" '
+                           f'CHECK ("{column}" IS NOT NULL) NOT VALID')
+        if not validated:
+            started = time.monotonic()
+            with _committed_steps():  # the scan, under SHARE UPDATE EXCLUSIVE
+                op.execute(f'ALTER TABLE "{table}" VALIDATE CONSTRAINT "{check}"')
+            log.info("Validated %s in %.1fs", check, time.monotonic() - started)
+        with _committed_steps(timeout="5s"):
+            op.execute(f'ALTER TABLE "{table}" ALTER COLUMN "{column}" SET NOT NULL')
+
+    if validated is not None or nullable:
+        # the check is redundant once the column is NOT NULL
+        with _committed_steps(timeout="5s"):
+            op.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT IF EXISTS "{check}"')
+
+
+# ============================================================
+#                         BACKFILLS
+# ============================================================
+def backfill(table: str, assignments: str, where: str = None,
+             batch_size: int = 5000, pause: float = 0.05, key: str = "id") -> int:
+    """
+    Runs UPDATE `table` SET `assignments` [WHERE `where`] in slices of
+    `batch_size` primary keys, each committed on its own so no batch holds
+    row locks for long, sleeping `pause` seconds between slices to leave
+    headroom for the app. Progress and an ETA are logged as it goes.
+    Resumable when `where` excludes rows already done.
+    Returns the number of rows updated.
+    """
+    bind = _bind()
+    with op.get_context().autocommit_block():
+        lo, hi = bind.execute(sa.text(f"SELECT min({key}), max({key}) FROM {table}")).one()
+        if lo is None:
+            return 0
+
+        stmt = sa.text(
+            f"UPDATE {table} SET {assignments} WHERE {key} > :lo AND {key} <= :hi"
+            + (f" AND ({where})" if where else "")
+        )
+        updated = 0
+        started = last_report = time.monotonic()
+        cursor = lo - 1
+        while cursor < hi:
+            updated += bind.execute(stmt, {"lo": cursor, "hi": cursor + batch_size}).rowcount or 0
+            cursor += batch_size
+
+            now = time.monotonic()
+            if now - last_report >= 5 or cursor >= hi:
+                done = min(cursor, hi) - lo + 1
+                total = hi - lo + 1
+                eta = (now - started) / done * (total - done)
+                log.info("Backfill %s: %d%% of ids, %d rows updated, eta %.0fs",
+                         table, done * 100 // total, updated, eta)
+                last_report = now
+            if pause:
+                time.sleep(pause)
+    return updated
+
+
+def add_column_with_backfill(table: str, column: sa.Column, value: str,
+                             not_null: bool = False, **backfill_kw) -> int:
+    """
+    The expand step for a new column on a big table: add it nullable,
+    fill existing rows with `value` (a SQL expression) in throttled
+    batches, then optionally enforce NOT NULL. Deploy code that writes the
+    column before this runs, so rows inserted meanwhile aren't left NULL.
+    """
+    column.nullable = True
+    add_column_if_missing(table, column)
+    updated = backfill(
+        table, f"{column.name} = {value}", where=f"{column.name} IS NULL", **backfill_kw
+    )
+    if not_null:
+        set_not_null(table, column.name)
+    return updated
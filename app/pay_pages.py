@@ -1,7 +1,10 @@
 # app/pay_pages.py
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import RedirectResponse
-import os, httpx
+import os
+
+from app.breaker import CircuitOpen
+from app.paystack import request
 
 router = APIRouter()
 PAYSTACK_SECRET = os.getenv("PAYSTACK_SECRET")
@@ -25,9 +28,14 @@ async def paystack_create_and_redirect(ref: str = Query(...), tg: str = Query(..
         "reference": ref,
         "metadata": {"tg_user_id": tg}
     }
-    headers = {"Authorization": f"Bearer {PAYSTACK_SECRET}"}
-    async with httpx.AsyncClient(timeout=20) as client:
-        resp = await client.post("https://api.paystack.co/transaction/initialize", json=body, headers=headers)
+    try:
+        resp = await request("POST", "/transaction/initialize", json=body)
+    except CircuitOpen as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Payments are temporarily unavailable, please retry shortly",
+            headers={"Retry-After": str(int(e.retry_after) + 1)},
+        )
     if resp.status_code not in (200, 201):
         raise HTTPException(status_code=502, detail=f"Paystack error: {resp.text}")
     data = resp.json().get("data") or {}
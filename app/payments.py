@@ -1,15 +1,8 @@
-import os
-import httpx
+from app.paystack import request
 
-PAYSTACK_SECRET = os.getenv("PAYSTACK_SECRET")
 
 async def create_paystack_payment(amount, email, user_id):
 
-    headers = {
-        "Authorization": f"Bearer {PAYSTACK_SECRET}",
-        "Content-Type": "application/json"
-    }
-
     data = {
         "email": email,
         "amount": amount * 100,
@@ -18,9 +11,8 @@ async def create_paystack_payment(amount, email, user_id):
         }
     }
 
-    async with httpx.AsyncClient() as client:
-        r = await client.post("https://api.paystack.co/transaction/initialize",
-            headers=headers, json=data)
+    # goes through the Paystack circuit breaker; raises CircuitOpen while it's down
+    r = await request("POST", "/transaction/initialize", json=data)
 
     r.raise_for_status()
 
@@ -1,30 +1,130 @@
-import httpx
+# app/paystack.py
 import os
 import uuid
 
+from app.breaker import CircuitBreaker
+from app.config import (
+    PAYSTACK_BASE_URL,
+    PAYSTACK_TIMEOUT,
+    BREAKER_WINDOW,
+    BREAKER_MIN_CALLS,
+    BREAKER_FAILURE_RATE,
+    BREAKER_OPEN_SECONDS,
+)
+
 PAYSTACK_SECRET = os.getenv("PAYSTACK_SECRET")
-PAYSTACK_URL = "https://api.paystack.co/transaction/initialize"
+PAYSTACK_URL = f"{PAYSTACK_BASE_URL}/transaction/initialize"
+
+# Shared client, created on the first Paystack call (keeps cold start cheap
+# and reuses connections instead of a new TLS handshake per request)
+_client = None
+
+# Every Paystack call goes through this, so an outage costs one short
+# timeout per call until it opens, then nothing (paystack_breaker_state)
+breaker = CircuitBreaker(
+    "paystack",
+    window=BREAKER_WINDOW,
+    min_calls=BREAKER_MIN_CALLS,
+    failure_rate=BREAKER_FAILURE_RATE,
+    open_seconds=BREAKER_OPEN_SECONDS,
+)
+
+
+class PaystackUnavailable(Exception):
+    """Paystack answered, but with a 5xx or a body that isn't JSON. Retryable."""
+
+
+def get_client():
+    global _client
+    if _client is None:
+        import httpx
+        _client = httpx.AsyncClient(
+            base_url=PAYSTACK_BASE_URL,
+            headers={"Authorization": f"Bearer {PAYSTACK_SECRET}"},
+            timeout=PAYSTACK_TIMEOUT,
+        )
+    return _client
+
+
+async def request(method: str, url: str, **kwargs):
+    """
+    A Paystack API call under the circuit breaker. Network errors,
+    timeouts and 5xx count as failures; raises CircuitOpen without
+    calling Paystack while the circuit is open.
+    """
+    return await breaker.call(
+        get_client().request, method, url,
+        is_failure=lambda res: res.status_code >= 500,
+        **kwargs,
+    )
+
+
+async def _call_json(method: str, url: str, **kwargs) -> dict:
+    res = await get_client().request(method, url, **kwargs)
+    if res.status_code >= 500:
+        raise PaystackUnavailable(f"{method} {url}: HTTP {res.status_code}")
+    try:
+        return res.json()
+    except ValueError:
+        raise PaystackUnavailable(f"{method} {url}: non-JSON body (HTTP {res.status_code})")
+
+
+async def request_json(method: str, url: str, **kwargs) -> dict:
+    """
+    Like request(), for calls whose answer is read: returns the parsed
+    body, and raises PaystackUnavailable on a 5xx or a non-JSON body, which
+    the breaker counts as a failure too. A 4xx still returns its body
+    ({"status": False, "message": ...}), as a definite answer.
+    """
+    return await breaker.call(_call_json, method, url, **kwargs)
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
 
 async def create_paystack_payment(email: str, amount: int, user_id: int):
     reference = f"raffle_{user_id}_{uuid.uuid4().hex}"
 
-    headers = {
-        "Authorization": f"Bearer {PAYSTACK_SECRET}",
-        "Content-Type": "application/json",
-    }
-
     payload = {
         "email": email,
         "amount": amount * 100,  # Paystack uses kobo
         "reference": reference,
+        "metadata": {"tg_user_id": user_id},
         "callback_url": "https://YOUR_DOMAIN/webhook/paystack"
     }
 
-    async with httpx.AsyncClient() as client:
-        res = await client.post(PAYSTACK_URL, json=payload, headers=headers)
-        data = res.json()
+    data = await request_json("POST", "/transaction/initialize", json=payload)
 
     if not data.get("status"):
         raise Exception("Paystack init failed")
 
     return data["data"]["authorization_url"], reference
+
+
+async def verify_payment(reference: str) -> dict:
+    """
+    Paystack's verify response, e.g. {"status": True, "data": {...}}.
+    Raises (PaystackUnavailable, CircuitOpen, network errors) when there's
+    no answer to go by, so the caller retries instead of taking it as a
+    failed payment.
+    """
+    return await request_json("GET", f"/transaction/verify/{reference}")
+
+
+async def list_transactions(since, until, page: int = 1, per_page: int = 100,
+                            status: str = "success") -> dict:
+    """
+    One page of Paystack's transaction list for [since, until], newest
+    first: {"status": ..., "data": [...], "meta": {"page", "pageCount", ...}}.
+    """
+    return await request_json("GET", "/transaction", params={
+        "from": since.isoformat(),
+        "to": until.isoformat(),
+        "status": status,
+        "page": page,
+        "perPage": per_page,
+    })
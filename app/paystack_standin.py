@@ -0,0 +1,152 @@
+# app/paystack_standin.py
+# Local stand-in for the parts of the Paystack API this app uses, for
+# testing payments, webhooks and reconciliation without a real account:
+#   python -m app.paystack_standin [PORT]
+#   PAYSTACK_BASE_URL=http://127.0.0.1:8765 uvicorn app.main:app
+# Opening a checkout URL marks the payment successful; replayed webhooks
+# can preload theirs (POST /_standin/transactions). The charge.success
+# webhook is only sent when STANDIN_WEBHOOK_URL is set, so leaving it unset
+# simulates missed webhooks for the reconciler to recover.
+import hashlib
+import hmac
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, HTTPException, Request
+
+STANDIN_WEBHOOK_URL = os.getenv("STANDIN_WEBHOOK_URL", "")
+PAYSTACK_SECRET = os.getenv("PAYSTACK_SECRET", "")
+
+app = FastAPI()
+_transactions = {}  # reference -> transaction, insertion ordered
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _parse(ts: str):
+    dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+@app.post("/transaction/initialize")
+async def initialize(request: Request):
+    body = await request.json()
+    reference = body.get("reference") or uuid.uuid4().hex
+    if reference in _transactions:
+        return {"status": False, "message": "Duplicate Transaction Reference"}
+
+    _transactions[reference] = {
+        "id": len(_transactions) + 1,
+        "reference": reference,
+        "amount": int(body["amount"]),
+        "currency": body.get("currency", "NGN"),
+        "status": "abandoned",
+        "customer": {"email": body.get("email", "")},
+        "metadata": body.get("metadata") or {},
+        "created_at": _now(),
+        "paid_at": None,
+    }
+    return {
+        "status": True,
+        "message": "Authorization URL created",
+        "data": {
+            "authorization_url": f"{request.base_url}checkout/{reference}",
+            "access_code": reference,
+            "reference": reference,
+        },
+    }
+
+
+@app.get("/checkout/{reference}")
+async def checkout(reference: str):
+    tx = _transactions.get(reference)
+    if tx is None:
+        raise HTTPException(status_code=404, detail="Unknown reference")
+
+    if tx["status"] != "success":
+        tx.update(status="success", paid_at=_now())
+        if STANDIN_WEBHOOK_URL:
+            await _send_webhook(tx)
+    return {"status": True, "message": "Payment successful", "reference": reference}
+
+
+async def _send_webhook(tx: dict):
+    import httpx
+
+    body = json.dumps({"event": "charge.success", "data": tx}).encode()
+    signature = hmac.new(PAYSTACK_SECRET.encode(), body, hashlib.sha512).hexdigest()
+    async with httpx.AsyncClient(timeout=10) as client:
+        try:
+            await client.post(
+                STANDIN_WEBHOOK_URL,
+                content=body,
+                headers={
+                    "content-type": "application/json",
+                    "x-paystack-signature": signature,
+                },
+            )
+        except httpx.HTTPError as e:
+            print("Stand-in webhook failed:", e)
+
+
+@app.post("/_standin/transactions")
+async def load_transactions(request: Request):
+    """
+    Adds paid transactions (the `data` of charge.success webhooks) so
+    verify finds them; used by python -m app.webhook_replay --standin.
+    """
+    loaded = 0
+    for tx in await request.json():
+        if tx.get("reference") and tx["reference"] not in _transactions:
+            _transactions[tx["reference"]] = {**tx, "status": "success"}
+            loaded += 1
+    return {"status": True, "loaded": loaded}
+
+
+@app.get("/transaction/verify/{reference}")
+async def verify(reference: str):
+    tx = _transactions.get(reference)
+    if tx is None:
+        return {"status": False, "message": "Transaction reference not found"}
+    return {"status": True, "message": "Verification successful", "data": tx}
+
+
+@app.get("/transaction")
+async def list_transactions(request: Request):
+    q = request.query_params
+    page = max(int(q.get("page", 1)), 1)
+    per_page = max(int(q.get("perPage", 50)), 1)
+
+    rows = list(reversed(_transactions.values()))  # newest first
+    if q.get("status"):
+        rows = [t for t in rows if t["status"] == q["status"]]
+    if q.get("from"):
+        rows = [t for t in rows if _parse(t["created_at"]) >= _parse(q["from"])]
+    if q.get("to"):
+        rows = [t for t in rows if _parse(t["created_at"]) <= _parse(q["to"])]
+
+    start = (page - 1) * per_page
+    return {
+        "status": True,
+        "message": "Transactions retrieved",
+        "data": rows[start:start + per_page],
+        "meta": {
+            "total": len(rows),
+            "skipped": start,
+            "perPage": per_page,
+            "page": page,
+            "pageCount": -(-len(rows) // per_page),
+        },
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    uvicorn.run(app, host="127.0.0.1", port=port)
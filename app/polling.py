@@ -0,0 +1,176 @@
+# app/polling.py
+import asyncio
+import logging
+import os
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from app.config import (
+    BOT_TOKEN,
+    BOT_MODE,
+    POLLING_CONCURRENCY,
+    POLLING_TIMEOUT,
+    POLLING_DRAIN_SECONDS,
+)
+from app.background import start_background
+from app.bot import register_handlers
+from app.logging_setup import configure_logging, correlation_id
+from app.raffles import ensure_default_raffle
+from app.telegram import set_bot
+
+_MAX_BACKOFF = 60
+
+log = logging.getLogger(__name__)
+
+
+# ============================================================
+#                      POLLING LOOP
+# ============================================================
+async def run_polling(bot: Bot, dp: Dispatcher,
+                      concurrency: int = POLLING_CONCURRENCY):
+    """
+    Long-polls getUpdates and handles up to `concurrency` updates at once.
+    SIGTERM/SIGINT stop fetching, let in-flight handlers finish (up to
+    POLLING_DRAIN_SECONDS) and acknowledge the last handled offset.
+
+    Each getUpdates call confirms every update below its offset, so the
+    offset never passes an update whose handler is still running: an
+    update is confirmed once it and every update before it are handled,
+    and one cut off by a restart is delivered again. While a slow handler
+    holds the offset back, Telegram keeps returning the updates after it;
+    those already dispatched are skipped.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    sem = asyncio.Semaphore(concurrency)
+    tasks = {}  # in-flight handler -> its update id
+    next_id = None  # first update id not dispatched yet
+    backoff = 1
+
+    def _offset():
+        return min(tasks.values()) if tasks else next_id
+
+    async def _handle(update):
+        correlation_id.set(f"tg:{update.update_id}")
+        try:
+            await dp.feed_update(bot, update)
+        except Exception:
+            log.exception("Update handling failed")
+        finally:
+            sem.release()
+
+    # getUpdates is refused while a webhook is set
+    await bot.delete_webhook(drop_pending_updates=False)
+    allowed = dp.resolve_used_update_types()
+    stopping = asyncio.ensure_future(stop.wait())
+
+    while not stop.is_set():
+        poll = asyncio.ensure_future(bot.get_updates(
+            offset=_offset(),
+            timeout=POLLING_TIMEOUT,
+            allowed_updates=allowed,
+        ))
+        await asyncio.wait({poll, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        if stop.is_set():
+            poll.cancel()
+            break
+
+        try:
+            updates = poll.result()
+        except TelegramRetryAfter as e:
+            await _sleep_or_stop(stop, e.retry_after)
+            continue
+        except (TelegramNetworkError, TelegramServerError) as e:
+            log.warning("Polling error, retrying", extra={"backoff": backoff, "error": str(e)})
+            await _sleep_or_stop(stop, backoff)
+            backoff = min(backoff * 2, _MAX_BACKOFF)
+            continue
+        except TelegramAPIError as e:
+            # e.g. 409 Conflict while a webhook is set or another worker polls
+            log.error("getUpdates refused, retrying", extra={"backoff": backoff, "error": str(e)})
+            await _sleep_or_stop(stop, backoff)
+            backoff = min(backoff * 2, _MAX_BACKOFF)
+            continue
+        backoff = 1
+
+        fresh = [u for u in updates if next_id is None or u.update_id >= next_id]
+        for update in fresh:
+            next_id = update.update_id + 1
+            # waits here when saturated, so we stop fetching instead of piling up
+            await sem.acquire()
+            task = asyncio.create_task(_handle(update))
+            tasks[task] = update.update_id
+            task.add_done_callback(lambda t: tasks.pop(t, None))
+
+        if updates and not fresh:
+            # nothing new behind a handler that holds the offset back: wait
+            # for one to finish rather than re-fetch the same updates at once
+            await asyncio.wait([*tasks, stopping], timeout=1,
+                               return_when=asyncio.FIRST_COMPLETED)
+
+    if tasks:
+        log.info("Draining in-flight updates", extra={"updates": len(tasks)})
+        # whatever doesn't finish stays unconfirmed, for the next worker
+        await asyncio.wait(list(tasks), timeout=POLLING_DRAIN_SECONDS)
+
+    offset = _offset()
+    if offset is not None:
+        # confirms everything before `offset` so it isn't redelivered
+        try:
+            await bot.get_updates(offset=offset, timeout=0, limit=1)
+        except Exception:
+            log.warning("Could not confirm the last offset", exc_info=True)
+
+
+async def _sleep_or_stop(stop: asyncio.Event, seconds: float):
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+# ============================================================
+#                       ENTRY POINT
+# ============================================================
+async def _main():
+    bot = Bot(token=BOT_TOKEN)
+    set_bot(bot)
+
+    dp = Dispatcher()
+    register_handlers(dp)
+    await ensure_default_raffle()
+
+    # the reaper, verify queue, reconciler and scheduler: this worker is
+    # the only long-running service in render.yaml
+    background = start_background()
+    try:
+        await run_polling(bot, dp)
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await bot.session.close()
+
+
+def main():
+    """Worker entry point; BOT_MODE picks polling or the webhook server."""
+    if BOT_MODE == "polling":
+        configure_logging()
+        asyncio.run(_main())
+    else:
+        import uvicorn
+        uvicorn.run("app.main:app", host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+# app/raffles.py
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import select, insert, update, delete
+
+from app.config import ARCHIVE_BATCH_SIZE, REAPER_BATCH_PAUSE, DEFAULT_RAFFLE_SLUG
+from app.database import async_session
+from app.utils import TICKET_PRICE
+from app.models import (
+    Raffle,
+    Ticket,
+    ArchivedTicket,
+    RaffleEntry,
+    ArchivedEntry,
+)
+
+# Open raffles are read on almost every tap, so they're cached. Changes made
+# in this process refresh it at once; other workers pick them up within the TTL.
+_CATALOG_TTL = 30
+_catalog = {"raffles": None, "at": 0.0}
+
+_COLUMNS = ("id", "slug", "name", "ticket_price", "ticket_cap", "close_at")
+
+
+# ============================================================
+#                         CATALOG
+# ============================================================
+async def ensure_default_raffle():
+    """
+    Creates the default raffle if no raffle is open. Run at startup, so
+    open_raffles doesn't have to from inside a caller's session: on the
+    tuned SQLite profile that session may hold the only write connection.
+    """
+    async with async_session() as db:
+        if (await db.execute(select(Raffle.id).where(Raffle.status == "open").limit(1))).first():
+            return
+        await db.execute(insert(Raffle).values(
+            slug=DEFAULT_RAFFLE_SLUG,
+            name="MegaWin Raffle",
+            ticket_price=TICKET_PRICE,
+            status="open",
+        ))
+        await db.commit()
+
+
+async def _open_rows(db) -> list:
+    return (
+        await db.execute(
+            select(*[getattr(Raffle, c) for c in _COLUMNS])
+            .where(Raffle.status == "open")
+            .order_by(Raffle.id)
+        )
+    ).mappings().all()
+
+
+async def open_raffles(db) -> list:
+    """
+    Open raffles as plain dicts, oldest first. Creates the default
+    raffle on an empty database.
+    """
+    cached = _catalog["raffles"]
+    if cached and time.monotonic() - _catalog["at"] < _CATALOG_TTL:
+        return cached
+
+    rows = await _open_rows(db)
+    if not rows:
+        # its own session, so the caller's transaction is never committed
+        # here; read back from the primary, since `db` may be a replica
+        # that hasn't seen the new raffle yet
+        await ensure_default_raffle()
+        async with async_session() as primary:
+            rows = await _open_rows(primary)
+
+    _catalog["raffles"] = [dict(r) for r in rows]
+    _catalog["at"] = time.monotonic()
+    return _catalog["raffles"]
+
+
+async def get_raffle(db, raffle_id: int):
+    """The open raffle with this id, or None if it's closed or unknown."""
+    for r in await open_raffles(db):
+        if r["id"] == raffle_id:
+            return r
+    return None
+
+
+async def active_raffle_id(db) -> int:
+    """
+    Id of the default raffle (DEFAULT_RAFFLE_SLUG, else the oldest open
+    one). Used where no raffle is specified, e.g. legacy entries.
+    """
+    raffles = await open_raffles(db)
+    for r in raffles:
+        if r["slug"] == DEFAULT_RAFFLE_SLUG:
+            return r["id"]
+    return raffles[0]["id"]
+
+
+def _utc(value: datetime) -> datetime:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)  # SQLite hands back naive UTC
+    return value
+
+
+def is_selling(raffle: dict) -> bool:
+    """False once the raffle's close time has passed."""
+    close_at = _utc(raffle["close_at"])
+    return close_at is None or datetime.now(timezone.utc) < close_at
+
+
+def _next_close_at(opened_at, close_at):
+    """
+    Close time of the round after one that ran opened_at..close_at: the
+    same length again, skipping whole rounds already in the past (a round
+    closed late by hand). None for rounds without a close time.
+    """
+    opened_at, close_at = _utc(opened_at), _utc(close_at)
+    if close_at is None or opened_at is None or close_at <= opened_at:
+        return None
+    length = close_at - opened_at
+    now = datetime.now(timezone.utc)
+    nxt = close_at + length
+    if nxt <= now:
+        nxt += length * ((now - nxt) // length + 1)
+    return nxt
+
+
+def invalidate_catalog():
+    _catalog["raffles"] = None
+
+
+async def create_raffle(slug: str, name: str, ticket_price: int,
+                        ticket_cap=None, close_at=None) -> int:
+    async with async_session() as db:
+        raffle_id = (
+            await db.execute(
+                insert(Raffle)
+                .values(
+                    slug=slug,
+                    name=name,
+                    ticket_price=ticket_price,
+                    ticket_cap=ticket_cap,
+                    close_at=close_at,
+                    status="open",
+                )
+                .returning(Raffle.id)
+            )
+        ).scalar_one()
+        await db.commit()
+
+    invalidate_catalog()
+    return raffle_id
+
+
+# ============================================================
+#                       CLOSE ROUND
+# ============================================================
+async def close_round(closed_by: str, raffle_id: int = None):
+    """
+    Closes a raffle (the default one if not given) and opens the next
+    round of the same series with the same price, cap and round length.
+    Returns (closed_id, new_id), or None if it isn't open.
+    """
+    async with async_session() as db:
+        if raffle_id is None:
+            raffle_id = await active_raffle_id(db)
+
+        current = (
+            await db.execute(
+                update(Raffle)
+                .where(Raffle.id == raffle_id, Raffle.status == "open")
+                .values(
+                    status="closed",
+                    closed_by=closed_by,
+                    closed_at=datetime.now(timezone.utc),
+                )
+                .returning(Raffle.slug, Raffle.name, Raffle.ticket_price,
+                           Raffle.ticket_cap, Raffle.created_at, Raffle.close_at)
+            )
+        ).one_or_none()
+
+        if current is None:
+            return None
+
+        new_id = (
+            await db.execute(
+                insert(Raffle)
+                .values(
+                    slug=current.slug,
+                    name=current.name,
+                    ticket_price=current.ticket_price,
+                    ticket_cap=current.ticket_cap,
+                    close_at=_next_close_at(current.created_at, current.close_at),
+                    status="open",
+                )
+                .returning(Raffle.id)
+            )
+        ).scalar_one()
+        await db.commit()
+
+    invalidate_catalog()
+    return raffle_id, new_id
+
+
+# ============================================================
+#                      ARCHIVE ROUND
+# ============================================================
+async def _move_batch(model, archive_model, raffle_id: int, cols: list) -> int:
+    async with async_session() as db:
+        ids = (
+            await db.execute(
+                select(model.id)
+                .where(model.raffle_id == raffle_id)
+                .order_by(model.id)
+                .limit(ARCHIVE_BATCH_SIZE)
+            )
+        ).scalars().all()
+
+        if not ids:
+            return 0
+
+        # archive rows get their own ids; SQLite may hand a deleted rowid out again
+        rows = (
+            await db.execute(
+                delete(model)
+                .where(model.id.in_(ids))
+                .returning(*[getattr(model, c) for c in cols])
+            )
+        ).mappings().all()
+
+        if rows:
+            await db.execute(insert(archive_model), [dict(r) for r in rows])
+        await db.commit()
+
+    return len(rows)
+
+
+async def archive_round(raffle_id: int) -> int:
+    """
+    Moves a closed round's tickets and entries into the archive tables
+    in batches, then marks the round archived. Safe to re-run.
+    Returns the number of rows moved.
+
+    Transactions and winners stay where they are. Transactions are what
+    audience segments (bought(last), spent, ...) and rollup rebuilds read
+    across every round, through indexes made for that; the hot paths
+    (ticket lookups, confirmations, the reaper) never scan them. Winners
+    are a few rows per round and the permanent record of the draw.
+    """
+    moved = 0
+    jobs = [
+        (Ticket, ArchivedTicket,
+         ["code", "user_id", "raffle_id", "created_at"]),
+        (RaffleEntry, ArchivedEntry,
+         ["user_id", "raffle_id", "reference", "amount",
+          "quantity", "confirmed", "created_at"]),
+    ]
+
+    for model, archive_model, cols in jobs:
+        while True:
+            n = await _move_batch(model, archive_model, raffle_id, cols)
+            moved += n
+            if n < ARCHIVE_BATCH_SIZE:
+                break
+            await asyncio.sleep(REAPER_BATCH_PAUSE)
+
+    async with async_session() as db:
+        await db.execute(
+            update(Raffle)
+            .where(Raffle.id == raffle_id, Raffle.status == "closed")
+            .values(status="archived")
+        )
+        await db.commit()
+
+    return moved
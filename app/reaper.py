@@ -0,0 +1,173 @@
+# app/reaper.py
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, insert, delete
+
+from app.config import (
+    ENTRY_TTL_MINUTES,
+    REAPER_BATCH_SIZE,
+    REAPER_BATCH_PAUSE,
+    REAPER_INTERVAL_SECONDS,
+)
+from app.database import async_session
+from app.inventory import release
+from app.models import Raffle, RaffleEntry, ArchivedEntry
+from app.raffles import active_raffle_id
+
+log = logging.getLogger(__name__)
+
+
+# ============================================================
+#                     SINGLE BATCH
+# ============================================================
+async def reap_once(batch_size: int = REAPER_BATCH_SIZE) -> int:
+    """
+    Moves up to `batch_size` unpaid entries older than the TTL into
+    raffle_entries_archive and releases their ticket holds. Returns how
+    many rows were moved.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=ENTRY_TTL_MINUTES)
+
+    async with async_session() as db:
+        ids = (
+            await db.execute(
+                select(RaffleEntry.id)
+                .where(
+                    RaffleEntry.confirmed.is_(False),
+                    RaffleEntry.created_at < cutoff,
+                )
+                .order_by(RaffleEntry.id)
+                .limit(batch_size)
+            )
+        ).scalars().all()
+
+        if not ids:
+            return 0
+
+        # delete first and archive what actually went, so an entry confirmed
+        # between the select and the delete is never archived
+        rows = (
+            await db.execute(
+                delete(RaffleEntry)
+                .where(
+                    RaffleEntry.id.in_(ids),
+                    RaffleEntry.confirmed.is_(False),
+                )
+                .returning(
+                    RaffleEntry.user_id,
+                    RaffleEntry.raffle_id,
+                    RaffleEntry.reference,
+                    RaffleEntry.amount,
+                    RaffleEntry.quantity,
+                    RaffleEntry.created_at,
+                )
+            )
+        ).mappings().all()
+
+        if rows:
+            await db.execute(insert(ArchivedEntry), [dict(r) for r in rows])
+
+            held = {}
+            for r in rows:
+                held[r["raffle_id"]] = held.get(r["raffle_id"], 0) + r["quantity"]
+            await release(db, held)
+        await db.commit()
+
+    return len(rows)
+
+
+# ============================================================
+#                    BACKGROUND LOOP
+# ============================================================
+async def run_reaper():
+    """
+    Runs forever. Drains the backlog in small batches with a pause in
+    between so the webhook never waits on the reaper's locks.
+    """
+    while True:
+        try:
+            moved = await reap_once()
+            if moved:
+                log.info("Archived unpaid entries", extra={"entries": moved})
+        except Exception:
+            log.exception("Reaper batch failed")
+            moved = 0
+
+        if moved >= REAPER_BATCH_SIZE:
+            await asyncio.sleep(REAPER_BATCH_PAUSE)
+        else:
+            await asyncio.sleep(REAPER_INTERVAL_SECONDS)
+
+
+# ============================================================
+#                   LATE PAYMENT RESTORE
+# ============================================================
+async def _restore_target(db, raffle_id):
+    """
+    The raffle a late payment for `raffle_id` goes to: that round if it's
+    still open, else the open round of the same series (same slug and
+    price, so the amount paid buys the same tickets). If there is none
+    the entry stays with its closed round, where the sale is refused and
+    the buyer refunded.
+    """
+    if raffle_id is None:  # legacy entries predate rounds
+        return await active_raffle_id(db)
+
+    own = (
+        await db.execute(
+            select(Raffle.slug, Raffle.ticket_price, Raffle.status).where(Raffle.id == raffle_id)
+        )
+    ).one_or_none()
+    if own is None or own.status == "open":
+        return raffle_id
+
+    successor = (
+        await db.execute(
+            select(Raffle.id)
+            .where(Raffle.slug == own.slug, Raffle.ticket_price == own.ticket_price,
+                   Raffle.status == "open")
+            .order_by(Raffle.id.desc())
+            .limit(1)
+        )
+    ).scalar_one_or_none()
+    return successor or raffle_id
+
+
+async def restore_archived(db, reference: str):
+    """
+    Moves an archived unpaid entry back into raffle_entries so a late
+    payment can be confirmed, in its own raffle or that raffle's open
+    successor (see _restore_target). Its ticket hold was released when
+    it was archived, so the sale has to fit under the cap again. Returns
+    the restored RaffleEntry or None. Caller owns the transaction.
+    """
+    archived = (
+        await db.execute(
+            select(ArchivedEntry).where(
+                ArchivedEntry.reference == reference,
+                ArchivedEntry.confirmed.is_(False),
+            )
+        )
+    ).scalar_one_or_none()
+
+    if not archived:
+        return None
+
+    await db.execute(delete(ArchivedEntry).where(ArchivedEntry.id == archived.id))
+    await db.execute(insert(RaffleEntry).values(
+        user_id=archived.user_id,
+        raffle_id=await _restore_target(db, archived.raffle_id),
+        reference=archived.reference,
+        amount=archived.amount,
+        quantity=archived.quantity,
+        confirmed=False,
+        created_at=archived.created_at,
+    ))
+
+    return (
+        await db.execute(
+            select(RaffleEntry).where(RaffleEntry.reference == reference)
+        )
+    ).scalar_one()
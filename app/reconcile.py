@@ -0,0 +1,123 @@
+# app/reconcile.py
+import asyncio
+import logging
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, union_all
+
+from app.config import (
+    RECONCILE_INTERVAL_SECONDS,
+    RECONCILE_WINDOW_HOURS,
+    RECONCILE_PAGE_SIZE,
+)
+from app.database import async_session
+from app.issuance import confirm_payments, announce
+from app.logging_setup import configure_logging, correlation_id
+from app.metrics import Counter
+from app.models import RaffleEntry, ArchivedEntry
+from app.paystack import list_transactions
+
+log = logging.getLogger(__name__)
+
+pages_scanned = Counter("reconcile_pages_total", "Paystack transaction pages scanned")
+recovered = Counter("reconcile_recovered_total", "Payments confirmed by reconciliation")
+
+
+async def _unconfirmed(db, references: set) -> set:
+    """Which of `references` are still unpaid here, hot or archived by the reaper."""
+    q = union_all(
+        select(RaffleEntry.reference).where(
+            RaffleEntry.reference.in_(references),
+            RaffleEntry.confirmed.is_(False),
+        ),
+        select(ArchivedEntry.reference).where(
+            ArchivedEntry.reference.in_(references),
+            ArchivedEntry.confirmed.is_(False),
+        ),
+    )
+    return set((await db.execute(q)).scalars())
+
+
+# ============================================================
+#                       ONE WINDOW
+# ============================================================
+async def reconcile_window(since: datetime, until: datetime = None,
+                           per_page: int = RECONCILE_PAGE_SIZE) -> dict:
+    """
+    Pages through Paystack's successful transactions in [since, until]
+    and confirms any whose entry is still unpaid, through the same
+    issuance path as the webhook (one transaction per page). Already
+    confirmed entries are skipped by the set lookup, and confirmation is
+    idempotent, so overlapping runs or a late webhook are harmless.
+    """
+    until = until or datetime.now(timezone.utc)
+    stats = {"pages": 0, "seen": 0, "confirmed": 0, "sold_out": 0}
+
+    page = 1
+    while True:
+        res = await list_transactions(since, until, page=page, per_page=per_page)
+        if not res.get("status"):
+            raise RuntimeError(f"Paystack list failed: {res.get('message')}")
+
+        paid = {
+            t["reference"]: t["amount"] // 100  # kobo
+            for t in res.get("data") or []
+            if t.get("status") == "success"
+        }
+        stats["pages"] += 1
+        stats["seen"] += len(paid)
+        pages_scanned.inc()
+
+        if paid:
+            async with async_session() as db:
+                missing = await _unconfirmed(db, set(paid))
+                results = {}
+                if missing:
+                    results = await confirm_payments(
+                        db, [(ref, paid[ref]) for ref in missing]
+                    )
+                    await db.commit()
+
+            for ref, result in results.items():
+                token = correlation_id.set(ref)
+                if result["status"] in ("ok", "sold_out"):
+                    log.info("Recovered payment", extra={"status": result["status"]})
+                    stats["confirmed" if result["status"] == "ok" else "sold_out"] += 1
+                    recovered.inc()
+                    await announce(result, paid[ref])
+                correlation_id.reset(token)
+
+        # new payments land on page 1 (newest first) and push older ones
+        # back, so a row can be seen twice but not skipped
+        meta = res.get("meta") or {}
+        if page >= (meta.get("pageCount") or 0) or not res.get("data"):
+            break
+        page += 1
+
+    return stats
+
+
+# ============================================================
+#                     BACKGROUND LOOP
+# ============================================================
+async def run_reconciler():
+    """Re-scans the last RECONCILE_WINDOW_HOURS every interval, forever."""
+    while True:
+        await asyncio.sleep(RECONCILE_INTERVAL_SECONDS)
+        since = datetime.now(timezone.utc) - timedelta(hours=RECONCILE_WINDOW_HOURS)
+        try:
+            stats = await reconcile_window(since)
+            if stats["confirmed"] or stats["sold_out"]:
+                log.warning("Reconciled missed payments", extra=stats)
+        except Exception:
+            log.exception("Reconciliation failed")
+
+
+if __name__ == "__main__":
+    # python -m app.reconcile [HOURS]
+    # set PAYSTACK_BASE_URL to run against the local stand-in
+    configure_logging()
+    hours = int(sys.argv[1]) if len(sys.argv) > 1 else RECONCILE_WINDOW_HOURS
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    print(asyncio.run(reconcile_window(since)))
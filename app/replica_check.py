@@ -0,0 +1,70 @@
+# app/replica_check.py
+import asyncio
+import sys
+import time
+
+from sqlalchemy import text
+
+from app.database import engine, read_engine, read_session, pin_primary
+from app.config import DATABASE_READ_URL
+
+# Checks read routing against the configured databases (see
+# docker-compose.replica.yml): where read_session() lands with and
+# without a pin, and how far behind the replica is.
+
+_PROBE_ID = "replica-check"
+
+
+async def _where(session) -> str:
+    async with session as db:
+        if db.bind.dialect.name != "postgresql":
+            return "sqlite"
+        row = (await db.execute(text(
+            "SELECT pg_is_in_recovery() AS replica, inet_server_port() AS port"
+        ))).one()
+    return f"{'replica' if row.replica else 'primary'} (port {row.port})"
+
+
+async def _catch_up_ms(timeout: float = 10) -> float:
+    """Time until the replica has replayed the primary's current WAL position."""
+    async with engine.connect() as conn:
+        lsn = (await conn.execute(text("SELECT pg_current_wal_lsn()"))).scalar()
+    started = time.perf_counter()
+    async with read_engine.connect() as conn:
+        while time.perf_counter() - started < timeout:
+            caught_up = (await conn.execute(
+                text("SELECT pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)"),
+                {"lsn": lsn},
+            )).scalar()
+            if caught_up:
+                return (time.perf_counter() - started) * 1000
+            await asyncio.sleep(0.01)
+    raise TimeoutError(f"replica not at {lsn} after {timeout}s")
+
+
+async def check() -> bool:
+    if not DATABASE_READ_URL:
+        print("DATABASE_READ_URL is not set: reads use the primary engine")
+
+    unpinned = await _where(read_session(_PROBE_ID))
+    pin_primary(_PROBE_ID)
+    pinned = await _where(read_session(_PROBE_ID))
+    print(f"read_session():       {unpinned}")
+    print(f"after pin_primary():  {pinned}")
+
+    ok = True
+    if DATABASE_READ_URL and read_engine.dialect.name == "postgresql":
+        ok = unpinned.startswith("replica") and pinned.startswith("primary")
+        async with read_engine.connect() as conn:
+            lag = (await conn.execute(text(
+                "SELECT extract(epoch FROM now() - pg_last_xact_replay_timestamp())"
+            ))).scalar()
+        print(f"last replayed commit: {lag or 0:.1f}s ago")
+        print(f"replica catch-up:     {await _catch_up_ms():.0f} ms")
+    print("OK" if ok else "MISROUTED")
+    return ok
+
+
+if __name__ == "__main__":
+    # python -m app.replica_check
+    sys.exit(0 if asyncio.run(check()) else 1)
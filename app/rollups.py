@@ -0,0 +1,184 @@
+# app/rollups.py
+import asyncio
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete
+
+from app.database import async_session, read_session, dialect_insert
+from app.models import (
+    RevenueRollup,
+    RaffleEntry,
+    ArchivedEntry,
+    Ticket,
+    ArchivedTicket,
+    Transaction,
+)
+
+COUNTERS = ("entries_created", "entries_confirmed", "tickets", "revenue")
+
+
+def hour_bucket(dt: datetime = None) -> datetime:
+    dt = dt or datetime.now(timezone.utc)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)  # SQLite hands back naive UTC
+    return dt.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+# ============================================================
+#                   INCREMENTAL UPDATES
+# ============================================================
+async def bump(db, raffle_id, bucket: datetime = None, **deltas):
+    """
+    Adds `deltas` to one hourly bucket with a single INSERT ... ON CONFLICT
+    DO UPDATE. Call inside the transaction that creates or confirms the
+    entry, so the rollup commits (or rolls back) with it.
+    """
+    insert = dialect_insert(db)
+    table = RevenueRollup.__table__
+
+    stmt = insert(table).values(
+        bucket=hour_bucket(bucket),
+        raffle_id=raffle_id or 0,
+        **{c: deltas.get(c, 0) for c in COUNTERS},
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["bucket", "raffle_id"],
+        set_={c: table.c[c] + stmt.excluded[c] for c in deltas},
+    )
+    await db.execute(stmt)
+
+
+# ============================================================
+#                          READS
+# ============================================================
+async def load_buckets(since: datetime, raffle_id=None) -> list:
+    async with read_session() as db:
+        q = (
+            select(RevenueRollup)
+            .where(RevenueRollup.bucket >= hour_bucket(since))
+            .order_by(RevenueRollup.bucket)
+        )
+        if raffle_id is not None:
+            q = q.where(RevenueRollup.raffle_id == raffle_id)
+        return (await db.execute(q)).scalars().all()
+
+
+def summarize(rows, granularity: str = "hour") -> list:
+    """
+    Merges rollup rows (across rounds) into hour or day buckets and adds
+    conversion rate and average basket size.
+    """
+    merged = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for r in rows:
+        key = hour_bucket(r.bucket)
+        if granularity == "day":
+            key = key.replace(hour=0)
+        for c in COUNTERS:
+            merged[key][c] += getattr(r, c)
+
+    out = []
+    for key in sorted(merged):
+        b = merged[key]
+        out.append({
+            "bucket": key.isoformat(),
+            **b,
+            "conversion": (
+                b["entries_confirmed"] / b["entries_created"]
+                if b["entries_created"] else None
+            ),
+            "avg_basket": (
+                b["revenue"] / b["entries_confirmed"]
+                if b["entries_confirmed"] else None
+            ),
+        })
+    return out
+
+
+def text_chart(buckets: list, width: int = 12) -> str:
+    """One line per bucket with a bar scaled to the best bucket's revenue."""
+    top = max((b["revenue"] for b in buckets), default=0) or 1
+    lines = []
+    for b in buckets:
+        bar = "█" * round(width * b["revenue"] / top)
+        conv = f"{b['conversion']:.0%}" if b["conversion"] is not None else "–"
+        lines.append(
+            f"{b['bucket'][:13].replace('T', ' ')} {bar:<{width}} "
+            f"₦{b['revenue']:,} · {b['tickets']} 🎟 · {conv}"
+        )
+    return "\n".join(lines)
+
+
+# ============================================================
+#                     REBUILD / BACKFILL
+# ============================================================
+async def rebuild(since: datetime = None, batch_rows: int = 5000) -> int:
+    """
+    Recomputes buckets from raw rows (hot and archived) and replaces
+    what's stored from `since` on. Returns the number of buckets written.
+    Payments confirmed while it runs can be counted twice or missed, so
+    run backfills in a quiet period.
+    """
+    since = hour_bucket(since) if since else None
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    async def _scan(q, created_col, apply):
+        if since:
+            q = q.where(created_col >= since)
+        result = await db.stream(q.execution_options(yield_per=batch_rows))
+        async for rows in result.partitions():
+            for row in rows:
+                apply(totals[(hour_bucket(row.created_at), row.raffle_id or 0)], row)
+
+    def _created(t, row):
+        t["entries_created"] += 1
+
+    def _ticket(t, row):
+        t["tickets"] += 1
+
+    def _paid(t, row):
+        t["entries_confirmed"] += 1
+        t["revenue"] += row.amount or 0
+
+    async with async_session() as db:
+        for model in (RaffleEntry, ArchivedEntry):
+            await _scan(select(model.created_at, model.raffle_id),
+                        model.created_at, _created)
+        for model in (Ticket, ArchivedTicket):
+            await _scan(select(model.created_at, model.raffle_id),
+                        model.created_at, _ticket)
+        await _scan(
+            select(Transaction.created_at, Transaction.raffle_id, Transaction.amount)
+            .where(Transaction.status == "success"),
+            Transaction.created_at,
+            _paid,
+        )
+
+        q = delete(RevenueRollup)
+        if since:
+            q = q.where(RevenueRollup.bucket >= since)
+        await db.execute(q)
+
+        if totals:
+            await db.execute(
+                RevenueRollup.__table__.insert(),
+                [
+                    {"bucket": bucket, "raffle_id": raffle_id, **counters}
+                    for (bucket, raffle_id), counters in totals.items()
+                ],
+            )
+        await db.commit()
+
+    return len(totals)
+
+
+if __name__ == "__main__":
+    # python -m app.rollups rebuild [DAYS]
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        sys.exit("usage: python -m app.rollups rebuild [DAYS]")
+
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    since = datetime.now(timezone.utc) - timedelta(days=days) if days else None
+    n = asyncio.run(rebuild(since))
+    print(f"✅ Rebuilt {n} hourly buckets")
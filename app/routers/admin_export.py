@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import Optional
+import hmac
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.config import ADMIN_API_TOKEN
+from app.export import EXPORTS, FORMATS, export_stream, export_filename
+
+router = APIRouter(prefix="/admin")
+
+
+def require_admin(token: str):
+    if not ADMIN_API_TOKEN or not hmac.compare_digest(token, ADMIN_API_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@router.get("/export/{kind}")
+async def export(
+    kind: str,
+    fmt: str = Query("csv"),
+    gzip: bool = Query(False),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    round: Optional[int] = Query(None),
+    x_admin_token: str = Header(""),
+):
+    require_admin(x_admin_token)
+
+    if kind not in EXPORTS:
+        raise HTTPException(status_code=404, detail="Unknown export")
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail="fmt must be csv or ndjson")
+
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    headers = {
+        "Content-Disposition":
+            f'attachment; filename="{export_filename(kind, fmt, gzip)}"'
+    }
+    if gzip:
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        export_stream(kind, fmt, gzip, since, until, round),
+        media_type=media_type,
+        headers=headers,
+    )
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+
+from app.routers.admin_export import require_admin
+
+router = APIRouter(prefix="/admin")
+
+
+@router.get("/revenue")
+async def revenue(
+    granularity: str = Query("hour"),
+    days: int = Query(2, ge=1, le=366),
+    round: Optional[int] = Query(None),
+    x_admin_token: str = Header(""),
+):
+    require_admin(x_admin_token)
+
+    if granularity not in ("hour", "day"):
+        raise HTTPException(status_code=400, detail="granularity must be hour or day")
+
+    # imported here so cold starts don't pay for it
+    from app.rollups import load_buckets, summarize
+
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    buckets = summarize(await load_buckets(since, round), granularity)
+
+    revenue = sum(b["revenue"] for b in buckets)
+    created = sum(b["entries_created"] for b in buckets)
+    paid = sum(b["entries_confirmed"] for b in buckets)
+    return {
+        "granularity": granularity,
+        "buckets": buckets,
+        "totals": {
+            "revenue": revenue,
+            "tickets": sum(b["tickets"] for b in buckets),
+            "entries_created": created,
+            "entries_confirmed": paid,
+            "conversion": paid / created if created else None,
+            "avg_basket": revenue / paid if paid else None,
+        },
+    }
@@ -3,55 +3,123 @@ import os
 import hmac
 import hashlib
 import json
-
-from sqlalchemy import select, insert, update
-
-from app.database import async_session
-from app.models import User, Ticket, RaffleEntry, Transaction
+import logging
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+from app.config import (
+    PAYSTACK_WEBHOOK_TEST_MODE,
+    WEBHOOK_MAX_BODY_BYTES,
+    GROUP_COMMIT_ENABLED,
+    WEBHOOK_STORE_ENABLED,
+)
+from app.group_commit import writer as group_writer
+from app.issuance import confirm_payment, announce
+from app.logging_setup import correlation_id, span
 from app.paystack import verify_payment
-from app.utils import generate_ticket_code
-from app.bot import bot
+from app.verify_queue import enqueue
+from app.webhook_store import record
 
 router = APIRouter(prefix="/webhook/paystack")
 
 PAYSTACK_SECRET = os.getenv("PAYSTACK_SECRET", "")
-PAYSTACK_WEBHOOK_SECRET = os.getenv("PAYSTACK_WEBHOOK_SECRET", "")
+# Paystack signs webhooks with the account secret key
+PAYSTACK_WEBHOOK_SECRET = os.getenv("PAYSTACK_WEBHOOK_SECRET", "") or PAYSTACK_SECRET
+
+_SIGNATURE_LEN = hashlib.sha512().digest_size * 2
+_CHARGE_SUCCESS = b'"charge.success"'
+
+log = logging.getLogger(__name__)
 
 
 def verify_signature(payload: bytes, signature: str) -> bool:
-    if not PAYSTACK_WEBHOOK_SECRET:
-        return True  # allow if not set (for testing)
+    if PAYSTACK_WEBHOOK_TEST_MODE:
+        return True
+
+    # length is not secret, so malformed headers are dropped before hashing
+    if not PAYSTACK_WEBHOOK_SECRET or len(signature) != _SIGNATURE_LEN:
+        return False
 
     computed = hmac.new(
         PAYSTACK_WEBHOOK_SECRET.encode(),
         payload,
         hashlib.sha512
     ).hexdigest()
-    return hmac.compare_digest(computed, signature)
+    return hmac.compare_digest(computed, signature.lower())
+
+
+async def read_body(request: Request) -> bytes:
+    """Reads the request body, refusing anything over WEBHOOK_MAX_BODY_BYTES."""
+    length = request.headers.get("content-length", "")
+    if length and (not length.isdigit() or int(length) > WEBHOOK_MAX_BODY_BYTES):
+        raise HTTPException(status_code=413, detail="Payload too large")
+
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > WEBHOOK_MAX_BODY_BYTES:
+            raise HTTPException(status_code=413, detail="Payload too large")
+        chunks.append(chunk)
+    return b"".join(chunks)
 
 
 @router.post("")
 async def paystack_webhook(request: Request):
-    payload = await request.body()
     signature = request.headers.get("x-paystack-signature", "")
+    if not signature and not PAYSTACK_WEBHOOK_TEST_MODE:
+        raise HTTPException(status_code=401, detail="Missing signature")
+
+    payload = await read_body(request)
 
     if not verify_signature(payload, signature):
-        raise HTTPException(status_code=400, detail="Invalid signature")
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    # replays (python -m app.webhook_replay) are in the log already
+    store = WEBHOOK_STORE_ENABLED and "x-webhook-replay" not in request.headers
+
+    # cheap byte scan so other events are dropped without a JSON parse;
+    # the event log takes them unparsed
+    if _CHARGE_SUCCESS not in payload:
+        if store:
+            record(payload, signature)
+        return {"status": "ignored"}
 
     try:
-        data = json.loads(payload)
-    except Exception:
-        # fallback in case body parsing fails
-        data = await request.json()
+        data = _loads(payload)
+    except ValueError:
+        data = None
+    if store:
+        record(payload, signature, data)  # queued, written off the response path
+    if data is None:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    if not isinstance(data, dict):
+        return {"status": "ignored"}
 
     if data.get("event") != "charge.success":
         return {"status": "ignored"}
 
     reference = data["data"]["reference"]
+    correlation_id.set(reference)
 
-    # Verify payment again with Paystack
-    verification = await verify_payment(reference)
+    # Verify payment again with Paystack. If it's down (breaker open, the
+    # call fails, or a 5xx or non-JSON answer), park the reference and
+    # answer now instead of holding the request open; app/verify_queue.py
+    # retries it.
+    try:
+        with span("paystack.verify"):
+            verification = await verify_payment(reference)
+    except Exception as e:
+        log.warning("Verification deferred", extra={"error": repr(e)})
+        await enqueue(reference, repr(e)[:500])
+        return {"status": "queued"}
     if not verification.get("status"):
+        log.warning("Payment verification failed",
+                    extra={"paystack_message": verification.get("message")})
         return {"status": "verification_failed"}
 
     pay_data = verification["data"]
@@ -59,60 +127,18 @@ async def paystack_webhook(request: Request):
     email = pay_data["customer"]["email"]
     tg_user_id = pay_data.get("metadata", {}).get("tg_user_id")
 
-    async with async_session() as db:
-        q = await db.execute(
-            select(RaffleEntry).where(RaffleEntry.reference == reference)
-        )
-        entry = q.scalar_one_or_none()
-
-        if not entry or entry.confirmed:
-            return {"status": "already_processed"}
-
-        # Confirm entry
-        await db.execute(
-            update(RaffleEntry)
-            .where(RaffleEntry.id == entry.id)
-            .values(confirmed=True)
-        )
-
-        # Get user
-        q = await db.execute(select(User).where(User.id == entry.user_id))
-        user = q.scalar_one()
-
-        # Issue tickets
-        tickets = []
-        for _ in range(entry.quantity):
-            code = generate_ticket_code()
-            tickets.append(code)
-            await db.execute(insert(Ticket).values(
-                user_id=user.id,
-                code=code
-            ))
-
-        # Save transaction
-        await db.execute(insert(Transaction).values(
-            user_id=user.id,
-            reference=reference,
-            amount=amount,
-            status="success"
-        ))
-
-        await db.commit()
-
-    # Notify user on Telegram
-
-    
-    try:
-        if bot:
-            await bot.send_message(
-                int(user.telegram_id),
-                "✅ <b>Payment Confirmed!</b>\n\n"
-                f"🎟 Tickets issued: {entry.quantity}\n"
-                f"💳 Amount: ₦{amount:,}\n\n"
-                "Good luck 🍀",
-                parse_mode="HTML"
-            )
-    except Exception as e:
-        print("Telegram notify failed:", e)
+    with span("issuance.confirm", group_commit=GROUP_COMMIT_ENABLED):
+        if GROUP_COMMIT_ENABLED:
+            result = await group_writer.submit(reference, amount)
+        else:
+            result = await confirm_payment(reference, amount)
+    log.info("Payment processed", extra={"status": result["status"], "amount": amount})
+
+    with span("notify"):
+        await announce(result, amount)
 
+    if result["status"] == "sold_out":
+        return {"status": "sold_out"}
+    if result["status"] != "ok":
+        return {"status": "already_processed"}
     return {"status": "ok"}
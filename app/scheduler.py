@@ -0,0 +1,405 @@
+# app/scheduler.py
+import asyncio
+import logging
+import os
+import random
+import socket
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update, and_, or_, text
+
+from app.config import (
+    SCHEDULER_INTERVAL_SECONDS,
+    SCHEDULER_CONCURRENCY,
+    SCHEDULER_LOCK_KEY,
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    REMINDER_LEAD_MINUTES,
+    TICKET_INDEX_ENABLED,
+    SNAPSHOT_PATH,
+)
+from app.database import engine, async_session, dialect_insert
+from app.logging_setup import correlation_id, span
+from app.membership import non_member_holders
+from app.metrics import Counter, Gauge
+from app.models import Job, Raffle, User, Winner
+from app.raffles import open_raffles, close_round, archive_round
+from app.send_rate import send, send_many
+
+log = logging.getLogger(__name__)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+completed = Counter("scheduler_jobs_completed_total", "Jobs run to completion")
+failures = Counter("scheduler_job_failures_total", "Job attempts that raised")
+is_leader = Gauge("scheduler_leader", "1 while this process runs the jobs")
+
+_REMINDER_PAGE = 500
+_MAX_RETRY_DELAY = 3600
+
+
+class LeaseLost(Exception):
+    """Another worker took the job over; stop without touching it."""
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+# ============================================================
+#                        SCHEDULING
+# ============================================================
+async def schedule(db, key: str, kind: str, run_at: datetime, raffle_id: int = None) -> bool:
+    """
+    Adds a job unless one with `key` exists already; False if it did.
+    Caller commits.
+    """
+    insert = dialect_insert(db)
+    res = await db.execute(
+        insert(Job)
+        .values(key=key, kind=kind, run_at=run_at, raffle_id=raffle_id)
+        .on_conflict_do_nothing(index_elements=["key"])
+    )
+    return res.rowcount == 1
+
+
+async def schedule_raffle(db, raffle_id: int, close_at: datetime):
+    """The last-hour reminder and the close (then draw) of a raffle."""
+    if close_at.tzinfo is None:
+        close_at = close_at.replace(tzinfo=timezone.utc)  # SQLite hands back naive UTC
+    if close_at <= _now():
+        return
+    await schedule(db, f"reminder:{raffle_id}", "reminder",
+                   close_at - timedelta(minutes=REMINDER_LEAD_MINUTES), raffle_id)
+    await schedule(db, f"close_round:{raffle_id}", "close_round", close_at, raffle_id)
+
+
+async def sync_raffle_jobs():
+    """Schedules open raffles that have a close time but no jobs yet."""
+    async with async_session() as db:
+        for r in await open_raffles(db):
+            if r["close_at"]:
+                await schedule_raffle(db, r["id"], r["close_at"])
+        await db.commit()
+
+
+# ============================================================
+#                       LEADER ELECTION
+# ============================================================
+_lock_conn = None
+
+
+async def _hold_leadership() -> bool:
+    """
+    True while this process holds the scheduler's advisory lock, taking
+    it if it's free. The lock belongs to one idle connection and goes
+    away with it, so a dead leader is replaced within a tick.
+    """
+    global _lock_conn
+    if engine.dialect.name != "postgresql":
+        return True  # SQLite: one process owns the file anyway
+
+    conn = _lock_conn
+    try:
+        if conn is not None:
+            await conn.execute(text("SELECT 1"))
+            return True
+
+        conn = await engine.connect()
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        got = (
+            await conn.execute(text("SELECT pg_try_advisory_lock(:key)"),
+                               {"key": SCHEDULER_LOCK_KEY})
+        ).scalar()
+        if got:
+            _lock_conn = conn
+            return True
+    except Exception:
+        log.warning("Scheduler lock check failed", exc_info=True)
+        _lock_conn = None
+
+    if conn is not None:
+        try:
+            await conn.close()
+        except Exception:
+            pass
+    return False
+
+
+# ============================================================
+#                     CLAIM AND RUN
+# ============================================================
+def _due(now):
+    # pending and due, or running under a lease that has expired
+    return or_(
+        and_(Job.status == "pending", Job.run_at <= now),
+        and_(Job.status == "running", Job.locked_until < now),
+    )
+
+
+async def _claim(limit: int) -> list:
+    """Leases up to `limit` due jobs to this worker, oldest first."""
+    now = _now()
+    async with async_session() as db:
+        due = select(Job.id).where(_due(now)).order_by(Job.run_at).limit(limit)
+        rows = (
+            await db.execute(
+                update(Job)
+                .where(Job.id.in_(due), _due(now))  # re-checked: no double claims
+                .values(
+                    status="running",
+                    locked_by=WORKER_ID,
+                    locked_until=now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    attempts=Job.attempts + 1,
+                )
+                .returning(Job.id, Job.key, Job.kind, Job.raffle_id,
+                           Job.attempts, Job.progress)
+            )
+        ).mappings().all()
+        await db.commit()
+    return [dict(r) for r in rows]
+
+
+async def heartbeat(job: dict, progress: int = None):
+    """
+    Extends the job's lease and records how far it got, so a rerun
+    resumes there. Raises LeaseLost if another worker has it now.
+    """
+    values = {"locked_until": _now() + timedelta(seconds=JOB_LEASE_SECONDS)}
+    if progress is not None:
+        values["progress"] = job["progress"] = progress
+    async with async_session() as db:
+        res = await db.execute(
+            update(Job)
+            .where(Job.id == job["id"], Job.locked_by == WORKER_ID, Job.status == "running")
+            .values(**values)
+        )
+        await db.commit()
+    if res.rowcount == 0:
+        raise LeaseLost(job["key"])
+
+
+async def _finish(job: dict, **values):
+    async with async_session() as db:
+        await db.execute(
+            update(Job)
+            .where(Job.id == job["id"], Job.locked_by == WORKER_ID)
+            .values(locked_by=None, locked_until=None, **values)
+        )
+        await db.commit()
+
+
+async def _run(job: dict):
+    token = correlation_id.set(job["key"])
+    try:
+        with span("scheduler.job", kind=job["kind"], attempt=job["attempts"]):
+            await HANDLERS[job["kind"]](job)
+        await _finish(job, status="done", finished_at=_now(), last_error=None)
+        completed.inc()
+    except LeaseLost:
+        log.warning("Job lease lost, leaving it to the new owner")
+    except Exception as e:
+        failures.inc()
+        log.exception("Job failed", extra={"attempts": job["attempts"]})
+        if job["attempts"] >= JOB_MAX_ATTEMPTS:
+            await _finish(job, status="failed", finished_at=_now(), last_error=repr(e)[:500])
+        else:
+            # backoff with jitter so retries of jobs that failed together spread out
+            delay = min(60 * 2 ** job["attempts"], _MAX_RETRY_DELAY) * random.uniform(1, 1.25)
+            await _finish(job, status="pending", last_error=repr(e)[:500],
+                          run_at=_now() + timedelta(seconds=delay))
+    finally:
+        correlation_id.reset(token)
+
+
+async def run_scheduler():
+    """
+    Every worker runs this loop; only the one holding the advisory lock
+    claims jobs, at most SCHEDULER_CONCURRENCY at a time. Ticks are
+    jittered so workers don't hit the database in step.
+    """
+    running = set()
+    leading = False
+    while True:
+        await asyncio.sleep(SCHEDULER_INTERVAL_SECONDS * random.uniform(0.8, 1.2))
+        try:
+            if not await _hold_leadership():
+                if leading:
+                    log.warning("Scheduler leadership lost")
+                leading = False
+                is_leader.set(0)
+                continue
+            if not leading:
+                log.info("Scheduler leadership acquired", extra={"worker": WORKER_ID})
+                leading = True
+                is_leader.set(1)
+                await sync_raffle_jobs()
+
+            free = SCHEDULER_CONCURRENCY - len(running)
+            if free > 0:
+                for job in await _claim(free):
+                    task = asyncio.create_task(_run(job))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+        except Exception:
+            log.exception("Scheduler tick failed")
+
+
+# ============================================================
+#                         HANDLERS
+# ============================================================
+async def _raffle(db, raffle_id: int):
+    return (
+        await db.execute(
+            select(Raffle.name, Raffle.status, Raffle.close_at).where(Raffle.id == raffle_id)
+        )
+    ).one_or_none()
+
+
+async def close_round_job(job: dict):
+    """Closes the round at its close time and queues the draw."""
+    closed = await close_round("scheduler", job["raffle_id"])
+    if closed is None:
+        # closed by hand (and archived by /close_round), or by an earlier
+        # attempt that queued the draw already
+        return
+    async with async_session() as db:
+        await schedule(db, f"draw:{job['raffle_id']}", "draw", _now(), job["raffle_id"])
+        await db.commit()
+
+
+async def _draw_once(job: dict, announced_by: str):
+    """
+    (code, user_id) of the winner `announced_by` drew for the job's
+    raffle, drawing one if an earlier attempt didn't, or None if no
+    ticket is eligible. Holders who left the channel can't win; that's
+    one lookup per holder, so the lease is kept alive while it runs.
+    """
+    from app.bot import draw_ticket
+
+    raffle_id = job["raffle_id"]
+    drawn = select(Winner.ticket_code, Winner.user_id).where(
+        Winner.raffle_id == raffle_id, Winner.announced_by == announced_by
+    )
+    async with async_session() as db:
+        winner = (await db.execute(drawn)).first()
+    if winner is not None:
+        return tuple(winner)
+
+    excluded = await non_member_holders(raffle_id, on_progress=lambda _: heartbeat(job))
+    await heartbeat(job)  # a lost lease means another worker draws instead
+    async with async_session() as db:
+        picked = await draw_ticket(db, raffle_id, exclude=excluded)
+        if picked:
+            db.add(Winner(ticket_code=picked[0], user_id=picked[1],
+                          raffle_id=raffle_id, announced_by=announced_by))
+            await db.commit()
+    return picked
+
+
+async def draw_job(job: dict):
+    """
+    Draws the closed round's winner, tells the winner and the admins,
+    then archives the round. A winner already drawn by an earlier
+    attempt is kept; progress=1 marks the notifications as sent.
+    """
+    from app.bot import ADMINS
+
+    raffle_id = job["raffle_id"]
+    async with async_session() as db:
+        raffle = await _raffle(db, raffle_id)
+    if raffle is None or raffle.status != "closed":
+        return
+
+    winner = await _draw_once(job, "scheduler")
+
+    # sent with no session open: SQLite's tuned profile has one write connection
+    if winner and job["progress"] != 1:
+        async with async_session() as db:
+            tg_id = (
+                await db.execute(select(User.telegram_id).where(User.id == winner[1]))
+            ).scalar_one_or_none()
+        if tg_id:
+            await send(tg_id, f"🏆 Your ticket {winner[0]} won {raffle.name}!")
+        for admin in ADMINS:
+            await send(admin, f"🎲 {raffle.name} (#{raffle_id}): drawn ticket {winner[0]}")
+        await heartbeat(job, progress=1)
+
+    if TICKET_INDEX_ENABLED:
+        from app.ticket_index import drop_index
+        drop_index(raffle_id)
+        if SNAPSHOT_PATH:
+            from app.ticket_snapshot import remove_snapshot
+            remove_snapshot(raffle_id)
+    moved = await archive_round(raffle_id)
+    log.info("Round drawn and archived", extra={"raffle_id": raffle_id, "moved": moved})
+
+
+async def reminder_job(job: dict):
+    """
+    "Last hour to buy" to every user, a page at a time within the shared
+    send rate. The last user id reached is saved after each page, so a
+    rerun resumes there and at most one page hears it twice.
+    """
+    async with async_session() as db:
+        raffle = await _raffle(db, job["raffle_id"])
+    if raffle is None or raffle.status != "open" or raffle.close_at is None:
+        return
+    close_at = raffle.close_at
+    if close_at.tzinfo is None:
+        close_at = close_at.replace(tzinfo=timezone.utc)
+    if close_at <= _now():
+        return  # ran too late to be useful
+
+    message = (
+        f"⏰ Last chance: {raffle.name} closes at {close_at:%H:%M} UTC.\n"
+        "Tap /buy to get your tickets."
+    )
+    cursor = job["progress"] or 0
+    while True:
+        async with async_session() as db:
+            rows = (
+                await db.execute(
+                    select(User.id, User.telegram_id)
+                    .where(User.id > cursor)
+                    .order_by(User.id)
+                    .limit(_REMINDER_PAGE)
+                )
+            ).all()
+        if not rows:
+            return
+        sent, failed = await send_many([r.telegram_id for r in rows], message)
+        log.info("Reminder page sent", extra={"sent": sent, "failed": failed})
+        cursor = rows[-1].id
+        await heartbeat(job, progress=cursor)
+
+
+async def admin_draw_job(job: dict):
+    """
+    The /draw for an open raffle, run here rather than in the handler
+    since revalidating every holder takes minutes on a big raffle. One
+    per raffle (the job key is admin_draw:<raffle id>); the admins get
+    the result.
+    """
+    from app.bot import ADMINS
+
+    async with async_session() as db:
+        raffle = await _raffle(db, job["raffle_id"])
+    if raffle is None or raffle.status == "archived":
+        return
+
+    winner = await _draw_once(job, "admin_draw")
+    if job["progress"] != 1:
+        text = (f"🎲 {raffle.name} (#{job['raffle_id']}): drawn ticket {winner[0]}\n"
+                "🏆 Winner recorded" if winner else f"❌ No eligible tickets in {raffle.name}")
+        for admin in ADMINS:
+            await send(admin, text)
+        await heartbeat(job, progress=1)
+
+
+HANDLERS = {
+    "close_round": close_round_job,
+    "draw": draw_job,
+    "admin_draw": admin_draw_job,
+    "reminder": reminder_job,
+}
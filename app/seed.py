@@ -0,0 +1,333 @@
+# app/seed.py
+import argparse
+import asyncio
+import bisect
+import itertools
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import DATABASE_URL
+from app.database import Base
+import app.models  # noqa: F401  (registers the tables on Base.metadata)
+from app.ticket_index import decode_code
+from app.utils import TICKET_PRICE
+
+# Synthetic benchmark data: users, raffle rounds, entries, tickets,
+# transactions and winners, bulk-loaded with executemany (SQLite) or
+# COPY (Postgres). The same arguments always produce the same rows;
+# timestamps are laid out backwards from today's midnight UTC.
+
+_LOADED = (
+    "users", "raffles", "raffle_entries", "raffle_entries_archive",
+    "tickets", "tickets_archive", "transactions", "winners",
+)
+_CODE_SPACE = 36 ** 6
+_CODE_STEP = 1_000_000_007  # coprime with 36**6: n -> code is a bijection
+_QTY = (1, 5, 10)
+_QTY_WEIGHTS = (6, 3, 1)
+
+
+# ============================================================
+#                          LOADERS
+# ============================================================
+class _SqliteLoader:
+    """executemany on one raw connection, journal and fsync off while loading."""
+
+    def __init__(self, url):
+        self.engine = create_engine(url.set(drivername="sqlite"))
+
+    def ts(self, dt):
+        return dt.strftime("%Y-%m-%d %H:%M:%S.%f")  # how SQLAlchemy stores DateTime
+
+    async def start(self, reset: bool):
+        Base.metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            if reset:
+                for table in reversed(Base.metadata.sorted_tables):
+                    conn.execute(table.delete())
+            _drop_indexes(conn)
+        self.raw = self.engine.raw_connection()
+        for pragma in ("journal_mode=OFF", "synchronous=OFF", "cache_size=-262144"):
+            self.raw.execute(f"PRAGMA {pragma}")
+
+    async def count(self, table: str) -> int:
+        return self.raw.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+    async def load(self, table: str, columns: tuple, rows: list):
+        marks = ", ".join("?" * len(columns))
+        self.raw.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({marks})", rows
+        )
+
+    async def execute(self, sql: str):
+        self.raw.execute(sql)
+
+    async def finish(self):
+        self.raw.commit()
+        self.raw.close()
+        with self.engine.begin() as conn:
+            _create_indexes(conn)
+            conn.execute(text("ANALYZE"))
+        self.engine.dispose()
+
+
+class _PostgresLoader:
+    """COPY through asyncpg's binary copy_records_to_table."""
+
+    def __init__(self, url):
+        self.engine = create_async_engine(url)
+
+    def ts(self, dt):
+        return dt
+
+    async def start(self, reset: bool):
+        self.conn = await self.engine.connect()
+        await self.conn.run_sync(Base.metadata.create_all)
+        if reset:
+            tables = ", ".join(t.name for t in Base.metadata.sorted_tables)
+            await self.conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+        await self.conn.run_sync(_drop_indexes)
+        await self.conn.commit()
+        self.pg = (await self.conn.get_raw_connection()).driver_connection
+
+    async def count(self, table: str) -> int:
+        return await self.pg.fetchval(f"SELECT count(*) FROM {table}")
+
+    async def load(self, table: str, columns: tuple, rows: list):
+        await self.pg.copy_records_to_table(table, records=rows, columns=list(columns))
+
+    async def execute(self, sql: str):
+        await self.pg.execute(sql)
+
+    async def finish(self):
+        # ids were given explicitly, so the sequences are still at 1
+        for table in _LOADED:
+            await self.pg.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"coalesce((SELECT max(id) FROM {table}), 0) + 1, false)"
+            )
+        await self.conn.run_sync(_create_indexes)
+        await self.conn.commit()
+        await self.pg.execute("ANALYZE")
+        await self.conn.close()
+        await self.engine.dispose()
+
+
+def _seeded_indexes():
+    # loading first and indexing once afterwards is several times faster
+    for name in _LOADED:
+        yield from Base.metadata.tables[name].indexes
+
+
+def _drop_indexes(conn):
+    for index in _seeded_indexes():
+        index.drop(conn, checkfirst=True)
+
+
+def _create_indexes(conn):
+    for index in _seeded_indexes():
+        index.create(conn, checkfirst=True)
+
+
+def _loader(url: str):
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        return _SqliteLoader(url)
+    if url.get_backend_name() == "postgresql":
+        return _PostgresLoader(url)
+    sys.exit(f"unsupported database: {url.get_backend_name()}")
+
+
+# ============================================================
+#                         GENERATOR
+# ============================================================
+def ticket_code(n: int) -> str:
+    """n-th seeded ticket code; distinct for every n below 36**6."""
+    return decode_code((n * _CODE_STEP) % _CODE_SPACE)
+
+
+async def seed(url: str = DATABASE_URL, users: int = 100_000, tickets: int = 1_000_000,
+               rounds: int = 1, pending: float = 0.15, zipf: float = 1.1,
+               days: int = 180, seed: int = 42, reset: bool = False,
+               batch: int = 50_000, archived: bool = True) -> dict:
+    """
+    Fills the database with `users` users and about `tickets` tickets
+    spread over `rounds` rounds of the default series (the last one
+    open, earlier ones closed, drawn and archived). With archived=False
+    the closed rounds are left in the hot tables, as before archive_round.
+
+    Who buys follows a Zipf law with exponent `zipf` over a shuffled
+    popularity rank: a few heavy buyers, a long tail, and many users who
+    never buy. Purchases are 1/5/10 tickets (6:3:1); a `pending` share
+    stays unpaid and gets no tickets or transaction.
+    Refuses a database that already has users unless `reset`.
+    """
+    rng = random.Random(seed)
+    loader = _loader(url)
+    await loader.start(reset)
+    if await loader.count("users"):
+        await loader.finish()
+        raise SystemExit("database has users already; pass --reset to empty it first")
+
+    started = time.perf_counter()
+    ts = loader.ts
+    end = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=days)
+    span = (end - start).total_seconds()
+    stats = dict.fromkeys(("users", "entries", "tickets", "transactions", "winners"), 0)
+
+    # ---- users, joining at a steady rate over `days`
+    for lo in range(0, users, batch):
+        await loader.load(
+            "users",
+            ("id", "telegram_id", "username", "email", "balance", "created_at"),
+            [
+                (i, str(7_000_000_000 + i), f"user{i}", "", 0,
+                 ts(start + timedelta(seconds=span * i / users)))
+                for i in range(lo + 1, min(lo + batch, users) + 1)
+            ],
+        )
+    stats["users"] = users
+
+    # ---- rounds: equal slices of the period, the last one still open
+    bounds = [start + (end - start) * r / rounds for r in range(rounds + 1)]
+    await loader.load(
+        "raffles",
+        ("id", "slug", "name", "ticket_price", "status", "closed_by",
+         "created_at", "closed_at", "tickets_reserved", "tickets_sold"),
+        [
+            (r + 1, "main", f"Round {r + 1}", TICKET_PRICE,
+             "open" if r == rounds - 1 else "archived" if archived else "closed",
+             None if r == rounds - 1 else "seed",
+             ts(bounds[r]), None if r == rounds - 1 else ts(bounds[r + 1]), 0, 0)
+            for r in range(rounds)
+        ],
+    )
+
+    # ---- who buys: Zipf weights over a shuffled rank
+    by_rank = list(range(1, users + 1))
+    rng.shuffle(by_rank)
+    cum = list(itertools.accumulate(1 / (k + 1) ** zipf for k in range(users)))
+    total_weight = cum[-1]
+
+    bufs = {name: [] for name in _LOADED}
+    columns = {
+        "raffle_entries": ("id", "user_id", "raffle_id", "reference", "amount",
+                           "quantity", "confirmed", "created_at"),
+        "raffle_entries_archive": ("id", "user_id", "raffle_id", "reference", "amount",
+                                   "quantity", "confirmed", "created_at", "archived_at"),
+        "tickets": ("id", "code", "user_id", "raffle_id", "created_at"),
+        "tickets_archive": ("id", "code", "user_id", "raffle_id", "created_at", "archived_at"),
+        "transactions": ("id", "reference", "amount", "status", "user_id",
+                         "raffle_id", "created_at"),
+        "winners": ("id", "ticket_code", "user_id", "raffle_id", "announced_by", "created_at"),
+    }
+
+    async def flush():
+        for name, rows in bufs.items():
+            if rows:
+                await loader.load(name, columns[name], rows)
+                rows.clear()
+        elapsed = time.perf_counter() - started
+        print(f"  {stats['tickets']:,} tickets, {stats['entries']:,} entries "
+              f"({stats['tickets'] / elapsed:,.0f} tickets/s)", file=sys.stderr)
+
+    per_round = -(-tickets // rounds)
+    entry_id = ticket_id = tx_id = 0
+    for r in range(rounds):
+        raffle_id, is_open = r + 1, r == rounds - 1
+        hot = is_open or not archived
+        entries_tab = "raffle_entries" if hot else "raffle_entries_archive"
+        tickets_tab = "tickets" if hot else "tickets_archive"
+        archived_at = () if hot else (ts(bounds[r + 1]),)
+        round_start, round_span = bounds[r], (bounds[r + 1] - bounds[r]).total_seconds()
+        winner_at = None if is_open else rng.randrange(per_round)
+
+        issued = reserved = 0
+        while issued < per_round:
+            user_id = by_rank[bisect.bisect_left(cum, rng.random() * total_weight)]
+            qty = rng.choices(_QTY, _QTY_WEIGHTS)[0]
+            paid = rng.random() >= pending
+            at = round_start + timedelta(seconds=rng.random() * round_span)
+            entry_id += 1
+            reference = f"SEED-{entry_id:010d}"
+
+            bufs[entries_tab].append((
+                entry_id, user_id, raffle_id, reference, qty * TICKET_PRICE,
+                qty, paid, ts(at), *archived_at,
+            ))
+            stats["entries"] += 1
+            if not paid:
+                reserved += qty if is_open else 0  # a hold until the entry expires
+                continue
+
+            tx_id += 1
+            bufs["transactions"].append(
+                (tx_id, reference, qty * TICKET_PRICE, "success", user_id, raffle_id, ts(at))
+            )
+            for _ in range(qty):
+                ticket_id += 1
+                code = ticket_code(ticket_id)
+                bufs[tickets_tab].append(
+                    (ticket_id, code, user_id, raffle_id, ts(at), *archived_at)
+                )
+                if issued == winner_at:
+                    stats["winners"] += 1
+                    bufs["winners"].append((stats["winners"], code, user_id, raffle_id,
+                                            "seed", ts(bounds[r + 1])))
+                issued += 1
+            stats["tickets"] += qty
+
+            if len(bufs[tickets_tab]) >= batch:
+                await flush()
+
+        await loader.execute(
+            f"UPDATE raffles SET tickets_sold = {issued}, "
+            f"tickets_reserved = {reserved} WHERE id = {raffle_id}"
+        )
+
+    stats["transactions"] = tx_id
+    await flush()
+
+    print("  building indexes…", file=sys.stderr)
+    await loader.finish()
+    stats["seconds"] = round(time.perf_counter() - started, 1)
+    return stats
+
+
+if __name__ == "__main__":
+    # python -m app.seed --users 1000000 --tickets 10000000 [--reset]
+    parser = argparse.ArgumentParser(
+        prog="python -m app.seed", description="Bulk-load synthetic benchmark data."
+    )
+    parser.add_argument("--url", default=DATABASE_URL, help="defaults to DATABASE_URL")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--tickets", type=int, default=1_000_000)
+    parser.add_argument("--rounds", type=int, default=1,
+                        help="the last one is open, earlier ones archived")
+    parser.add_argument("--pending", type=float, default=0.15,
+                        help="share of entries left unpaid")
+    parser.add_argument("--zipf", type=float, default=1.1,
+                        help="ownership skew; higher means fewer, bigger buyers")
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true",
+                        help="empty every table first")
+    parser.add_argument("--unarchived", action="store_true",
+                        help="leave closed rounds in the hot tables")
+    args = parser.parse_args()
+
+    if args.tickets >= _CODE_SPACE:
+        sys.exit("at most 36**6 tickets fit the code format")
+    print(f"Seeding {make_url(args.url).render_as_string(hide_password=True)}",
+          file=sys.stderr)
+    print(asyncio.run(seed(
+        args.url, args.users, args.tickets, args.rounds, args.pending,
+        args.zipf, args.days, args.seed, args.reset, archived=not args.unarchived,
+    )))
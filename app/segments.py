@@ -0,0 +1,421 @@
+# app/segments.py
+import asyncio
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, and_, or_, not_, func, true
+
+from app.config import (
+    DEFAULT_RAFFLE_SLUG,
+    SEGMENT_CACHE_SECONDS,
+    SEGMENT_FULL_REFRESH_SECONDS,
+    SEGMENT_PAGE_SIZE,
+)
+from app.database import read_session
+from app.models import User, Raffle, Transaction
+
+# Audience segments for targeted sends, written in a small filter language:
+#
+#   bought(current) | bought(last) | bought(any) | bought(12)
+#   never_bought
+#   spent >= 5000                    (lifetime, any of >= > <= < =)
+#   top_spenders(100)
+#   joined_within(7d) | active_within(30d)
+#   combined with and / or / not and parentheses
+#
+# "current" and "last" are the open and the latest closed round of
+# DEFAULT_RAFFLE_SLUG. Purchases are read from successful transactions,
+# which (unlike entries) are never archived, so past rounds cost the same.
+
+PRESETS = {
+    "lapsed": "bought(last) and not bought(current)",
+    "newcomers": "joined_within(7d) and never_bought",
+    "whales": "top_spenders(100)",
+}
+
+
+class SegmentError(ValueError):
+    """The segment text doesn't parse."""
+
+
+# ============================================================
+#                          PARSER
+# ============================================================
+_TOKEN = re.compile(r"\s*(?:(\d+)d?|(>=|<=|>|<|=)|([A-Za-z_]+)|([()]))")
+_OPS = {">=": "__ge__", ">": "__gt__", "<=": "__le__", "<": "__lt__", "=": "__eq__"}
+
+
+def _tokens(text: str) -> list:
+    out, pos = [], 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m or m.end() == pos:
+            raise SegmentError(f"unexpected {text[pos:pos + 10]!r}")
+        number, op, word, punct = m.groups()
+        if number is not None:
+            out.append(("num", int(number)))
+        elif op:
+            out.append(("op", op))
+        elif word:
+            out.append(("word", word.lower()))
+        else:
+            out.append((punct, punct))
+        pos = m.end()
+    return out
+
+
+class _Parser:
+    # expr := conj ("or" conj)* ; conj := term ("and" term)*
+    # term := "not" term | "(" expr ")" | atom
+
+    def __init__(self, tokens: list):
+        self.tokens = tokens
+        self.i = 0
+
+    def peek(self):
+        return self.tokens[self.i] if self.i < len(self.tokens) else (None, None)
+
+    def take(self, kind: str, value=None):
+        tok = self.peek()
+        if tok[0] != kind or (value is not None and tok[1] != value):
+            raise SegmentError(f"expected {value or kind}, got {tok[1]!r}")
+        self.i += 1
+        return tok[1]
+
+    def parse(self):
+        node = self.expr()
+        if self.i != len(self.tokens):
+            raise SegmentError(f"unexpected {self.peek()[1]!r}")
+        return node
+
+    def expr(self):
+        node = self.conj()
+        while self.peek() == ("word", "or"):
+            self.i += 1
+            node = ("or", node, self.conj())
+        return node
+
+    def conj(self):
+        node = self.term()
+        while self.peek() == ("word", "and"):
+            self.i += 1
+            node = ("and", node, self.term())
+        return node
+
+    def term(self):
+        tok = self.peek()
+        if tok == ("word", "not"):
+            self.i += 1
+            return ("not", self.term())
+        if tok[0] == "(":
+            self.i += 1
+            node = self.expr()
+            self.take(")")
+            return node
+        return self.atom()
+
+    def atom(self):
+        name = self.take("word")
+        if name in PRESETS:
+            return parse(PRESETS[name])
+        if name == "never_bought":
+            return ("not", ("bought", "any"))
+        if name == "spent":
+            return ("spent", self.take("op"), self.take("num"))
+
+        if name not in ("bought", "top_spenders", "joined_within", "active_within"):
+            raise SegmentError(f"unknown filter {name!r}")
+        self.take("(")
+        if name == "bought":
+            tok = self.peek()
+            arg = self.take("num") if tok[0] == "num" else self.take("word")
+            if arg not in ("current", "last", "any") and not isinstance(arg, int):
+                raise SegmentError("bought() takes current, last, any or a raffle id")
+        else:
+            arg = self.take("num")
+        self.take(")")
+        return (name, arg)
+
+
+def parse(text: str) -> tuple:
+    """Segment text -> syntax tree of nested tuples. Raises SegmentError."""
+    if not text or not text.strip():
+        raise SegmentError("empty segment")
+    return _Parser(_tokens(text)).parse()
+
+
+# ============================================================
+#                         COMPILER
+# ============================================================
+async def _resolve(db, node):
+    """Pins bought(current/last) to raffle ids, so the tree says what it selects."""
+    if node[0] in ("and", "or"):
+        return (node[0], await _resolve(db, node[1]), await _resolve(db, node[2]))
+    if node[0] == "not":
+        return ("not", await _resolve(db, node[1]))
+    if node[0] == "bought" and node[1] in ("current", "last"):
+        status = [Raffle.status == "open"] if node[1] == "current" else [Raffle.status != "open"]
+        raffle_id = (
+            await db.execute(
+                select(func.max(Raffle.id)).where(Raffle.slug == DEFAULT_RAFFLE_SLUG, *status)
+            )
+        ).scalar()
+        return ("bought", raffle_id or 0)  # 0 matches nobody
+    return node
+
+
+def _paid(tx_max: int = None, users: tuple = None) -> list:
+    # NULL user ids would turn every NOT IN into "matches nobody"
+    conds = [Transaction.status == "success", Transaction.user_id.isnot(None)]
+    if tx_max is not None:
+        conds.append(Transaction.id <= tx_max)
+    if users is not None:
+        conds += [Transaction.user_id > users[0], Transaction.user_id <= users[1]]
+    return conds
+
+
+def _sql(node, tx_max: int = None, users: tuple = None):
+    """
+    Boolean SQL over users.id for a resolved tree. Each filter is a
+    semi-join (users.id IN subquery) answered from the transactions
+    indexes; `tx_max` evaluates it as of that transaction id. `users`
+    (lo, hi] narrows the subqueries to a user id window when the outer
+    query only looks at that window.
+    """
+    kind = node[0]
+    if kind == "and":
+        return and_(_sql(node[1], tx_max, users), _sql(node[2], tx_max, users))
+    if kind == "or":
+        return or_(_sql(node[1], tx_max, users), _sql(node[2], tx_max, users))
+    if kind == "not":
+        return not_(_sql(node[1], tx_max, users))
+
+    if kind == "bought":
+        q = select(Transaction.user_id).where(*_paid(tx_max, users))
+        if node[1] != "any":
+            q = q.where(Transaction.raffle_id == node[1])
+        return User.id.in_(q)
+
+    if kind == "spent":
+        total = func.sum(Transaction.amount)
+        q = (
+            select(Transaction.user_id)
+            .where(*_paid(tx_max, users))
+            .group_by(Transaction.user_id)
+            .having(getattr(total, _OPS[node[1]])(node[2]))
+        )
+        if getattr(0, _OPS[node[1]])(node[2]):
+            # users with no purchases have spent 0, and 0 qualifies
+            buyers = select(Transaction.user_id).where(*_paid(tx_max, users))
+            return or_(User.id.in_(q), not_(User.id.in_(buyers)))
+        return User.id.in_(q)
+
+    if kind == "top_spenders":
+        # a ranking over everyone, never narrowed
+        q = (
+            select(Transaction.user_id)
+            .where(*_paid(tx_max))
+            .group_by(Transaction.user_id)
+            .order_by(func.sum(Transaction.amount).desc(), Transaction.user_id)
+            .limit(node[1])
+        )
+        return User.id.in_(q)
+
+    since = datetime.now(timezone.utc) - timedelta(days=node[1])
+    if kind == "joined_within":
+        return User.created_at >= since
+    if kind == "active_within":
+        return User.id.in_(
+            select(Transaction.user_id).where(
+                *_paid(tx_max, users), Transaction.created_at >= since
+            )
+        )
+    raise SegmentError(f"unknown filter {kind!r}")
+
+
+def _incremental(node) -> bool:
+    """
+    Whether a user's membership can only change through their own new
+    transactions (or by being a new user). Rankings and time windows move
+    on their own, so those segments are recounted instead.
+    """
+    if node[0] in ("and", "or"):
+        return _incremental(node[1]) and _incremental(node[2])
+    if node[0] == "not":
+        return _incremental(node[1])
+    return node[0] in ("bought", "spent")
+
+
+async def compile_segment(db, text: str):
+    """Segment text -> SQL condition on users. Raises SegmentError."""
+    return _sql(await _resolve(db, parse(text)))
+
+
+# ============================================================
+#                         STREAMING
+# ============================================================
+async def iter_pages(text: str, page: int = SEGMENT_PAGE_SIZE):
+    """
+    Yields the segment's telegram ids in pages of up to `page`, by
+    ascending user id. Each page is a short query in its own session, so
+    nothing is held open between pages.
+
+    Pages walk user id windows with the filters narrowed to the window,
+    so a page costs the same at the end of a million users as at the
+    start; a bare keyset page would re-evaluate every subquery over all
+    transactions. Windows widen while they come back sparse.
+    """
+    async with read_session() as db:
+        tree = await _resolve(db, parse(text))
+        top = (await db.execute(select(func.max(User.id)))).scalar() or 0
+
+    # rankings are computed whole for every window, so use few, wide ones
+    lo, window = 0, page * 1024 if "top_spenders" in repr(tree) else page
+    while lo < top:
+        hi = lo + window
+        async with read_session() as db:
+            rows = (
+                await db.execute(
+                    select(User.id, User.telegram_id)
+                    .where(User.id > lo, User.id <= hi, _sql(tree, users=(lo, hi)))
+                    .order_by(User.id)
+                    .limit(page)
+                )
+            ).all()
+        if len(rows) == page:
+            hi = rows[-1].id  # more in this window, resume after the last one
+        elif len(rows) < page // 2:
+            window = min(window * 2, page * 1024)
+        if rows:
+            yield [r.telegram_id for r in rows]
+        lo = hi
+
+
+# ============================================================
+#                       CACHED SIZES
+# ============================================================
+# resolved tree -> {"count", "user_max", "tx_max", "at", "full_at"}
+_sizes = {}
+
+
+async def _watermarks(db) -> tuple:
+    row = (
+        await db.execute(
+            select(
+                select(func.coalesce(func.max(User.id), 0)).scalar_subquery(),
+                select(func.coalesce(func.max(Transaction.id), 0)).scalar_subquery(),
+            )
+        )
+    ).one()
+    return row[0], row[1]
+
+
+async def _count(db, *conds) -> int:
+    return (await db.execute(select(func.count(User.id)).where(*conds))).scalar_one()
+
+
+async def segment_size(db, text: str) -> int:
+    """
+    Number of users in the segment. Reused for SEGMENT_CACHE_SECONDS;
+    after that, segments built from bought/spent are brought up to date
+    from the users and transactions added since the last count: only
+    those users are re-evaluated, now and as of the previous count, and
+    the difference applied. Others, and every segment once per
+    SEGMENT_FULL_REFRESH_SECONDS, are recounted in full (which also
+    absorbs transactions that committed out of id order).
+    """
+    tree = await _resolve(db, parse(text))
+    key = repr(tree)
+    now = time.monotonic()
+    hit = _sizes.get(key)
+    if hit and now - hit["at"] < SEGMENT_CACHE_SECONDS:
+        return hit["count"]
+
+    user_max, tx_max = await _watermarks(db)
+    if hit and _incremental(tree) and now - hit["full_at"] < SEGMENT_FULL_REFRESH_SECONDS:
+        changed = User.id.in_(
+            select(Transaction.user_id).where(
+                Transaction.id > hit["tx_max"], Transaction.id <= tx_max
+            )
+        )
+        after = await _count(
+            db, User.id <= user_max, or_(User.id > hit["user_max"], changed), _sql(tree, tx_max)
+        )
+        before = await _count(
+            db, User.id <= hit["user_max"], changed, _sql(tree, hit["tx_max"])
+        )
+        count, full_at = hit["count"] + after - before, hit["full_at"]
+    else:
+        count = await _count(db, User.id <= user_max, _sql(tree, tx_max))
+        full_at = now
+
+    _sizes[key] = {"count": count, "user_max": user_max, "tx_max": tx_max,
+                   "at": now, "full_at": full_at}
+    return count
+
+
+# ============================================================
+#                         BENCHMARK
+# ============================================================
+async def bench(segments: list) -> list:
+    """
+    Times each segment against the configured database: a full count, a
+    cached count, an incremental refresh and streaming every page.
+    Returns (segment, size, full_ms, cached_ms, refresh_ms, stream_ms, pages).
+    """
+    results = []
+    async with read_session() as db:
+        users = await _count(db, true())
+    print(f"{users:,} users")
+
+    for text in segments:
+        async with read_session() as db:
+            _sizes.clear()
+            t = time.perf_counter()
+            size = await segment_size(db, text)
+            full = time.perf_counter() - t
+
+            t = time.perf_counter()
+            await segment_size(db, text)
+            cached = time.perf_counter() - t
+
+            for entry in _sizes.values():
+                entry["at"] = -SEGMENT_CACHE_SECONDS  # expire, keep the watermarks
+            t = time.perf_counter()
+            await segment_size(db, text)
+            refresh = time.perf_counter() - t
+
+        t = time.perf_counter()
+        pages = 0
+        async for _ in iter_pages(text):
+            pages += 1
+        stream = time.perf_counter() - t
+
+        results.append((text, size, full * 1000, cached * 1000, refresh * 1000,
+                        stream * 1000, pages))
+    return results
+
+
+if __name__ == "__main__":
+    # python -m app.segments size SEGMENT
+    # python -m app.segments bench [SEGMENT ...]   (defaults to the presets)
+    # e.g. on `python -m app.seed --users 1000000 --tickets 10000000`
+    if len(sys.argv) < 2 or sys.argv[1] not in ("size", "bench"):
+        sys.exit("usage: python -m app.segments size SEGMENT | bench [SEGMENT ...]")
+
+    if sys.argv[1] == "size":
+        async def _size():
+            async with read_session() as db:
+                return await segment_size(db, " ".join(sys.argv[2:]))
+        print(asyncio.run(_size()))
+    else:
+        rows = asyncio.run(bench(sys.argv[2:] or ["never_bought", "spent >= 5000",
+                                                 *PRESETS]))
+        print(f"{'segment':<40} {'size':>10} {'full ms':>9} {'cached':>7} "
+              f"{'refresh':>8} {'stream ms':>10} {'pages':>6}")
+        for text, size, full, cached, refresh, stream, pages in rows:
+            print(f"{text[:40]:<40} {size:>10,} {full:>9.1f} {cached:>7.2f} "
+                  f"{refresh:>8.1f} {stream:>10.1f} {pages:>6}")
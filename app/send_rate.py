@@ -0,0 +1,89 @@
+# app/send_rate.py
+import asyncio
+import logging
+import time
+
+from app.config import TELEGRAM_SEND_RATE, TELEGRAM_SEND_CONCURRENCY
+from app.metrics import Counter
+from app.telegram import get_bot
+
+log = logging.getLogger(__name__)
+
+sent_total = Counter("telegram_bulk_sent_total", "Bulk messages delivered")
+failed_total = Counter("telegram_bulk_failed_total", "Bulk messages not delivered")
+throttled = Counter("telegram_retry_after_total", "Flood-control pauses from Telegram")
+
+
+class RateLimiter:
+    """
+    Token bucket: `rate` acquisitions per second, bursts up to `burst`.
+    pause() stops everyone, for when Telegram says to back off.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:  # waiters go in arrival order
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+# One budget for every bulk sender in this process (broadcasts, reminders)
+limiter = RateLimiter(TELEGRAM_SEND_RATE)
+
+
+async def send(chat_id, text: str, **kwargs) -> bool:
+    """
+    Sends one message within the shared rate. A flood-control reply
+    pauses all bulk sending for the time Telegram asks, then retries.
+    False if it couldn't be delivered (blocked the bot, deleted, ...).
+    """
+    from aiogram.exceptions import TelegramRetryAfter  # aiogram stays out of cold start
+
+    for _ in range(3):
+        await limiter.acquire()
+        try:
+            await get_bot().send_message(int(chat_id), text, **kwargs)
+            sent_total.inc()
+            return True
+        except TelegramRetryAfter as e:
+            throttled.inc()
+            limiter.pause(e.retry_after)
+        except Exception as e:
+            # one line each, no traceback
+            log.info("Bulk delivery failed", extra={"chat_id": chat_id, "error": repr(e)})
+            break
+    failed_total.inc()
+    return False
+
+
+async def send_many(chat_ids, text: str, concurrency: int = TELEGRAM_SEND_CONCURRENCY,
+                    **kwargs) -> tuple:
+    """Sends `text` to every chat, `concurrency` in flight. Returns (sent, failed)."""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(chat_id):
+        async with sem:
+            return await send(chat_id, text, **kwargs)
+
+    results = await asyncio.gather(*(_one(c) for c in chat_ids))
+    sent = sum(results)
+    return sent, len(results) - sent
@@ -0,0 +1,164 @@
+# app/sqlite_bench.py
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Compares webhook confirmation throughput on SQLite with SQLITE_PROFILE
+# "tuned" and "off". Both runs get a copy of the same seeded file, and each
+# runs in its own process, since the engines are built at import time.
+
+
+def _p95(samples: list) -> float:
+    samples = sorted(samples)
+    return samples[int(len(samples) * 0.95)] * 1000 if samples else 0.0
+
+
+async def _child(payments: int, concurrency: int, readers: int, read_rate: float) -> dict:
+    """
+    Confirms `payments` pending seed entries, `concurrency` at a time,
+    while `readers` users each look up their tickets `read_rate` times a second.
+    """
+    from sqlalchemy import select, func
+
+    from app.database import async_session, read_session
+    from app.issuance import confirm_payment
+    from app.models import RaffleEntry, Ticket, User
+
+    async with async_session() as db:
+        pending = (
+            await db.execute(
+                select(RaffleEntry.reference, RaffleEntry.amount)
+                .where(RaffleEntry.confirmed.is_(False))
+                .order_by(RaffleEntry.id)
+                .limit(payments)
+            )
+        ).all()
+        users = (await db.execute(select(func.max(User.id)))).scalar()
+
+    queue = list(pending)
+    stats = {"ok": 0, "locked": 0, "errors": 0, "reads": 0}
+    write_lat, read_lat = [], []
+    done = asyncio.Event()
+
+    async def writer():
+        while queue:
+            reference, amount = queue.pop()
+            t = time.perf_counter()
+            try:
+                await confirm_payment(reference, amount)
+                stats["ok"] += 1
+            except Exception as e:
+                stats["locked" if "database is locked" in str(e) else "errors"] += 1
+            write_lat.append(time.perf_counter() - t)
+
+    async def reader():
+        rng = random.Random()
+        while not done.is_set():
+            t = time.perf_counter()
+            try:
+                async with read_session() as db:
+                    (await db.execute(
+                        select(Ticket.raffle_id, Ticket.code)
+                        .where(Ticket.user_id == rng.randint(1, users))
+                    )).all()
+                stats["reads"] += 1
+            except Exception as e:
+                stats["locked" if "database is locked" in str(e) else "errors"] += 1
+            read_lat.append(time.perf_counter() - t)
+            await asyncio.sleep(max(0.0, 1 / read_rate - (time.perf_counter() - t)))
+
+    readers = [asyncio.create_task(reader()) for _ in range(readers)]
+    started = time.perf_counter()
+    await asyncio.gather(*(writer() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*readers)
+
+    return {
+        "payments": len(pending),
+        "seconds": round(elapsed, 2),
+        "payments_per_s": round(stats["ok"] / elapsed, 1),
+        "write_p95_ms": round(_p95(write_lat), 1),
+        "reads_per_s": round(stats["reads"] / elapsed, 1),
+        "read_p95_ms": round(_p95(read_lat), 1),
+        "locked": stats["locked"],
+        "errors": stats["errors"],
+    }
+
+
+def _run(profile: str, path: str, args) -> dict:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite+aiosqlite:///{path}",
+        SQLITE_PROFILE=profile,
+        TICKET_INDEX_ENABLED="0",  # measure the database, not the in-memory index
+    )
+    out = subprocess.run(
+        [sys.executable, "-m", "app.sqlite_bench", "--child",
+         "--payments", str(args.payments), "--concurrency", str(args.concurrency),
+         "--readers", str(args.readers), "--read-rate", str(args.read_rate)],
+        env=env, check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(args):
+    from app.seed import seed
+
+    workdir = tempfile.mkdtemp(prefix="sqlite_bench_")
+    try:
+        base = os.path.join(workdir, "base.db")
+        print(f"Seeding {args.users:,} users, {args.tickets:,} tickets…", file=sys.stderr)
+        # enough unpaid entries to confirm during the run
+        pending = min(0.9, args.payments * 4 / max(args.tickets, 1))
+        asyncio.run(seed(f"sqlite+aiosqlite:///{base}", args.users, args.tickets,
+                         pending=max(pending, 0.15)))
+
+        results = {}
+        for profile in ("off", "tuned"):
+            path = os.path.join(workdir, f"{profile}.db")
+            shutil.copyfile(base, path)
+            print(f"Running profile {profile!r}…", file=sys.stderr)
+            results[profile] = _run(profile, path, args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    keys = list(results["off"])
+    print(f"{'':<16} {'off':>10} {'tuned':>10}")
+    for key in keys:
+        print(f"{key:<16} {results['off'][key]:>10} {results['tuned'][key]:>10}")
+
+
+if __name__ == "__main__":
+    # python -m app.sqlite_bench [--payments 2000 --concurrency 32 --readers 8]
+    parser = argparse.ArgumentParser(
+        prog="python -m app.sqlite_bench",
+        description="Webhook throughput on SQLite with and without the tuned profile.",
+    )
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--tickets", type=int, default=200_000)
+    parser.add_argument("--payments", type=int, default=2_000,
+                        help="confirmations per run")
+    parser.add_argument("--concurrency", type=int, default=32,
+                        help="webhooks in flight")
+    parser.add_argument("--readers", type=int, default=8,
+                        help="concurrent ticket lookups alongside the writes")
+    parser.add_argument("--read-rate", type=float, default=20,
+                        help="lookups per second per reader")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = asyncio.run(
+            _child(args.payments, args.concurrency, args.readers, args.read_rate)
+        )
+        print(json.dumps(result))
+    else:
+        main(args)
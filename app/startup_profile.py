@@ -0,0 +1,88 @@
+# app/startup_profile.py
+# Cold-start profile for the web process:
+#   python -m app.startup_profile            import breakdown + time to first response
+#   python -m app.startup_profile --max-ms 3000   exit 1 if the target is missed (CI gate)
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+def import_breakdown(module: str = "app.main", top: int = 15):
+    """Runs `python -X importtime` in a fresh interpreter; returns the slowest imports."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = _parse_importtime(line)
+        rows.append((int(cumulative_us), int(self_us), name))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def _parse_importtime(line: str):
+    # "import time:   self [us] | cumulative | imported package"
+    head, cumulative, name = line.split("|", 2)
+    self_us = head.split(":", 1)[1]
+    return self_us.strip(), cumulative.strip(), name.rstrip()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_response(timeout: float = 30) -> float:
+    """Starts uvicorn and returns milliseconds until GET /healthz answers."""
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=os.environ.copy(),
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1):
+                    return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError("web process did not answer /healthz")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="fail if time to first response exceeds this")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    print("Slowest imports (cumulative ms / self ms):")
+    for cumulative, self_us, name in import_breakdown(top=args.top):
+        print(f"  {cumulative / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+
+    ms = time_to_first_response()
+    print(f"\nStartup to first response: {ms:.0f} ms")
+
+    if args.max_ms is not None and ms > args.max_ms:
+        print(f"❌ over the {args.max_ms:.0f} ms target")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
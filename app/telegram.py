@@ -0,0 +1,19 @@
+# app/telegram.py
+from app.config import BOT_TOKEN
+
+# Created on first use so importing the web app doesn't build a Bot session
+_bot = None
+
+
+def get_bot():
+    global _bot
+    if _bot is None:
+        from aiogram import Bot
+        _bot = Bot(token=BOT_TOKEN)
+    return _bot
+
+
+def set_bot(bot):
+    """Lets the polling runner share the Bot it already created."""
+    global _bot
+    _bot = bot
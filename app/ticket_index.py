@@ -0,0 +1,262 @@
+# app/ticket_index.py
+import asyncio
+import logging
+import random
+from array import array
+from collections import Counter
+
+from sqlalchemy import select, func
+
+from app.config import SNAPSHOT_PATH, TICKET_INDEX_RESCAN_IDS
+from app.database import async_session
+from app.models import Ticket
+from app.raffles import active_raffle_id, open_raffles
+from app.ticket_snapshot import read_snapshot, snapshot_path
+
+_PREFIX = "MW-"
+_CODE_LEN = 6
+_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_MIN_SLOTS_BITS = 10
+_GOLDEN = 0x9E3779B97F4A7C15
+_U64 = (1 << 64) - 1
+_STREAM_ROWS = 5000
+
+log = logging.getLogger(__name__)
+
+
+# ============================================================
+#                      CODE <-> INT
+# ============================================================
+def encode_code(code: str):
+    """MW-8F3A2C -> int, or None for codes not in that format."""
+    if len(code) != len(_PREFIX) + _CODE_LEN or not code.startswith(_PREFIX):
+        return None
+    try:
+        return int(code[len(_PREFIX):], 36)
+    except ValueError:
+        return None
+
+
+def decode_code(n: int) -> str:
+    chars = []
+    for _ in range(_CODE_LEN):
+        n, r = divmod(n, 36)
+        chars.append(_ALPHABET[r])
+    return _PREFIX + "".join(reversed(chars))
+
+
+# ============================================================
+#                         INDEX
+# ============================================================
+class TicketIndex:
+    """
+    Tickets of one round held as parallel arrays (4 bytes per code, 4 per
+    owner) plus an open-addressing hash table of positions, so code ->
+    owner lookups and uniform draws are O(1).
+    """
+
+    def __init__(self, raffle_id=None):
+        self.raffle_id = raffle_id
+        self.last_ticket_id = 0
+        self.codes = array("I")
+        self.owners = array("i")
+        self._set_capacity(_MIN_SLOTS_BITS)
+
+    @classmethod
+    def from_parts(cls, raffle_id, last_ticket_id, codes, owners, slots):
+        """Rebuilds an index from saved arrays (see app/ticket_snapshot.py)."""
+        idx = cls(raffle_id)
+        idx.last_ticket_id = last_ticket_id
+        idx.codes, idx.owners, idx._slots = codes, owners, slots
+        bits = len(slots).bit_length() - 1
+        idx._mask = (1 << bits) - 1
+        idx._shift = 64 - bits
+        return idx
+
+    def _set_capacity(self, bits: int):
+        self._slots = array("i", bytes(4 << bits))  # position + 1, 0 = empty
+        self._mask = (1 << bits) - 1
+        self._shift = 64 - bits
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, code: str):
+        return self.owner(code) is not None
+
+    def _find(self, key: int) -> int:
+        """Slot holding `key`, or the empty slot where it would go."""
+        # Fibonacci hashing: the top bits of the product are well mixed
+        i = ((key * _GOLDEN) & _U64) >> self._shift
+        slots, codes = self._slots, self.codes
+        while True:
+            pos = slots[i]
+            if pos == 0 or codes[pos - 1] == key:
+                return i
+            i = (i + 1) & self._mask
+
+    def _grow(self):
+        self._set_capacity(64 - self._shift + 1)
+        for pos, key in enumerate(self.codes):
+            self._slots[self._find(key)] = pos + 1
+
+    def add(self, code: str, user_id: int, ticket_id: int = 0):
+        key = encode_code(code)
+        if key is None:
+            return
+        if ticket_id > self.last_ticket_id:
+            self.last_ticket_id = ticket_id
+
+        i = self._find(key)
+        if self._slots[i]:
+            return  # already indexed
+
+        self.codes.append(key)
+        self.owners.append(user_id)
+        self._slots[i] = len(self.codes)
+        if len(self.codes) * 2 > self._mask + 1:
+            self._grow()
+
+    def owner(self, code: str):
+        key = encode_code(code)
+        if key is None:
+            return None
+        pos = self._slots[self._find(key)]
+        return self.owners[pos - 1] if pos else None
+
+    def draw(self, rng=random):
+        """Uniformly random (code, user_id), or None when empty."""
+        if not self.codes:
+            return None
+        pos = rng.randrange(len(self.codes))
+        return decode_code(self.codes[pos]), self.owners[pos]
+
+    def user_stats(self, top: int = 5) -> dict:
+        """Ticket distribution per user, i.e. each holder's odds of winning."""
+        counts = Counter(self.owners)
+        total = len(self.owners)
+        return {
+            "tickets": total,
+            "holders": len(counts),
+            "top": [
+                (user_id, n, n / total) for user_id, n in counts.most_common(top)
+            ],
+        }
+
+    def nbytes(self) -> int:
+        return sum(
+            a.itemsize * len(a) for a in (self.codes, self.owners, self._slots)
+        )
+
+
+# ============================================================
+#                    DB SYNCHRONISATION
+# ============================================================
+# one index per open raffle
+indexes = {}
+_sync_lock = asyncio.Lock()
+
+
+async def sync_index(db, raffle_id: int = None) -> TicketIndex:
+    """
+    Brings a raffle's index (the default raffle if not given) up to date:
+    a full streamed build the first time, afterwards only tickets with
+    id > last_ticket_id - TICKET_INDEX_RESCAN_IDS. Ids are handed out
+    before commit, so a ticket can appear after a higher id was indexed;
+    the trailing window picks it up (add() skips codes it has). Cheap
+    enough to call before every lookup, which also picks up tickets
+    issued by other processes.
+    """
+    async with _sync_lock:
+        if raffle_id is None:
+            raffle_id = await active_raffle_id(db)
+        idx = indexes.get(raffle_id)
+        if idx is None:
+            idx = indexes[raffle_id] = TicketIndex(raffle_id)
+        await _stream_into(db, idx, max(idx.last_ticket_id - TICKET_INDEX_RESCAN_IDS, 0))
+        return idx
+
+
+async def _stream_into(db, idx: TicketIndex, after_id: int):
+    result = await db.stream(
+        select(Ticket.id, Ticket.code, Ticket.user_id)
+        .where(
+            Ticket.raffle_id == idx.raffle_id,
+            Ticket.id > after_id,
+        )
+        .order_by(Ticket.id)
+        .execution_options(yield_per=_STREAM_ROWS)
+    )
+    async for rows in result.partitions():
+        for ticket_id, code, user_id in rows:
+            idx.add(code, user_id, ticket_id)
+
+
+async def checked_index(db, raffle_id: int):
+    """
+    The synced index if it holds exactly the raffle's tickets, for draws,
+    where a missed ticket would be a ticket that can't win. On a count
+    mismatch (a commit later than the rescan window allows for) the index
+    is rebuilt once; None if it still differs, e.g. tickets with codes
+    the index can't hold, and the caller draws from the database.
+    """
+    idx = await sync_index(db, raffle_id)
+    count = select(func.count(Ticket.id)).where(Ticket.raffle_id == raffle_id)
+    if len(idx) == (await db.execute(count)).scalar_one():
+        return idx
+
+    log.warning("Ticket index out of step, rebuilding", extra={"raffle_id": raffle_id})
+    async with _sync_lock:
+        idx = TicketIndex(raffle_id)
+        await _stream_into(db, idx, 0)
+        indexes[raffle_id] = idx
+    if len(idx) == (await db.execute(count)).scalar_one():
+        return idx
+    return None
+
+
+def drop_index(raffle_id: int):
+    """Forgets a closed raffle's index."""
+    indexes.pop(raffle_id, None)
+
+
+async def load_index():
+    """
+    Startup task: for each open raffle, loads its last snapshot if there
+    is one, then replays only the tickets issued since. Without a usable
+    snapshot the raffle is streamed from the DB.
+    """
+    async with async_session() as db:
+        for raffle in await open_raffles(db):
+            if SNAPSHOT_PATH:
+                snap = read_snapshot(snapshot_path(raffle["id"]))
+                if snap is not None and snap.raffle_id == raffle["id"]:
+                    indexes[raffle["id"]] = snap
+
+            idx = await sync_index(db, raffle["id"])
+            log.info("Ticket index ready", extra={
+                "raffle_id": raffle["id"],
+                "tickets": len(idx),
+                "bytes": idx.nbytes(),
+            })
+
+
+def index_issued(raffle_id: int, user_id: int, codes: list):
+    """Webhook hook: adds freshly issued tickets without a DB round trip."""
+    idx = indexes.get(raffle_id)
+    if idx is not None:
+        for code in codes:
+            idx.add(code, user_id)
+
+
+if __name__ == "__main__":
+    # memory check: python -m app.ticket_index 5000000
+    import sys
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    idx = TicketIndex(0)
+    rng = random.Random(1)
+    while len(idx) < n:
+        idx.add(decode_code(rng.randrange(36 ** _CODE_LEN)), rng.randrange(n // 10 or 1))
+    print(f"{len(idx):,} tickets, {idx.nbytes() / 2**20:.1f} MiB, "
+          f"{idx.nbytes() / len(idx):.1f} bytes/ticket")
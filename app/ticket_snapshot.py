@@ -0,0 +1,136 @@
+# app/ticket_snapshot.py
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from app.config import SNAPSHOT_PATH, SNAPSHOT_INTERVAL_SECONDS
+from app.database import async_session
+
+# magic, version, little-endian flag, raffle_id, last_ticket_id,
+# ticket count, hash slot count; followed by codes, owners and slots
+_MAGIC = b"MWTI"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHH4q")
+
+log = logging.getLogger(__name__)
+
+
+def snapshot_path(raffle_id: int) -> str:
+    """SNAPSHOT_PATH with the raffle id added: ticket_index.snap -> ticket_index.7.snap"""
+    root, ext = os.path.splitext(SNAPSHOT_PATH)
+    return f"{root}.{raffle_id}{ext}"
+
+
+# ============================================================
+#                          WRITE
+# ============================================================
+def _write(path: str, header: bytes, parts: list):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        for a in parts:
+            a.tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+    # atomic: readers see the old snapshot or the new one, never half of one
+    os.replace(tmp, path)
+
+
+async def write_snapshot(idx, path: str = None):
+    """
+    Copies the index arrays on the loop (a memcpy), then writes them to
+    disk in a thread so the event loop isn't blocked on I/O.
+    """
+    if idx.raffle_id is None:
+        return
+    path = path or snapshot_path(idx.raffle_id)
+
+    parts = [idx.codes[:], idx.owners[:], idx._slots[:]]
+    header = _HEADER.pack(
+        _MAGIC,
+        _VERSION,
+        sys.byteorder == "little",
+        idx.raffle_id,
+        idx.last_ticket_id,
+        len(parts[0]),
+        len(parts[2]),
+    )
+    await asyncio.to_thread(_write, path, header, parts)
+
+
+# ============================================================
+#                           READ
+# ============================================================
+def read_snapshot(path: str):
+    """
+    Maps the snapshot file and copies its arrays straight into a
+    TicketIndex (no rehashing). Returns None if the file is missing
+    or doesn't look like a snapshot.
+    """
+    from app.ticket_index import TicketIndex  # app.ticket_index imports us
+
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    with f:
+        if os.fstat(f.fileno()).st_size < _HEADER.size:
+            return None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    with mm:
+        magic, version, little, raffle_id, last_id, count, nslots = \
+            _HEADER.unpack_from(mm)
+        if magic != _MAGIC or version != _VERSION:
+            return None
+
+        codes, owners, slots = array("I"), array("i"), array("i")
+        sizes = [count * codes.itemsize, count * owners.itemsize,
+                 nslots * slots.itemsize]
+        if len(mm) != _HEADER.size + sum(sizes):
+            return None
+
+        view = memoryview(mm)
+        try:
+            offset = _HEADER.size
+            for a, size in zip((codes, owners, slots), sizes):
+                a.frombytes(view[offset:offset + size])
+                offset += size
+        finally:
+            view.release()
+
+    if bool(little) != (sys.byteorder == "little"):
+        for a in (codes, owners, slots):
+            a.byteswap()
+
+    return TicketIndex.from_parts(raffle_id, last_id, codes, owners, slots)
+
+
+# ============================================================
+#                     PERIODIC WRITER
+# ============================================================
+async def run_snapshots():
+    """Refreshes every open raffle's index and rewrites its snapshot each interval."""
+    from app.raffles import open_raffles
+    from app.ticket_index import sync_index
+
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL_SECONDS)
+        try:
+            async with async_session() as db:
+                for raffle in await open_raffles(db):
+                    await write_snapshot(await sync_index(db, raffle["id"]))
+        except Exception:
+            log.exception("Ticket snapshot failed")
+
+
+def remove_snapshot(raffle_id: int):
+    try:
+        os.remove(snapshot_path(raffle_id))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,122 @@
+# app/verify_queue.py
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update, delete, func
+
+from app.config import VERIFY_QUEUE_INTERVAL_SECONDS, VERIFY_QUEUE_BATCH
+from app.database import async_session, dialect_insert
+from app.issuance import confirm_payment, announce
+from app.logging_setup import correlation_id
+from app.metrics import Counter, Gauge
+from app.models import PendingVerification
+from app.breaker import OPEN, CircuitOpen
+from app.paystack import breaker, verify_payment
+
+log = logging.getLogger(__name__)
+
+queued = Counter("verify_queue_enqueued_total", "Webhooks queued for later verification")
+depth = Gauge("verify_queue_depth", "Webhooks waiting for verification")
+
+_MAX_DELAY = 3600
+
+
+async def enqueue(reference: str, error: str = None):
+    """Parks a webhook whose payment couldn't be verified right now."""
+    async with async_session() as db:
+        insert = dialect_insert(db)
+        await db.execute(
+            insert(PendingVerification)
+            .values(
+                reference=reference,
+                last_error=error,
+                next_attempt_at=datetime.now(timezone.utc),
+            )
+            .on_conflict_do_nothing(index_elements=["reference"])
+        )
+        await db.commit()
+    queued.inc()
+
+
+# ============================================================
+#                          DRAIN
+# ============================================================
+async def drain_once(batch: int = VERIFY_QUEUE_BATCH) -> int:
+    """
+    Verifies up to `batch` due references and confirms the paid ones
+    through the webhook's issuance path. Stops early if the breaker
+    opens. Returns how many rows were settled.
+    """
+    async with async_session() as db:
+        rows = (
+            await db.execute(
+                select(PendingVerification)
+                .where(PendingVerification.next_attempt_at <= datetime.now(timezone.utc))
+                .order_by(PendingVerification.next_attempt_at)
+                .limit(batch)
+            )
+        ).scalars().all()
+
+    settled = 0
+    for row in rows:
+        token = correlation_id.set(row.reference)
+        try:
+            settled += await _settle(row)
+        except CircuitOpen:
+            break
+        finally:
+            correlation_id.reset(token)
+
+    return settled
+
+
+async def _settle(row) -> bool:
+    try:
+        verification = await verify_payment(row.reference)
+    except CircuitOpen:
+        raise
+    except Exception as e:
+        # exponential backoff per reference, capped at an hour
+        delay = min(30 * 2 ** row.attempts, _MAX_DELAY)
+        async with async_session() as db:
+            await db.execute(
+                update(PendingVerification)
+                .where(PendingVerification.id == row.id)
+                .values(
+                    attempts=PendingVerification.attempts + 1,
+                    last_error=repr(e)[:500],
+                    next_attempt_at=datetime.now(timezone.utc) + timedelta(seconds=delay),
+                )
+            )
+            await db.commit()
+        return False
+
+    if verification.get("status"):
+        amount = verification["data"]["amount"] // 100
+        result = await confirm_payment(row.reference, amount)
+        await announce(result, amount)
+        log.info("Queued payment verified", extra={"status": result["status"]})
+    else:
+        log.warning("Queued payment failed verification",
+                    extra={"paystack_message": verification.get("message")})
+
+    async with async_session() as db:
+        await db.execute(delete(PendingVerification).where(PendingVerification.id == row.id))
+        await db.commit()
+    return True
+
+
+async def run_verify_queue():
+    """Drains the queue every interval while Paystack is reachable."""
+    while True:
+        await asyncio.sleep(VERIFY_QUEUE_INTERVAL_SECONDS)
+        try:
+            if breaker.state != OPEN:
+                await drain_once()
+            async with async_session() as db:
+                depth.set(
+                    (await db.execute(select(func.count(PendingVerification.id)))).scalar_one()
+                )
+        except Exception:
+            log.exception("Verify queue drain failed")
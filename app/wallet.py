@@ -0,0 +1,162 @@
+# app/wallet.py
+import asyncio
+import sys
+
+from sqlalchemy import select, update, func
+
+from app.database import async_session, dialect_insert
+from app.models import User, LedgerEntry
+
+KINDS = ("referral", "refund", "purchase", "adjustment")
+
+
+# ============================================================
+#                         POSTING
+# ============================================================
+async def credit(db, user_id: int, amount: int, kind: str, reference: str,
+                 note: str = None) -> bool:
+    """
+    Adds `amount` to a wallet. Idempotent on `reference`: returns False if
+    that reference was already posted. Caller owns the transaction.
+    """
+    insert_ = dialect_insert(db)
+    posted = (
+        await db.execute(
+            insert_(LedgerEntry)
+            .values(
+                user_id=user_id,
+                amount=amount,
+                kind=kind,
+                reference=reference,
+                note=note,
+            )
+            .on_conflict_do_nothing(index_elements=["reference"])
+            .returning(LedgerEntry.id)
+        )
+    ).scalar_one_or_none()
+
+    if posted is None:
+        return False
+
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(balance=func.coalesce(User.balance, 0) + amount)
+    )
+    return True
+
+
+async def debit(db, user_id: int, amount: int, kind: str, reference: str,
+                note: str = None) -> bool:
+    """
+    Takes `amount` from a wallet if the balance covers it. The check and
+    the subtraction are one conditional UPDATE, so two concurrent
+    purchases can't both spend the same money. Idempotent on `reference`
+    like credit: returns False if the balance doesn't cover it or that
+    reference was already posted. Caller owns the transaction.
+    """
+    left = (
+        await db.execute(
+            update(User)
+            .where(User.id == user_id, User.balance >= amount)
+            .values(balance=User.balance - amount)
+            .returning(User.balance)
+        )
+    ).scalar_one_or_none()
+
+    if left is None:
+        return False
+
+    insert_ = dialect_insert(db)
+    posted = (
+        await db.execute(
+            insert_(LedgerEntry)
+            .values(
+                user_id=user_id,
+                amount=-amount,
+                kind=kind,
+                reference=reference,
+                note=note,
+            )
+            .on_conflict_do_nothing(index_elements=["reference"])
+            .returning(LedgerEntry.id)
+        )
+    ).scalar_one_or_none()
+
+    if posted is None:
+        # posted before: put back what was just taken
+        await db.execute(
+            update(User).where(User.id == user_id).values(balance=User.balance + amount)
+        )
+        return False
+    return True
+
+
+async def balance_of(db, telegram_id) -> tuple:
+    """(user_id, balance) for a Telegram user, or (None, 0) if unknown."""
+    row = (
+        await db.execute(
+            select(User.id, User.balance).where(User.telegram_id == str(telegram_id))
+        )
+    ).one_or_none()
+    if row is None:
+        return None, 0
+    return row.id, row.balance or 0
+
+
+# ============================================================
+#                      RECONCILIATION
+# ============================================================
+def _ledger_sum():
+    return (
+        select(func.coalesce(func.sum(LedgerEntry.amount), 0))
+        .where(LedgerEntry.user_id == User.id)
+        .scalar_subquery()
+    )
+
+
+async def reconcile(fix: bool = False) -> list:
+    """
+    Compares every cached User.balance with its ledger sum and returns
+    [(user_id, cached, ledger)] for those that differ. The ledger is the
+    source of truth: with fix=True the cache is reset from it in a single
+    statement, so credits landing meanwhile aren't lost.
+    """
+    async with async_session() as db:
+        cached = func.coalesce(User.balance, 0)
+        ledger = _ledger_sum()
+        rows = (
+            await db.execute(
+                select(User.id, cached, ledger)
+                .where(cached != ledger)
+                .order_by(User.id)
+            )
+        ).all()
+
+        if fix and rows:
+            await db.execute(
+                update(User)
+                .where(User.id.in_([r[0] for r in rows]))
+                .values(balance=_ledger_sum())
+            )
+            await db.commit()
+
+    return [tuple(r) for r in rows]
+
+
+if __name__ == "__main__":
+    # python -m app.wallet reconcile [--fix]   (run from cron; exit 1 on drift)
+    if len(sys.argv) < 2 or sys.argv[1] != "reconcile":
+        sys.exit("usage: python -m app.wallet reconcile [--fix]")
+
+    fix = "--fix" in sys.argv[2:]
+    drift = asyncio.run(reconcile(fix))
+    for user_id, cached, ledger in drift:
+        print(f"user #{user_id}: cached ₦{cached:,}, ledger ₦{ledger:,}")
+
+    if not drift:
+        print("✅ Wallet balances match the ledger")
+    elif fix:
+        print(f"✅ Reset {len(drift)} balance(s) from the ledger")
+    else:
+        sys.exit(f"❌ {len(drift)} balance(s) differ from the ledger")
@@ -0,0 +1,165 @@
+# app/webhook_replay.py
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+# Re-feeds webhooks from the event log (app/webhook_store.py) through the
+# real Paystack handler, in process or over HTTP to a running app:
+#   python -m app.webhook_replay --since 2026-10-18T12:00 [--rate 50]
+#   python -m app.webhook_replay --url http://127.0.0.1:8000 --concurrency 64
+# Confirmation is idempotent, so events that were processed already come
+# back as "already_processed". With --standin the paid transactions are
+# loaded into a local stand-in first, so verification passes without
+# Paystack; in process, the handler is pointed at it too. Newly confirmed
+# payments are announced on Telegram as usual, so load-test copies of
+# production data want a dummy BOT_TOKEN.
+
+_HEADERS = {"content-type": "application/json"}
+
+
+def _sign(body: bytes, secret: str) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha512).hexdigest()
+
+
+async def _post_batch(client, standin: str, batch: list) -> int:
+    resp = await client.post(f"{standin}/_standin/transactions", json=batch)
+    resp.raise_for_status()
+    return resp.json()["loaded"]
+
+
+async def _load_standin(client, standin: str, filters: dict) -> int:
+    """Copies the charge.success transactions of the selected events to the stand-in."""
+    from app.webhook_store import iter_events
+
+    loaded, batch = 0, []
+    async for _, _, _, body in iter_events(**{**filters, "event": "charge.success"}):
+        batch.append(json.loads(body)["data"])
+        if len(batch) == 1000:
+            loaded += await _post_batch(client, standin, batch)
+            batch = []
+    if batch:
+        loaded += await _post_batch(client, standin, batch)
+    return loaded
+
+
+async def replay(url: str = None, rate: float = 0, concurrency: int = 16,
+                 resign: bool = False, standin: str = None, **filters) -> dict:
+    """
+    Posts the selected events (filters as for iter_events) at `rate` per
+    second, or as fast as `concurrency` allows when 0. Returns throughput,
+    latency and the handler's answers by status.
+    """
+    import httpx
+
+    from app.send_rate import RateLimiter
+    from app.webhook_store import iter_events
+
+    if url:
+        client = httpx.AsyncClient(base_url=url, timeout=30)
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                   base_url="http://replay", timeout=30)
+    secret = os.getenv("PAYSTACK_WEBHOOK_SECRET", "") or os.getenv("PAYSTACK_SECRET", "")
+    limiter = RateLimiter(rate, burst=max(1, int(rate // 20))) if rate else None
+
+    statuses, latencies = Counter(), []
+    queue = asyncio.Queue(maxsize=concurrency * 4)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            event_id, signature, body = item
+            if limiter:
+                await limiter.acquire()
+            headers = {
+                **_HEADERS,
+                "x-paystack-signature": _sign(body, secret) if resign else (signature or ""),
+                "x-webhook-replay": str(event_id),
+            }
+            t = time.perf_counter()
+            try:
+                resp = await client.post("/webhook/paystack", content=body, headers=headers)
+                status = (resp.json().get("status") if resp.status_code == 200
+                          else f"http_{resp.status_code}")
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - t)
+            statuses[status] += 1
+
+    async with client:
+        if standin:
+            async with httpx.AsyncClient(timeout=30) as s:
+                loaded = await _load_standin(s, standin.rstrip("/"), filters)
+            print(f"Loaded {loaded:,} transactions into the stand-in", file=sys.stderr)
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        started = last_report = time.perf_counter()
+        sent = 0
+        async for event_id, _, signature, body in iter_events(**filters):
+            await queue.put((event_id, signature, body))
+            sent += 1
+            if time.perf_counter() - last_report >= 5:
+                last_report = time.perf_counter()
+                print(f"  {sent:,} events, {sent / (last_report - started):,.0f}/s",
+                      file=sys.stderr)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def pct(p):
+        return round(latencies[int(len(latencies) * p)] * 1000, 1) if latencies else 0.0
+
+    return {
+        "events": sent,
+        "seconds": round(elapsed, 2),
+        "per_second": round(sent / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "statuses": dict(statuses),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m app.webhook_replay",
+        description="Replay stored Paystack webhooks through the handler.",
+    )
+    parser.add_argument("--since", type=datetime.fromisoformat, help="received at or after (ISO)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="received before (ISO)")
+    parser.add_argument("--reference", help="only this payment reference")
+    parser.add_argument("--event", help="only this event, e.g. charge.success")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--rate", type=float, default=0,
+                        help="events per second; 0 (default) is as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    parser.add_argument("--url", help="post to a running app instead of in process")
+    parser.add_argument("--resign", action="store_true",
+                        help="sign with this environment's PAYSTACK_WEBHOOK_SECRET "
+                             "instead of sending the stored signatures")
+    parser.add_argument("--standin", metavar="URL",
+                        help="local Paystack stand-in (python -m app.paystack_standin)")
+    args = parser.parse_args()
+
+    if args.standin and not args.url:
+        # before anything reads app.config
+        os.environ["PAYSTACK_BASE_URL"] = args.standin.rstrip("/")
+
+    report = asyncio.run(replay(
+        args.url, args.rate, args.concurrency, args.resign, args.standin,
+        since=args.since, until=args.until, reference=args.reference,
+        event=args.event, limit=args.limit,
+    ))
+    print(json.dumps(report, indent=2))
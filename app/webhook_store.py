@@ -0,0 +1,132 @@
+# app/webhook_store.py
+import asyncio
+import logging
+import re
+import zlib
+from datetime import datetime
+
+from sqlalchemy import select, insert
+
+from app.database import async_session, read_session
+from app.metrics import Counter
+from app.models import WebhookEvent
+
+log = logging.getLogger(__name__)
+
+stored = Counter("webhook_events_stored_total", "Signed webhooks written to the event log")
+dropped = Counter("webhook_events_dropped_total", "Signed webhooks the event log couldn't keep")
+raw_bytes = Counter("webhook_events_raw_bytes_total", "Webhook bytes received")
+stored_bytes = Counter("webhook_events_stored_bytes_total", "Webhook bytes after compression")
+
+_PAGE = 500
+_MAX_BATCH = 500
+_MAX_BUFFERED = 20_000
+
+# events waiting to be written, and the task writing them
+_buffer = []
+_writer = None
+
+# for bodies the handler didn't parse: the first "event" and "reference"
+# string values, which is where Paystack puts them
+_EVENT = re.compile(rb'"event"\s*:\s*"([^"\\]{1,64})"')
+_REFERENCE = re.compile(rb'"reference"\s*:\s*"([^"\\]{1,100})"')
+
+
+def _scanned(payload: bytes) -> tuple:
+    """(event, reference) picked out of an unparsed body, None where absent."""
+    found = [p.search(payload) for p in (_EVENT, _REFERENCE)]
+    return tuple(m.group(1).decode("utf-8", "replace") if m else None for m in found)
+
+
+def _fields(data, payload: bytes) -> tuple:
+    """(event, reference) for the indexed columns, from the parse if there is one."""
+    if data is None:
+        return _scanned(payload)
+    if not isinstance(data, dict):
+        return None, None
+    ref = data.get("data")
+    return data.get("event"), ref.get("reference") if isinstance(ref, dict) else None
+
+
+def record(payload: bytes, signature: str, data=None):
+    """
+    Queues a signed webhook body for the event log and returns at once.
+    `data` is the handler's parse of it, for the indexed columns; events
+    the handler ignores come without one and are scanned, not parsed. The
+    rows are written in batches off the response path (_write_buffered),
+    best effort: the payment is still processed if the log can't be
+    written.
+    """
+    global _writer
+    if len(_buffer) >= _MAX_BUFFERED:
+        dropped.inc()
+        return
+    event, reference = _fields(data, payload)
+    _buffer.append((event, reference, signature, payload))
+    if _writer is None or _writer.done():
+        _writer = asyncio.ensure_future(_write_buffered())
+
+
+async def _write_buffered():
+    # every event that arrived while the previous batch was committing
+    # goes in the next one
+    while _buffer:
+        batch = _buffer[:_MAX_BATCH]
+        del _buffer[:_MAX_BATCH]
+        rows = [
+            {"event": event, "reference": reference,
+             "signature": signature, "body": zlib.compress(payload)}
+            for event, reference, signature, payload in batch
+        ]
+        try:
+            async with async_session() as db:
+                await db.execute(insert(WebhookEvent), rows)
+                await db.commit()
+        except Exception:
+            log.warning("Webhook events not stored", exc_info=True, extra={"batch": len(rows)})
+            dropped.inc(len(rows))
+            continue
+        stored.inc(len(rows))
+        raw_bytes.inc(sum(len(b[3]) for b in batch))
+        stored_bytes.inc(sum(len(r["body"]) for r in rows))
+
+
+async def flush():
+    """Waits until every queued event has been written (shutdown, tests)."""
+    while _writer is not None and not _writer.done():
+        await asyncio.shield(_writer)
+
+
+async def iter_events(since: datetime = None, until: datetime = None,
+                      reference: str = None, event: str = None, limit: int = None):
+    """
+    Yields stored events oldest first as (id, received_at, signature, body),
+    body decompressed, a page at a time.
+    """
+    after, left = 0, limit
+    while left is None or left > 0:
+        q = (
+            select(WebhookEvent.id, WebhookEvent.received_at,
+                   WebhookEvent.signature, WebhookEvent.body)
+            .where(WebhookEvent.id > after)
+            .order_by(WebhookEvent.id)
+            .limit(min(_PAGE, left) if left is not None else _PAGE)
+        )
+        if since:
+            q = q.where(WebhookEvent.received_at >= since)
+        if until:
+            q = q.where(WebhookEvent.received_at < until)
+        if reference:
+            q = q.where(WebhookEvent.reference == reference)
+        if event:
+            q = q.where(WebhookEvent.event == event)
+
+        async with read_session() as db:
+            rows = (await db.execute(q)).all()
+        if not rows:
+            return
+        for row in rows:
+            yield row.id, row.received_at, row.signature, zlib.decompress(row.body)
+        after = rows[-1].id
+        if left is not None:
+            left -= len(rows)
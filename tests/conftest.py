@@ -0,0 +1,101 @@
+# tests/conftest.py
+import asyncio
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# app.config reads the environment at import: point it at a throwaway
+# SQLite file before any test imports the app
+_workdir = tempfile.mkdtemp(prefix="raffle_tests_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ["PAYSTACK_WEBHOOK_SECRET"] = "test-webhook-secret"
+os.environ["TICKET_INDEX_ENABLED"] = "0"
+os.environ["SCHEDULER_ENABLED"] = "0"
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ.pop("PAYSTACK_WEBHOOK_TEST_MODE", None)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+
+@pytest.fixture
+def run():
+    """
+    Runs a coroutine to completion on a fresh event loop. The engines'
+    pooled connections belong to the loop that opened them, so they are
+    disposed before it closes.
+    """
+    def _run(coro):
+        async def main():
+            from app.database import engine, read_engine
+            try:
+                return await coro
+            finally:
+                await engine.dispose()
+                await read_engine.dispose()
+        return asyncio.run(main())
+    return _run
+
+
+@pytest.fixture(scope="session")
+def schema():
+    """Creates the tables (and the default raffle) once per test run."""
+    from app.database import engine, read_engine
+    from app.init_db import init_db
+
+    async def main():
+        await init_db()
+        await engine.dispose()
+        await read_engine.dispose()
+    asyncio.run(main())
+
+
+@pytest.fixture
+def telegram():
+    """
+    (bot, api): a Bot whose session records every method instead of
+    calling Telegram. api.errors maps a method name (e.g. "EditMessageText")
+    to a factory for the exception it raises; SendMessage answers with a
+    Message, getUpdates with the api.updates from its offset on.
+    """
+    from datetime import datetime
+
+    from aiogram import Bot
+    from aiogram.client.session.base import BaseSession
+    from aiogram.methods import GetUpdates, SendMessage
+    from aiogram.types import Chat, Message
+
+    class BotAPI(BaseSession):
+        def __init__(self):
+            super().__init__()
+            self.calls = []
+            self.errors = {}
+            self.updates = []
+
+        def called(self, name: str) -> list:
+            return [m for m in self.calls if type(m).__name__ == name]
+
+        async def make_request(self, bot, method, timeout=None):
+            self.calls.append(method)
+            error = self.errors.get(type(method).__name__)
+            if error is not None:
+                raise error(method)
+            if isinstance(method, GetUpdates):
+                offset = method.offset or 0
+                return [u for u in self.updates if u.update_id >= offset][:method.limit or 100]
+            if isinstance(method, SendMessage):
+                return Message(message_id=1000 + len(self.calls), date=datetime.now(),
+                               chat=Chat(id=method.chat_id, type="private"), text=method.text)
+            return True
+
+        async def close(self):
+            pass
+
+        async def stream_content(self, *args, **kwargs):
+            raise NotImplementedError
+
+    api = BotAPI()
+    return Bot("1:test", session=api), api
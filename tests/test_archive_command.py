@@ -0,0 +1,48 @@
+# tests/test_archive_command.py
+import asyncio
+from datetime import datetime
+
+from aiogram.types import Chat, Message, User
+
+from app import bot as bot_module
+from app.database import read_session
+from app.raffles import active_raffle_id
+
+
+def _command(bot, text: str) -> Message:
+    return Message(message_id=1, date=datetime.now(), chat=Chat(id=7, type="private"),
+                   from_user=User(id=7, is_bot=False, first_name="Admin"), text=text).as_(bot)
+
+
+def _sent(api) -> list:
+    return [m.text for m in api.called("SendMessage")]
+
+
+def test_failed_archive_is_reported(telegram, monkeypatch):
+    bot, api = telegram
+
+    async def broken(raffle_id):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(bot_module, "archive_round", broken)
+
+    async def main():
+        bot_module._archive_in_background(_command(bot, "/close_round"), 12)
+        await asyncio.gather(*bot_module._background)
+
+    asyncio.run(main())
+    assert _sent(api) == ["⚠️ Archiving round #12 failed. Retry with /archive 12"]
+
+
+def test_archive_refuses_an_open_round(run, schema, telegram, monkeypatch):
+    bot, api = telegram
+    monkeypatch.setattr(bot_module, "ADMINS", [7])
+
+    async def main():
+        async with read_session() as db:
+            open_id = await active_raffle_id(db)
+        await bot_module.admin_archive(_command(bot, f"/archive {open_id}"))
+        return open_id
+
+    open_id = run(main())
+    assert _sent(api) == [f"❌ Round #{open_id} is open, not closed"]
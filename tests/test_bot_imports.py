@@ -0,0 +1,11 @@
+# tests/test_bot_imports.py
+import subprocess
+import sys
+
+
+def test_a_broken_app_module_fails_the_bot_import():
+    # stands in for an import-time bug in any module app.bot uses
+    code = "import sys; sys.modules['app.segments'] = None; import app.bot"
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert proc.returncode != 0
+    assert "app.segments" in proc.stderr
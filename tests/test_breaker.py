@@ -0,0 +1,104 @@
+# tests/test_breaker.py
+import asyncio
+import types
+
+import pytest
+
+from app import breaker
+from app.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A hand-wound monotonic clock for app.breaker."""
+    now = types.SimpleNamespace(t=1000.0)
+    monkeypatch.setattr(breaker, "time", types.SimpleNamespace(monotonic=lambda: now.t))
+    return now
+
+
+def _breaker(**kwargs):
+    return CircuitBreaker("test", **{"window": 10, "min_calls": 4, "failure_rate": 0.5,
+                                     "open_seconds": 30, **kwargs})
+
+
+def test_opens_at_the_failure_rate_once_enough_calls(clock):
+    b = _breaker()
+    for failed in (True, True, True):
+        b.record(failed)
+    assert b.state == CLOSED  # under min_calls
+    b.record(False)
+    assert b.state == OPEN  # 3 of 4 failed
+    with pytest.raises(CircuitOpen) as e:
+        b.before_call()
+    assert e.value.retry_after == 30
+
+
+def test_stays_closed_under_the_failure_rate(clock):
+    b = _breaker()
+    for failed in (False, False, True, False, False, True, False):
+        b.record(failed)
+    assert b.state == CLOSED
+
+
+def test_half_open_probe_closes_or_reopens(clock):
+    b = _breaker(probes=1)
+    for _ in range(4):
+        b.record(True)
+    clock.t += 29
+    assert b.state == OPEN
+    clock.t += 1
+    assert b.state == HALF_OPEN
+
+    b.before_call()  # the one probe
+    with pytest.raises(CircuitOpen):
+        b.before_call()
+    b.record(True)
+    assert b.state == OPEN
+
+    clock.t += 30
+    b.before_call()
+    b.record(False)
+    assert b.state == CLOSED
+    b.before_call()  # no limit once closed
+    b.before_call()
+
+
+def test_call_counts_exceptions_and_flagged_results(clock):
+    b = _breaker(min_calls=3)
+
+    async def fails():
+        raise ConnectionError
+
+    async def answers(status):
+        return status
+
+    async def main():
+        assert await b.call(answers, 200, is_failure=lambda s: s >= 500) == 200
+        with pytest.raises(ConnectionError):
+            await b.call(fails)
+        assert b.state == CLOSED  # under min_calls
+        await b.call(answers, 503, is_failure=lambda s: s >= 500)
+        assert b.state == OPEN  # 2 of 3
+        with pytest.raises(CircuitOpen):
+            await b.call(answers, 200)
+
+    asyncio.run(main())
+
+
+def test_cancelled_probe_frees_the_slot(clock):
+    b = _breaker(probes=1)
+    for _ in range(4):
+        b.record(True)
+    clock.t += 30
+
+    async def main():
+        probe = asyncio.ensure_future(b.call(asyncio.sleep, 10))
+        await asyncio.sleep(0)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert b.state == HALF_OPEN
+        await b.call(asyncio.sleep, 0)  # another call gets to probe
+        assert b.state == CLOSED
+
+    asyncio.run(main())
@@ -0,0 +1,28 @@
+# tests/test_cold_start.py
+import os
+import subprocess
+import sys
+
+from app.startup_profile import time_to_first_response
+
+# startup to first /healthz answer; override per host with COLD_START_MAX_MS
+COLD_START_MAX_MS = float(os.getenv("COLD_START_MAX_MS", "3000"))
+
+# the Bot and its handlers, and the Paystack client's httpx: loaded on
+# first use, never by importing the web app
+_LAZY = ("aiogram", "app.bot", "httpx")
+
+
+def test_web_app_import_leaves_heavy_modules_unloaded():
+    code = (
+        "import sys, app.main; "
+        f"print(' '.join(m for m in {_LAZY!r} if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         check=True)
+    assert out.stdout.strip() == ""
+
+
+def test_cold_start_within_target():
+    ms = time_to_first_response()
+    assert ms <= COLD_START_MAX_MS, f"first response after {ms:.0f} ms"
@@ -0,0 +1,48 @@
+# tests/test_export.py
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+
+from aiogram.types import Chat, Message, User
+
+from app import bot as bot_module
+from app import export
+
+
+def _command(bot, text: str) -> Message:
+    return Message(message_id=1, date=datetime.now(), chat=Chat(id=7, type="private"),
+                   from_user=User(id=7, is_bot=False, first_name="Admin"), text=text).as_(bot)
+
+
+def test_failed_export_leaves_no_spool_file(telegram, monkeypatch, tmp_path):
+    bot, api = telegram
+
+    async def broken_stream(**opts):
+        yield b"id,code\n"
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setattr(bot_module, "ADMINS", [7])
+    monkeypatch.setattr(export, "export_stream", broken_stream)
+
+    try:
+        asyncio.run(bot_module.admin_export(_command(bot, "/export tickets")))
+    except RuntimeError:
+        pass
+    assert os.listdir(tmp_path) == []
+
+
+def test_export_is_sent_and_removed(telegram, monkeypatch, tmp_path):
+    bot, api = telegram
+
+    async def stream(**opts):
+        yield b"id,code\n1,MW-AAAAAA\n"
+
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setattr(bot_module, "ADMINS", [7])
+    monkeypatch.setattr(export, "export_stream", stream)
+
+    asyncio.run(bot_module.admin_export(_command(bot, "/export tickets")))
+    assert api.called("SendDocument")
+    assert os.listdir(tmp_path) == []
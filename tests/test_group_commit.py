@@ -0,0 +1,109 @@
+# tests/test_group_commit.py
+import asyncio
+import time
+import uuid
+
+import pytest
+from sqlalchemy import insert
+
+from app import group_commit
+from app.database import async_session
+from app.group_commit import GroupCommitWriter
+from app.inventory import reserve
+from app.models import RaffleEntry, User
+from app.raffles import create_raffle
+
+
+async def _entries(n: int) -> list:
+    """n unpaid one-ticket entries of a fresh raffle, as (reference, amount)."""
+    raffle_id = await create_raffle("test-group", "Group", 100, 100)
+    async with async_session() as db:
+        user_id = (await db.execute(
+            insert(User).values(telegram_id=f"test-{uuid.uuid4().hex}").returning(User.id)
+        )).scalar_one()
+        payments = []
+        for _ in range(n):
+            reference = f"test-{uuid.uuid4().hex}"
+            await reserve(db, raffle_id, 1)
+            await db.execute(insert(RaffleEntry).values(
+                user_id=user_id, raffle_id=raffle_id, reference=reference,
+                amount=100, quantity=1, confirmed=False,
+            ))
+            payments.append((reference, 100))
+        await db.commit()
+    return payments
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """The references of every batch handed to confirm_payments."""
+    seen = []
+    confirm_payments = group_commit.confirm_payments
+
+    async def recording(db, payments):
+        seen.append([ref for ref, _ in payments])
+        return await confirm_payments(db, payments)
+
+    monkeypatch.setattr(group_commit, "confirm_payments", recording)
+    return seen
+
+
+def _submit_all(writer: GroupCommitWriter, payments: list) -> list:
+    return asyncio.gather(*(writer.submit(ref, amount) for ref, amount in payments),
+                          return_exceptions=True)
+
+
+def test_concurrent_confirmations_share_one_commit(run, schema, batches):
+    async def main():
+        payments = await _entries(5)
+        # a webhook delivered twice within the window
+        results = await _submit_all(GroupCommitWriter(window_ms=20), payments + payments[:1])
+        return payments, results
+
+    payments, results = run(main())
+    assert batches == [[ref for ref, _ in payments + payments[:1]]]
+    assert [r["status"] for r in results] == ["ok"] * 5 + ["already_processed"]
+
+
+def test_a_full_batch_does_not_wait_for_the_window(run, schema, batches):
+    async def main():
+        payments = await _entries(3)
+        started = time.perf_counter()
+        results = await _submit_all(GroupCommitWriter(window_ms=10_000, max_batch=3), payments)
+        return results, time.perf_counter() - started
+
+    results, took = run(main())
+    assert [r["status"] for r in results] == ["ok"] * 3
+    assert took < 5
+
+
+def test_failed_batch_falls_back_to_one_by_one(run, schema, monkeypatch):
+    poison = "test-poison"
+    batch_confirm = group_commit.confirm_payments
+    confirm_one = group_commit.confirm_payment
+
+    async def failing_batch(db, payments):
+        if any(ref == poison for ref, _ in payments):
+            raise RuntimeError("bad row")
+        return await batch_confirm(db, payments)
+
+    async def failing_one(reference, amount):
+        if reference == poison:
+            raise RuntimeError("bad row")
+        return await confirm_one(reference, amount)
+
+    monkeypatch.setattr(group_commit, "confirm_payments", failing_batch)
+    monkeypatch.setattr(group_commit, "confirm_payment", failing_one)
+
+    async def main():
+        payments = await _entries(3)
+        results = await _submit_all(GroupCommitWriter(window_ms=20),
+                                    payments[:2] + [(poison, 100)] + payments[2:])
+        return results
+
+    fallbacks = group_commit.fallbacks.value
+    results = run(main())
+    assert [r["status"] if isinstance(r, dict) else repr(r) for r in results] == [
+        "ok", "ok", "RuntimeError('bad row')", "ok",
+    ]
+    assert group_commit.fallbacks.value == fallbacks + 1
@@ -0,0 +1,53 @@
+# tests/test_inventory.py
+from sqlalchemy import update, delete
+
+from app.database import async_session
+from app.inventory import commit_sale, release, remaining, reserve, stress
+from app.models import Raffle
+from app.raffles import create_raffle
+
+
+async def _with_raffle(cap: int, check):
+    raffle_id = await create_raffle(f"test-cap-{cap}", "Cap test", 100, cap)
+    try:
+        async with async_session() as db:
+            return await check(db, raffle_id)
+    finally:
+        async with async_session() as db:
+            await db.execute(delete(Raffle).where(Raffle.id == raffle_id))
+            await db.commit()
+
+
+def test_concurrent_buyers_never_oversell(run, schema):
+    # 300 buyers want 1,500 tickets of 200, a quarter abandon their checkout
+    report = run(stress(cap=200, buyers=300, qty=5))
+    assert report["ok"], report
+    assert 0 < report["counter_sold"] <= 200
+
+
+def test_reserve_stops_at_the_cap(run, schema):
+    async def check(db, raffle_id):
+        results = [await reserve(db, raffle_id, qty) for qty in (6, 5, 4)]
+        return results, await remaining(db, raffle_id)
+
+    assert run(_with_raffle(10, check)) == ([True, False, True], 0)
+
+
+def test_expired_hold_must_fit_again(run, schema):
+    async def check(db, raffle_id):
+        await reserve(db, raffle_id, 10)
+        squeezed = await commit_sale(db, raffle_id, 1, reserved=False)
+        await release(db, {raffle_id: 10})
+        fits = await commit_sale(db, raffle_id, 3, reserved=False)
+        return squeezed, fits, await remaining(db, raffle_id)
+
+    assert run(_with_raffle(10, check)) == (False, True, 7)
+
+
+def test_closed_raffle_sells_nothing(run, schema):
+    async def check(db, raffle_id):
+        await db.execute(update(Raffle).where(Raffle.id == raffle_id).values(status="closed"))
+        return (await reserve(db, raffle_id, 1),
+                await commit_sale(db, raffle_id, 1, reserved=False))
+
+    assert run(_with_raffle(10, check)) == (False, False)
@@ -0,0 +1,78 @@
+# tests/test_navigation.py
+import asyncio
+from datetime import datetime
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, Chat, InaccessibleMessage, Message, User
+
+from app import navigation
+from app.navigation import show
+
+_CHAT = Chat(id=42, type="private")
+
+
+def _tap(bot, message) -> CallbackQuery:
+    return CallbackQuery(
+        id="1", chat_instance="c", message=message,
+        from_user=User(id=42, is_bot=False, first_name="Test"),
+    ).as_(bot)
+
+
+def _message(bot, message_id: int, text: str = "Old screen") -> Message:
+    return Message(message_id=message_id, date=datetime.now(), chat=_CHAT,
+                   text=text).as_(bot)
+
+
+def _bad_request(description: str):
+    return lambda method: TelegramBadRequest(method, description)
+
+
+def test_edits_in_place(telegram):
+    bot, api = telegram
+    asyncio.run(show(_tap(bot, _message(bot, 1)), "New screen"))
+    assert [m.text for m in api.called("EditMessageText")] == ["New screen"]
+    assert api.called("AnswerCallbackQuery")
+    assert not api.called("SendMessage")
+
+
+def test_same_screen_is_not_edited(telegram):
+    bot, api = telegram
+    asyncio.run(show(_tap(bot, _message(bot, 2, "Same")), "Same"))
+    assert not api.called("EditMessageText")
+    assert api.called("AnswerCallbackQuery")
+
+
+def test_inaccessible_message_gets_a_new_message(telegram):
+    bot, api = telegram
+    old = InaccessibleMessage(chat=_CHAT, message_id=3)
+    asyncio.run(show(_tap(bot, old), "Fresh screen", answer_text="ok"))
+
+    assert [(m.chat_id, m.text) for m in api.called("SendMessage")] == [(42, "Fresh screen")]
+    assert [m.text for m in api.called("AnswerCallbackQuery")] == ["ok"]
+    assert not api.called("EditMessageText")
+
+
+def test_uneditable_message_gets_a_new_message(telegram):
+    bot, api = telegram
+    api.errors["EditMessageText"] = _bad_request("Bad Request: message can't be edited")
+    sent_before = navigation.fallback_sends.value
+    asyncio.run(show(_tap(bot, _message(bot, 4)), "Fresh screen"))
+
+    assert [m.text for m in api.called("SendMessage")] == ["Fresh screen"]
+    assert api.called("AnswerCallbackQuery")
+    assert navigation.fallback_sends.value == sent_before + 1
+
+
+def test_not_modified_is_not_resent(telegram):
+    bot, api = telegram
+    api.errors["EditMessageText"] = _bad_request("Bad Request: message is not modified")
+    asyncio.run(show(_tap(bot, _message(bot, 5)), "Other screen"))
+    assert not api.called("SendMessage")
+    assert api.called("AnswerCallbackQuery")
+
+
+def test_failed_ack_still_shows_the_screen(telegram):
+    bot, api = telegram
+    api.errors["AnswerCallbackQuery"] = _bad_request("Bad Request: query is too old")
+    asyncio.run(show(_tap(bot, _message(bot, 6)), "New screen"))
+    assert api.called("EditMessageText")
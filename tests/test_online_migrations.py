@@ -0,0 +1,79 @@
+# tests/test_online_migrations.py
+from contextlib import contextmanager
+
+import pytest
+
+from app import online_migrations
+
+
+class _Op:
+    """Records what set_not_null runs, and in which committed step."""
+
+    def __init__(self):
+        self.steps = []
+        self._current = None
+
+    def get_context(self):
+        return self
+
+    @contextmanager
+    def autocommit_block(self):
+        self._current = []
+        yield
+        self.steps.append(self._current)
+        self._current = None
+
+    def execute(self, sql):
+        assert self._current is not None, f"ran inside the migration's transaction: {sql}"
+        self._current.append(sql.split('"raffles" ')[-1])
+
+
+@pytest.fixture
+def postgres(monkeypatch):
+    op = _Op()
+    monkeypatch.setattr(online_migrations, "op", op)
+    monkeypatch.setattr(online_migrations, "_is_postgres", lambda: True)
+
+    def at(nullable, validated):
+        monkeypatch.setattr(online_migrations, "_not_null_state",
+                            lambda table, column, check: (nullable, validated))
+        online_migrations.set_not_null("raffles", "slug")
+        return op.steps
+    return at
+
+
+def test_fresh_column_takes_four_committed_steps(postgres):
+    assert postgres(True, None) == [
+        ["SET lock_timeout = '5s'",
+         'ADD CONSTRAINT "raffles_slug_not_null" CHECK ("slug" IS NOT NULL) NOT VALID',
+         "RESET lock_timeout"],
+        ['VALIDATE CONSTRAINT "raffles_slug_not_null"'],  # the scan, no lock timeout
+        ["SET lock_timeout = '5s'", 'ALTER COLUMN "slug" SET NOT NULL', "RESET lock_timeout"],
+        ["SET lock_timeout = '5s'", 'DROP CONSTRAINT IF EXISTS "raffles_slug_not_null"',
+         "RESET lock_timeout"],
+    ]
+
+
+def test_rerun_after_the_constraint_was_added(postgres):
+    steps = postgres(True, False)
+    assert not any("ADD CONSTRAINT" in sql for step in steps for sql in step)
+    assert 'VALIDATE CONSTRAINT "raffles_slug_not_null"' in steps[0]
+
+
+def test_rerun_after_validation(postgres):
+    steps = postgres(True, True)
+    assert [sql for step in steps for sql in step if "lock_timeout" not in sql] == [
+        'ALTER COLUMN "slug" SET NOT NULL',
+        'DROP CONSTRAINT IF EXISTS "raffles_slug_not_null"',
+    ]
+
+
+def test_rerun_after_set_not_null_drops_the_leftover_check(postgres):
+    steps = postgres(False, True)
+    assert [sql for step in steps for sql in step if "lock_timeout" not in sql] == [
+        'DROP CONSTRAINT IF EXISTS "raffles_slug_not_null"',
+    ]
+
+
+def test_done_is_a_no_op(postgres):
+    assert postgres(False, None) == []
@@ -0,0 +1,91 @@
+# tests/test_paystack_webhook.py
+import hashlib
+import hmac
+import json
+import os
+
+import httpx
+
+from app.config import WEBHOOK_MAX_BODY_BYTES
+from app.routers.paystack_webhook import verify_signature
+
+_SECRET = os.environ["PAYSTACK_WEBHOOK_SECRET"]  # set in conftest
+
+
+def _sign(body: bytes) -> str:
+    return hmac.new(_SECRET.encode(), body, hashlib.sha512).hexdigest()
+
+
+def _event(size: int = 0) -> bytes:
+    """A signed-able event the handler ignores, padded to `size` bytes."""
+    body = json.dumps({"event": "transfer.success", "data": {"reference": "TRF-1"}, "pad": ""})
+    return body[:-2].encode() + b"x" * max(size - len(body), 0) + b'"}'
+
+
+def test_verify_signature():
+    body = _event()
+    assert verify_signature(body, _sign(body))
+    assert verify_signature(body, _sign(body).upper())
+    assert not verify_signature(body + b" ", _sign(body))
+    assert not verify_signature(body, "0" * 128)
+    assert not verify_signature(body, _sign(body)[:-1])
+    assert not verify_signature(body, "")
+
+
+async def _post(content, **headers):
+    from app import webhook_store
+    from app.main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                 base_url="http://test") as client:
+        resp = await client.post("/webhook/paystack", content=content, headers={
+            "content-type": "application/json", **headers,
+        })
+    await webhook_store.flush()
+    return resp.status_code
+
+
+def test_rejects_unsigned_and_badly_signed(run, schema):
+    body = _event()
+    assert run(_post(body)) == 401
+    assert run(_post(body, **{"x-paystack-signature": "0" * 128})) == 401
+    assert run(_post(body, **{"x-paystack-signature": _sign(body)})) == 200
+
+
+def test_body_size_cap(run, schema):
+    at_cap = _event(WEBHOOK_MAX_BODY_BYTES)
+    over = _event(WEBHOOK_MAX_BODY_BYTES + 1)
+    assert len(at_cap) == WEBHOOK_MAX_BODY_BYTES
+    assert run(_post(at_cap, **{"x-paystack-signature": _sign(at_cap)})) == 200
+    # refused on the declared length
+    assert run(_post(over, **{"x-paystack-signature": _sign(over)})) == 413
+    assert run(_post(b"{}", **{"x-paystack-signature": _sign(b"{}"),
+                               "content-length": "nonsense"})) == 413
+
+    # and while streaming, when no length is declared
+    async def chunks(body: bytes):
+        for i in range(0, len(body), 4096):
+            yield body[i:i + 4096]
+
+    assert run(_post(chunks(over), **{"x-paystack-signature": _sign(over)})) == 413
+    assert run(_post(chunks(at_cap), **{"x-paystack-signature": _sign(at_cap)})) == 200
+
+
+def test_ignored_events_are_stored_without_a_parse(run, schema, monkeypatch):
+    from app import webhook_store
+    from app.routers import paystack_webhook
+
+    parsed = []
+    monkeypatch.setattr(paystack_webhook, "_loads", lambda b: parsed.append(b) or json.loads(b))
+    monkeypatch.setattr(paystack_webhook, "WEBHOOK_STORE_ENABLED", True)
+    body = json.dumps({"event": "transfer.success",
+                       "data": {"reference": "TRF-stored", "amount": 5000}}).encode()
+    assert run(_post(body, **{"x-paystack-signature": _sign(body)})) == 200
+    assert parsed == []
+
+    async def stored():
+        return [e async for e in webhook_store.iter_events(reference="TRF-stored",
+                                                           event="transfer.success")]
+    events = run(stored())
+    assert len(events) == 1
+    assert events[0][2:] == (_sign(body), body)
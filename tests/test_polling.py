@@ -0,0 +1,76 @@
+# tests/test_polling.py
+import asyncio
+import os
+import signal
+from datetime import datetime
+
+from aiogram import Dispatcher, Router
+from aiogram.exceptions import TelegramConflictError
+from aiogram.types import Chat, Message, Update
+
+from app import polling
+
+
+def _update(update_id: int) -> Update:
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=42, type="private"),
+        text=f"update {update_id}",
+    ))
+
+
+def _dispatcher(handled: list, until: int) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def record(msg: Message):
+        handled.append(msg.message_id)
+        if len(handled) == until:
+            os.kill(os.getpid(), signal.SIGTERM)  # run_polling's own shutdown
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+def test_refused_get_updates_is_retried(telegram):
+    bot, api = telegram
+    api.updates = [_update(1), _update(2)]
+
+    def refuse_once(method):
+        del api.errors["GetUpdates"]
+        return TelegramConflictError(method, "Conflict: can't use getUpdates while webhook is active")
+
+    api.errors["GetUpdates"] = refuse_once
+    handled = []
+    asyncio.run(polling.run_polling(bot, _dispatcher(handled, until=2)))
+
+    assert handled == [1, 2]
+    # the last call confirms both
+    assert api.called("GetUpdates")[-1].offset == 3
+
+
+def test_worker_runs_the_background_loops(run, schema, telegram, monkeypatch):
+    bot, api = telegram
+    started, cancelled = [], []
+
+    async def loop(name):
+        started.append(name)
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(name)
+            raise
+
+    def start_background():
+        return [asyncio.create_task(loop(name)) for name in ("reaper", "verify_queue")]
+
+    async def run_polling(bot, dp):
+        await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(polling, "Bot", lambda token: bot)
+    monkeypatch.setattr(polling, "start_background", start_background)
+    monkeypatch.setattr(polling, "run_polling", run_polling)
+    monkeypatch.setattr(polling, "register_handlers", lambda dp: None)
+    run(polling._main())
+
+    assert started == cancelled == ["reaper", "verify_queue"]
@@ -0,0 +1,59 @@
+# tests/test_raffles.py
+from sqlalchemy import update, delete
+
+from app.config import DEFAULT_RAFFLE_SLUG
+from app.database import async_session
+from app.models import Raffle
+from app.raffles import create_raffle, invalidate_catalog, open_raffles
+from app.reaper import _restore_target
+
+
+class _LaggingReplica:
+    """A read session that hasn't replayed any raffle yet."""
+
+    async def execute(self, stmt):
+        class Result:
+            def mappings(self):
+                return self
+
+            def all(self):
+                return []
+        return Result()
+
+
+def test_open_raffles_reads_back_from_the_primary(run, schema):
+    invalidate_catalog()
+    raffles = run(open_raffles(_LaggingReplica()))
+    invalidate_catalog()
+    assert DEFAULT_RAFFLE_SLUG in [r["slug"] for r in raffles]
+
+
+async def _series(prices: list) -> list:
+    """Rounds of one series with these prices; all but the last closed."""
+    ids = [await create_raffle("test-series", "Series", price) for price in prices]
+    async with async_session() as db:
+        await db.execute(update(Raffle).where(Raffle.id.in_(ids[:-1])).values(status="closed"))
+        await db.commit()
+    return ids
+
+
+async def _targets(prices: list):
+    ids = await _series(prices)
+    try:
+        async with async_session() as db:
+            return ids, [await _restore_target(db, raffle_id) for raffle_id in ids]
+    finally:
+        async with async_session() as db:
+            await db.execute(delete(Raffle).where(Raffle.id.in_(ids)))
+            await db.commit()
+        invalidate_catalog()
+
+
+def test_late_payment_goes_to_the_open_round_at_the_same_price(run, schema):
+    (closed, current), targets = run(_targets([500, 500]))
+    assert targets == [current, current]
+
+
+def test_late_payment_stays_when_the_price_changed(run, schema):
+    (closed, current), targets = run(_targets([500, 800]))
+    assert targets == [closed, current]
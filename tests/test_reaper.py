@@ -0,0 +1,157 @@
+# tests/test_reaper.py
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, insert, update, delete
+
+from app import reconcile
+from app.config import ENTRY_TTL_MINUTES
+from app.database import async_session
+from app.inventory import reserve
+from app.issuance import confirm_payment
+from app.models import ArchivedEntry, Raffle, RaffleEntry, Ticket, User
+from app.raffles import create_raffle, invalidate_catalog
+from app.reaper import reap_once
+
+_EXPIRED = timedelta(minutes=ENTRY_TTL_MINUTES + 1)
+
+
+async def _user() -> int:
+    async with async_session() as db:
+        user_id = (await db.execute(
+            insert(User).values(telegram_id=f"test-{uuid.uuid4().hex}").returning(User.id)
+        )).scalar_one()
+        await db.commit()
+    return user_id
+
+
+async def _entry(user_id: int, raffle_id: int, qty: int, age=timedelta(0),
+                 confirmed: bool = False) -> str:
+    """An entry holding `qty` tickets, created `age` ago."""
+    reference = f"test-{uuid.uuid4().hex}"
+    async with async_session() as db:
+        assert await reserve(db, raffle_id, qty)
+        await db.execute(insert(RaffleEntry).values(
+            user_id=user_id, raffle_id=raffle_id, reference=reference,
+            amount=qty * 100, quantity=qty, confirmed=confirmed,
+            created_at=datetime.now(timezone.utc) - age,
+        ))
+        await db.commit()
+    return reference
+
+
+async def _counters(raffle_id: int) -> tuple:
+    """(tickets_reserved, tickets_sold, tickets issued)."""
+    async with async_session() as db:
+        reserved, sold = (await db.execute(
+            select(Raffle.tickets_reserved, Raffle.tickets_sold).where(Raffle.id == raffle_id)
+        )).one()
+        issued = len((await db.execute(
+            select(Ticket.id).where(Ticket.raffle_id == raffle_id)
+        )).all())
+    return reserved, sold, issued
+
+
+async def _where(reference: str) -> str:
+    async with async_session() as db:
+        if (await db.execute(select(RaffleEntry.id).where(
+                RaffleEntry.reference == reference))).first():
+            return "hot"
+        if (await db.execute(select(ArchivedEntry.id).where(
+                ArchivedEntry.reference == reference))).first():
+            return "archived"
+    return "gone"
+
+
+async def _reap_all():
+    while await reap_once():
+        pass
+
+
+def test_reaper_releases_only_expired_unpaid_holds(run, schema):
+    async def main():
+        raffle_id = await create_raffle("test-reap", "Reap", 100, 20)
+        user_id = await _user()
+        expired = await _entry(user_id, raffle_id, 3, _EXPIRED)
+        fresh = await _entry(user_id, raffle_id, 2)
+        paid = await _entry(user_id, raffle_id, 4, _EXPIRED, confirmed=True)
+        before = await _counters(raffle_id)
+        await _reap_all()
+        return before, await _counters(raffle_id), [await _where(r) for r in (expired, fresh, paid)]
+
+    before, after, where = run(main())
+    assert before == (9, 0, 0)
+    assert after == (6, 0, 0)  # the expired entry's 3 went back on sale
+    assert where == ["archived", "hot", "hot"]
+
+
+def test_late_payment_is_restored_into_its_live_round(run, schema):
+    async def main():
+        raffle_id = await create_raffle("test-late", "Late", 100, 20)
+        reference = await _entry(await _user(), raffle_id, 3, _EXPIRED)
+        await _reap_all()
+        reaped = await _counters(raffle_id)
+        result = await confirm_payment(reference, 300)
+        return reaped, result["status"], await _counters(raffle_id), await _where(reference)
+
+    reaped, status, after, where = run(main())
+    assert reaped == (0, 0, 0)
+    assert status == "ok"
+    assert after == (0, 3, 3)  # sold again under the cap, no hold to release
+    assert where == "hot"
+
+
+def test_late_payment_for_a_closed_round_goes_to_its_successor(run, schema):
+    async def main():
+        old = await create_raffle("test-series-late", "Late series", 100, 20)
+        reference = await _entry(await _user(), old, 2, _EXPIRED)
+        await _reap_all()
+        async with async_session() as db:
+            await db.execute(update(Raffle).where(Raffle.id == old).values(status="closed"))
+            await db.commit()
+        new = await create_raffle("test-series-late", "Late series", 100, 20)
+        result = await confirm_payment(reference, 200)
+        async with async_session() as db:
+            await db.execute(delete(Raffle).where(Raffle.id == old))
+            await db.commit()
+        invalidate_catalog()
+        return result, new, await _counters(new)
+
+    result, new, counters = run(main())
+    assert (result["status"], result["raffle_id"]) == ("ok", new)
+    assert counters == (0, 2, 2)
+
+
+def test_reconcile_window_confirms_missed_payments(run, schema, monkeypatch):
+    async def main():
+        raffle_id = await create_raffle("test-reconcile", "Reconcile", 100, 20)
+        user_id = await _user()
+        missed = await _entry(user_id, raffle_id, 2)  # webhook never came
+        reaped = await _entry(user_id, raffle_id, 1, _EXPIRED)  # paid late, then reaped
+        await _reap_all()
+        done = await _entry(user_id, raffle_id, 4)
+        await confirm_payment(done, 400)
+        before = await _counters(raffle_id)
+
+        pages = [
+            [{"reference": missed, "amount": 20_000, "status": "success"},
+             {"reference": "unknown-elsewhere", "amount": 100, "status": "success"}],
+            [{"reference": reaped, "amount": 10_000, "status": "success"},
+             {"reference": done, "amount": 40_000, "status": "success"},
+             {"reference": "abandoned", "amount": 100, "status": "failed"}],
+        ]
+
+        async def list_transactions(since, until, page=1, per_page=100):
+            return {"status": True, "data": pages[page - 1], "meta": {"pageCount": len(pages)}}
+
+        monkeypatch.setattr(reconcile, "list_transactions", list_transactions)
+        since = datetime.now(timezone.utc) - timedelta(hours=1)
+        stats = await reconcile.reconcile_window(since)
+        again = await reconcile.reconcile_window(since)
+        return before, stats, again, await _counters(raffle_id)
+
+    before, stats, again, after = run(main())
+    assert before == (2, 4, 4)
+    assert stats == {"pages": 2, "seen": 4, "confirmed": 2, "sold_out": 0}
+    assert again["confirmed"] == 0  # overlapping runs are harmless
+    assert after == (0, 7, 7)
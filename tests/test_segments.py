@@ -0,0 +1,41 @@
+# tests/test_segments.py
+import pytest
+
+from app.segments import PRESETS, SegmentError, parse
+
+
+def test_atoms():
+    assert parse("bought(current)") == ("bought", "current")
+    assert parse("bought(12)") == ("bought", 12)
+    assert parse("never_bought") == ("not", ("bought", "any"))
+    assert parse("spent >= 5000") == ("spent", ">=", 5000)
+    assert parse("top_spenders(100)") == ("top_spenders", 100)
+    assert parse("joined_within(7d)") == ("joined_within", 7)
+
+
+def test_and_binds_tighter_than_or():
+    assert parse("bought(last) or bought(current) and spent > 10") == (
+        "or", ("bought", "last"), ("and", ("bought", "current"), ("spent", ">", 10)),
+    )
+    assert parse("(bought(last) or bought(current)) and spent > 10") == (
+        "and", ("or", ("bought", "last"), ("bought", "current")), ("spent", ">", 10),
+    )
+
+
+def test_not_and_case():
+    assert parse("NOT not Bought(ANY)") == ("not", ("not", ("bought", "any")))
+
+
+def test_presets_expand():
+    assert parse("lapsed") == parse(PRESETS["lapsed"])
+    assert parse("whales and not lapsed") == ("and", parse("whales"), ("not", parse("lapsed")))
+
+
+@pytest.mark.parametrize("text", [
+    "", "   ", "bought(", "bought(next)", "spent 5000", "spent >=", "richest(5)",
+    "bought(any) and", "(bought(any)", "bought(any))", "bought(any) bought(last)",
+    "top_spenders(x)", "spent >= 5 $",
+])
+def test_rejects(text):
+    with pytest.raises(SegmentError):
+        parse(text)
@@ -0,0 +1,35 @@
+# tests/test_send_rate.py
+import asyncio
+import time
+
+from app.send_rate import RateLimiter
+
+
+def _acquire_times(limiter: RateLimiter, n: int, pause: float = 0) -> list:
+    """Seconds from the start at which each of n concurrent acquire()s returned."""
+    async def main():
+        started = time.monotonic()
+        if pause:
+            limiter.pause(pause)
+        times = []
+
+        async def one():
+            await limiter.acquire()
+            times.append(time.monotonic() - started)
+
+        await asyncio.gather(*(one() for _ in range(n)))
+        return times
+    return asyncio.run(main())
+
+
+def test_burst_then_rate():
+    times = _acquire_times(RateLimiter(rate=50, burst=5), 15)
+    assert all(t < 0.05 for t in times[:5])
+    # the other 10 at 50/s: about 0.2 s
+    assert 0.18 <= times[-1] < 0.5
+    assert times == sorted(times)  # in arrival order
+
+
+def test_pause_holds_everyone():
+    times = _acquire_times(RateLimiter(rate=1000, burst=10), 3, pause=0.1)
+    assert all(t >= 0.1 for t in times)
@@ -0,0 +1,61 @@
+# tests/test_ticket_index.py
+import random
+
+import pytest
+
+from app.ticket_index import TicketIndex, decode_code, encode_code
+from app.utils import generate_ticket_code
+
+
+def test_code_round_trip():
+    for code in ("MW-000000", "MW-ZZZZZZ", "MW-8F3A2C"):
+        assert decode_code(encode_code(code)) == code
+    for _ in range(1000):
+        code = generate_ticket_code()
+        assert decode_code(encode_code(code)) == code
+
+
+def test_codes_fit_in_the_index_arrays():
+    # codes are stored in array("I"): 36**6 - 1 must fit in 32 bits
+    assert encode_code("MW-ZZZZZZ") < 2 ** 32
+
+
+@pytest.mark.parametrize("code", [
+    "", "MW-", "MW-8F3A2", "MW-8F3A2CD", "XX-8F3A2C", "MW-8F3A2!", "MW-8F3A 2",
+])
+def test_foreign_codes_are_not_encoded(code):
+    assert encode_code(code) is None
+
+
+def test_lookup_and_growth():
+    idx = TicketIndex(raffle_id=1)
+    rng = random.Random(7)
+    codes = {}
+    while len(codes) < 5000:  # several times the initial table
+        codes[decode_code(rng.randrange(36 ** 6))] = len(codes) + 1
+    for ticket_id, (code, user_id) in enumerate(codes.items(), 1):
+        idx.add(code, user_id, ticket_id)
+
+    assert len(idx) == 5000
+    assert idx.last_ticket_id == 5000
+    assert all(idx.owner(code) == user_id for code, user_id in codes.items())
+    assert "MW-NOTHER" not in idx
+    assert idx.owner("legacy-code") is None
+
+
+def test_duplicates_and_foreign_codes_are_skipped():
+    idx = TicketIndex()
+    idx.add("MW-AAAAAA", 1)
+    idx.add("MW-AAAAAA", 2)
+    idx.add("OLD-123", 3)
+    assert len(idx) == 1
+    assert idx.owner("MW-AAAAAA") == 1
+
+
+def test_draw():
+    idx = TicketIndex()
+    assert idx.draw() is None
+    idx.add("MW-AAAAAA", 1)
+    idx.add("MW-BBBBBB", 2)
+    drawn = {idx.draw(random.Random(seed)) for seed in range(50)}
+    assert drawn == {("MW-AAAAAA", 1), ("MW-BBBBBB", 2)}
@@ -0,0 +1,141 @@
+# tests/test_wallet.py
+import uuid
+
+from sqlalchemy import select, insert, update, func
+
+from app.database import async_session
+from app.issuance import confirm_payment, pay_from_wallet
+from app.models import ArchivedEntry, LedgerEntry, Raffle, Transaction, User
+from app.raffles import create_raffle
+from app.wallet import credit, debit, reconcile
+
+
+async def _user(balance: int = 0) -> int:
+    """A user whose ledger holds one opening credit of `balance`."""
+    async with async_session() as db:
+        user_id = (await db.execute(
+            insert(User).values(telegram_id=f"test-{uuid.uuid4().hex}", balance=0)
+            .returning(User.id)
+        )).scalar_one()
+        if balance:
+            await credit(db, user_id, balance, "adjustment", f"open:{user_id}")
+        await db.commit()
+    return user_id
+
+
+async def _wallet(user_id: int) -> tuple:
+    """(cached balance, ledger sum, ledger rows)."""
+    async with async_session() as db:
+        balance = (await db.execute(select(User.balance).where(User.id == user_id))).scalar()
+        total, rows = (await db.execute(
+            select(func.coalesce(func.sum(LedgerEntry.amount), 0), func.count())
+            .where(LedgerEntry.user_id == user_id)
+        )).one()
+    return balance, total, rows
+
+
+async def _posting(post) -> tuple:
+    user_id = await _user(1000)
+    async with async_session() as db:
+        results = await post(db, user_id)
+        await db.commit()
+    return results, await _wallet(user_id)
+
+
+def test_overdraft_is_refused(run, schema):
+    async def post(db, user_id):
+        return [await debit(db, user_id, 1001, "purchase", f"buy:{user_id}")]
+
+    assert run(_posting(post)) == ([False], (1000, 1000, 1))
+
+
+def test_debit_is_idempotent_on_its_reference(run, schema):
+    async def post(db, user_id):
+        return [await debit(db, user_id, 300, "purchase", f"buy:{user_id}") for _ in range(2)]
+
+    assert run(_posting(post)) == ([True, False], (700, 700, 2))
+
+
+def test_credit_is_idempotent_on_its_reference(run, schema):
+    async def post(db, user_id):
+        return [await credit(db, user_id, 50, "referral", f"ref:{user_id}") for _ in range(2)]
+
+    assert run(_posting(post)) == ([True, False], (1050, 1050, 2))
+
+
+async def _full_raffle(price: int = 500) -> dict:
+    raffle_id = await create_raffle("test-full", "Full", price, 2)
+    async with async_session() as db:
+        await db.execute(update(Raffle).where(Raffle.id == raffle_id).values(tickets_sold=2))
+        await db.commit()
+    return {"id": raffle_id, "ticket_price": price}
+
+
+def test_late_payment_into_a_sold_out_raffle_is_refunded(run, schema):
+    async def main():
+        user_id = await _user()
+        raffle = await _full_raffle()
+        reference = f"late-{user_id}"
+        async with async_session() as db:
+            # archived by the reaper before the payment landed
+            await db.execute(insert(ArchivedEntry).values(
+                user_id=user_id, raffle_id=raffle["id"], reference=reference,
+                amount=500, quantity=1, confirmed=False,
+            ))
+            await db.commit()
+
+        results = [await confirm_payment(reference, 500) for _ in range(2)]
+        async with async_session() as db:
+            sold = (await db.execute(
+                select(Raffle.tickets_sold).where(Raffle.id == raffle["id"])
+            )).scalar()
+            tx = (await db.execute(
+                select(Transaction.status).where(Transaction.reference == reference)
+            )).scalars().all()
+        return [r["status"] for r in results], sold, tx, await _wallet(user_id)
+
+    statuses, sold, tx, wallet = run(main())
+    assert statuses == ["sold_out", "already_processed"]
+    assert sold == 2
+    assert tx == ["sold_out"]
+    assert wallet == (500, 500, 1)  # one refund, not two
+
+
+def test_wallet_purchase(run, schema):
+    async def main():
+        raffle = await create_raffle("test-wallet", "Wallet", 400, 10)
+        raffle = {"id": raffle, "ticket_price": 400}
+        user_id = await _user(1000)
+        results = [await pay_from_wallet(user_id, raffle, qty) for qty in (2, 2)]
+        return [r["status"] for r in results], results[0].get("codes"), await _wallet(user_id)
+
+    statuses, codes, wallet = run(main())
+    assert statuses == ["ok", "insufficient_funds"]
+    assert len(codes) == 2
+    assert wallet == (200, 200, 2)
+
+
+def test_wallet_purchase_of_a_sold_out_raffle_keeps_the_money(run, schema):
+    async def main():
+        user_id = await _user(1000)
+        result = await pay_from_wallet(user_id, await _full_raffle(), 1)
+        return result["status"], await _wallet(user_id)
+
+    assert run(main()) == ("sold_out", (1000, 1000, 1))
+
+
+def test_reconcile_finds_and_fixes_drift(run, schema):
+    async def main():
+        user_id = await _user(1000)
+        async with async_session() as db:
+            await db.execute(update(User).where(User.id == user_id).values(balance=1500))
+            await db.commit()
+        found = [d for d in await reconcile() if d[0] == user_id]
+        fixed = [d for d in await reconcile(fix=True) if d[0] == user_id]
+        after = [d for d in await reconcile() if d[0] == user_id]
+        return found, fixed, after, await _wallet(user_id)
+
+    found, fixed, after, wallet = run(main())
+    assert found == fixed == [(found[0][0], 1500, 1000)]
+    assert after == []
+    assert wallet == (1000, 1000, 1)